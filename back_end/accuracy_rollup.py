@@ -0,0 +1,232 @@
+"""
+Periodic accuracy rollups for saved predictions.
+
+Matured Stock_Prediction rows (prediction_time + horizon has passed and a bar
+exists) are matched to the realized close with one `merge_asof` over the
+local bar store. Error and coverage statistics are then aggregated per
+(ticker, day, horizon) into Prediction_Accuracy_Rollups. The accuracy endpoint
+reads that table, so its cost scales with days, not predictions.
+
+Bars are stamped in exchange time; prediction_time uses the server clock, so
+the backend is expected to run in the exchange's time zone.
+
+The bar store is local to the host that fetched the bars, which is the
+prediction loop's leader. The rollup therefore runs under that same lease
+rather than one of its own.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from database import SessionLocal
+from models import Stock_Prediction, Prediction_Accuracy_Rollup
+from bar_store import load_bars
+from leader_election import LeaderLease
+from prediction_config import (
+    ACCURACY_ROLLUP_INTERVAL_MINUTES, ACCURACY_LOOKBACK_DAYS, ACCURACY_MATCH_TOLERANCE_MINUTES
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _matched_predictions(since: datetime) -> pd.DataFrame:
+    """Predictions made since `since`, joined to the realized close at their target time"""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Stock_Prediction.ticker,
+            Stock_Prediction.prediction_time,
+            Stock_Prediction.horizon_minutes,
+            Stock_Prediction.predicted_price,
+            Stock_Prediction.confidence_low,
+            Stock_Prediction.confidence_high,
+        ).filter(Stock_Prediction.prediction_time >= since).all()
+    finally:
+        db.close()
+
+    preds = pd.DataFrame(rows, columns=[
+        'ticker', 'prediction_time', 'horizon_minutes', 'predicted_price', 'confidence_low', 'confidence_high'
+    ])
+    if preds.empty:
+        return preds
+
+    preds['prediction_time'] = pd.to_datetime(preds['prediction_time']).astype('datetime64[ns]')
+    preds['target_time'] = preds['prediction_time'] + pd.to_timedelta(preds['horizon_minutes'], unit='m')
+
+    bar_frames = []
+    for ticker in preds['ticker'].unique():
+        bars = load_bars(ticker)
+        if bars is None:
+            continue
+        bars = bars[['timestamp', 'target']].dropna()
+        bars['timestamp'] = pd.to_datetime(bars['timestamp']).astype('datetime64[ns]')
+        bars['ticker'] = ticker
+        bar_frames.append(bars)
+    if not bar_frames:
+        return preds.iloc[0:0]
+    bars = pd.concat(bar_frames, ignore_index=True).sort_values('timestamp')
+
+    # Only predictions whose target time is covered by stored bars have matured
+    last_bar = bars.groupby('ticker')['timestamp'].max()
+    preds = preds[preds['target_time'] <= preds['ticker'].map(last_bar)]
+
+    matched = pd.merge_asof(
+        preds.sort_values('target_time'),
+        bars.rename(columns={'timestamp': 'bar_time', 'target': 'realized'}),
+        left_on='target_time',
+        right_on='bar_time',
+        by='ticker',
+        direction='backward',
+        tolerance=pd.Timedelta(minutes=ACCURACY_MATCH_TOLERANCE_MINUTES),
+    )
+    return matched.dropna(subset=['realized'])
+
+
+def aggregate_accuracy(matched: pd.DataFrame) -> pd.DataFrame:
+    """Per (ticker, day, horizon) error and coverage statistics"""
+    err = matched['predicted_price'] - matched['realized']
+    realized = matched['realized'].replace(0, np.nan)
+    frame = pd.DataFrame({
+        'ticker': matched['ticker'],
+        'day': matched['prediction_time'].dt.date,
+        'horizon_minutes': matched['horizon_minutes'],
+        'err': err,
+        'abs_err': err.abs(),
+        'pct_err': err.abs() / realized.abs() * 100,
+        'covered': (
+            (matched['realized'] >= matched['confidence_low'])
+            & (matched['realized'] <= matched['confidence_high'])
+        ).astype(float),
+    })
+    return frame.groupby(['ticker', 'day', 'horizon_minutes']).agg(
+        n_predictions=('abs_err', 'size'),
+        mae=('abs_err', 'mean'),
+        mape=('pct_err', 'mean'),
+        bias=('err', 'mean'),
+        coverage=('covered', 'mean'),
+    ).reset_index()
+
+
+def refresh_rollups(lookback_days: int = ACCURACY_LOOKBACK_DAYS) -> int:
+    """Recompute rollups for recent days; returns the number of rows written"""
+    since = datetime.combine(datetime.now().date() - timedelta(days=lookback_days), datetime.min.time())
+    matched = _matched_predictions(since)
+    if matched.empty:
+        return 0
+    rollups = aggregate_accuracy(matched)
+
+    db = SessionLocal()
+    try:
+        existing = {
+            (r.ticker, r.day, r.horizon_minutes): r
+            for r in db.query(Prediction_Accuracy_Rollup).filter(
+                Prediction_Accuracy_Rollup.day >= since.date(),
+                Prediction_Accuracy_Rollup.ticker.in_(rollups['ticker'].unique().tolist())
+            )
+        }
+        for row in rollups.itertuples(index=False):
+            values = {
+                'n_predictions': int(row.n_predictions),
+                'mae': float(row.mae),
+                'mape': None if pd.isna(row.mape) else float(row.mape),
+                'bias': float(row.bias),
+                'coverage': float(row.coverage),
+            }
+            key = (row.ticker, row.day, int(row.horizon_minutes))
+            if key in existing:
+                for field, value in values.items():
+                    setattr(existing[key], field, value)
+            else:
+                db.add(Prediction_Accuracy_Rollup(
+                    ticker=row.ticker, day=row.day, horizon_minutes=int(row.horizon_minutes), **values
+                ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Refreshed {len(rollups)} accuracy rollups from {len(matched)} matured predictions")
+    return len(rollups)
+
+
+def get_accuracy(ticker: str, days: int = 30) -> Dict:
+    """Stored rollups for a ticker plus a prediction-weighted summary"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Prediction_Accuracy_Rollup)
+            .filter(
+                Prediction_Accuracy_Rollup.ticker == ticker,
+                Prediction_Accuracy_Rollup.day >= datetime.now().date() - timedelta(days=days)
+            )
+            .order_by(Prediction_Accuracy_Rollup.day.desc(), Prediction_Accuracy_Rollup.horizon_minutes)
+            .all()
+        )
+    finally:
+        db.close()
+
+    daily: List[Dict] = [
+        {
+            'day': r.day,
+            'horizon_minutes': r.horizon_minutes,
+            'n_predictions': r.n_predictions,
+            'mae': r.mae,
+            'mape': r.mape,
+            'bias': r.bias,
+            'coverage': r.coverage,
+        }
+        for r in rows
+    ]
+    total = sum(r['n_predictions'] for r in daily)
+    summary = None
+    if total:
+        summary = {
+            'n_predictions': total,
+            'mae': sum(r['mae'] * r['n_predictions'] for r in daily) / total,
+            'coverage': sum(r['coverage'] * r['n_predictions'] for r in daily) / total,
+        }
+    return {'ticker': ticker, 'summary': summary, 'daily': daily}
+
+
+class AccuracyRollupJob:
+    """Runs refresh_rollups periodically on whichever process leads the prediction loop"""
+
+    def __init__(self, interval_minutes: int = ACCURACY_ROLLUP_INTERVAL_MINUTES):
+        self.interval_seconds = interval_minutes * 60
+        self.lease: Optional[LeaderLease] = None
+        self.is_running = False
+        self._thread = None
+
+    def _loop(self):
+        while self.is_running:
+            if self.lease.is_leader:
+                try:
+                    refresh_rollups()
+                except Exception as e:
+                    logger.error(f"Accuracy rollup failed: {e}")
+                time.sleep(self.interval_seconds)
+            else:
+                time.sleep(self.lease.renew_seconds)
+
+    def start(self, lease: LeaderLease):
+        """Follow `lease`, the prediction loop's; its owner starts and stops it"""
+        if self.is_running:
+            return
+        self.lease = lease
+        self.is_running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.is_running = False
+
+
+# Global instance
+accuracy_rollup_job = AccuracyRollupJob()
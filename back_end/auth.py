@@ -10,6 +10,7 @@ from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from email_service import send_email
+from user_activity import user_activity
 
 router = APIRouter(
     prefix='/auth',
@@ -146,6 +147,8 @@ def create_access_token(username: str, user_id: int, expires_delta: timedelta):
     encode = {'sub': username, 'id': user_id, 'exp': datetime.utcnow() + expires_delta}
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
+LAST_ACTIVE_UPDATE_INTERVAL = timedelta(minutes=5)
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: db_dependency):
     """Retrieves the currently authenticated user from the token."""
    #this isnt working rn for some reason :( 
@@ -174,6 +177,9 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: db
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Email not verified. Please check your email and verify your account before logging in."
             )
+        # Recorded in memory and written in batches, so requests never wait on the write
+        if not user.last_active_at or datetime.utcnow() - user.last_active_at > LAST_ACTIVE_UPDATE_INTERVAL:
+            user_activity.touch(user.id)
         return {'first_name': user.first_name, 'last_name': user.last_name, 'username': user.username, 'id': user.id}
     except JWTError as e:
         print("JWT Error:", str(e))  # Debug: Print the JWT error
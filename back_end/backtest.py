@@ -0,0 +1,198 @@
+"""
+Offline backtesting for the Chronos predictor.
+
+Replays bars from the local bar store (see bar_store.py) through the predictor.
+Each ticker is cut into rolling-origin windows, and many windows are scored in
+one `predict` call as separate items of a single TimeSeriesDataFrame. Error
+and coverage metrics are computed with NumPy over the whole run and written
+to a JSON report.
+
+    python backtest.py --tickers AAPL MSFT --windows 100 --model ChronosFineTuned
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import load_bars, list_tickers
+from prediction_config import (
+    MODEL_PATH, BACKTEST_REPORT_DIR, BACKTEST_WINDOWS, BACKTEST_STRIDE_STEPS,
+    BACKTEST_CONTEXT_STEPS, BACKTEST_BATCH_ITEMS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_windows(bars: pd.DataFrame, ticker: str, prediction_length: int, context_length: int,
+                  n_windows: int, stride: int):
+    """Cut rolling-origin windows from one ticker's bars.
+
+    Returns the stacked context frame (one item per window), the realized
+    targets of shape (n_windows, prediction_length), and the origin timestamps.
+    """
+    n = len(bars)
+    last_origin = n - prediction_length
+    origins = last_origin - stride * np.arange(n_windows)
+    origins = origins[origins >= context_length][::-1]  # Oldest first
+    if len(origins) == 0:
+        return None, None, None
+
+    # Row indices for every window's context and horizon, built in one shot
+    context_idx = (origins[:, None] + np.arange(-context_length, 0)).ravel()
+    horizon_idx = origins[:, None] + np.arange(prediction_length)
+
+    context = bars.iloc[context_idx].reset_index(drop=True)
+    context['item_id'] = np.repeat([f"{ticker}@{i}" for i in range(len(origins))], context_length)
+    actuals = bars['target'].to_numpy(dtype='float64')[horizon_idx]
+    origin_times = bars['timestamp'].to_numpy()[origins]
+    return context, actuals, origin_times
+
+
+def _forecast_matrix(pred_df: pd.DataFrame, item_ids: List[str], prediction_length: int, columns: List[str]) -> np.ndarray:
+    """Reshape predictor output into (n_items, prediction_length, n_columns) in item_ids order"""
+    pred_df = pred_df.reset_index()
+    pred_df['item_id'] = pd.Categorical(pred_df['item_id'], categories=item_ids, ordered=True)
+    pred_df = pred_df.sort_values(['item_id', 'timestamp'])
+    return pred_df[columns].to_numpy(dtype='float64').reshape(len(item_ids), prediction_length, len(columns))
+
+
+def compute_metrics(forecast: np.ndarray, actuals: np.ndarray, columns: List[str]) -> Dict:
+    """MAE, MAPE, per-step MAE, and quantile coverage over (windows, steps)"""
+    mean = forecast[..., columns.index('mean')]
+    abs_err = np.abs(mean - actuals)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_err = abs_err / np.abs(actuals) * 100
+
+    metrics = {
+        'windows': int(actuals.shape[0]),
+        'points': int(np.count_nonzero(~np.isnan(actuals))),
+        'mae': float(np.nanmean(abs_err)),
+        'mape': float(np.nanmean(np.where(np.isfinite(pct_err), pct_err, np.nan))),
+        'mae_by_step': np.nanmean(abs_err, axis=0).round(6).tolist(),
+    }
+
+    levels = sorted(float(c) for c in columns if c != 'mean')
+    valid = ~np.isnan(actuals)
+    # Share of realized values at or below each quantile (ideal: the level itself)
+    metrics['quantile_hit_rate'] = {
+        f"{level:g}": float(np.mean(actuals[valid] <= forecast[..., columns.index(f"{level:g}")][valid]))
+        for level in levels
+    }
+    # Central interval coverage, e.g. 0.1-0.9 should cover ~80%
+    intervals = {}
+    for low in levels:
+        high = round(1 - low, 6)
+        if low < 0.5 and high in levels:
+            lo = forecast[..., columns.index(f"{low:g}")]
+            hi = forecast[..., columns.index(f"{high:g}")]
+            covered = (actuals >= lo) & (actuals <= hi)
+            intervals[f"{low:g}-{high:g}"] = float(np.mean(covered[valid]))
+    metrics['interval_coverage'] = intervals
+    return metrics
+
+
+def run_backtest(predictor, tickers: List[str], n_windows: int = BACKTEST_WINDOWS,
+                 stride: int = BACKTEST_STRIDE_STEPS, context_length: int = BACKTEST_CONTEXT_STEPS,
+                 batch_items: int = BACKTEST_BATCH_ITEMS, model: Optional[str] = None) -> Dict:
+    """Backtest predictor on stored bars for the given tickers"""
+    from autogluon.timeseries import TimeSeriesDataFrame
+
+    prediction_length = predictor.prediction_length
+    contexts, actuals, owners = [], [], []
+    for ticker in tickers:
+        bars = load_bars(ticker)
+        if bars is None:
+            logger.warning(f"No stored bars for {ticker}, skipping")
+            continue
+        context, ticker_actuals, _ = build_windows(bars, ticker, prediction_length, context_length, n_windows, stride)
+        if context is None:
+            logger.warning(f"Not enough stored bars for {ticker}, skipping")
+            continue
+        contexts.append(context)
+        actuals.append(ticker_actuals)
+        owners.extend([ticker] * len(ticker_actuals))
+
+    if not contexts:
+        raise ValueError("No tickers had enough stored bars to backtest")
+
+    all_context = pd.concat(contexts, ignore_index=True)
+    all_actuals = np.concatenate(actuals)
+    item_ids = list(dict.fromkeys(all_context['item_id']))
+    owners = np.array(owners)
+
+    forecasts, columns = [], None
+    predict_seconds = 0.0
+    for start in range(0, len(item_ids), batch_items):
+        batch_ids = item_ids[start:start + batch_items]
+        batch = all_context[all_context['item_id'].isin(batch_ids)]
+        ts_data = TimeSeriesDataFrame.from_data_frame(batch, id_column="item_id", timestamp_column="timestamp")
+        began = time.perf_counter()
+        predictions = predictor.predict(ts_data, model=model)
+        predict_seconds += time.perf_counter() - began
+        pred_df = predictions.to_pandas() if hasattr(predictions, "to_pandas") else predictions
+        if columns is None:
+            quantiles = sorted((c for c in pred_df.columns if c != 'mean'), key=float)
+            columns = ['mean'] + quantiles
+        forecasts.append(_forecast_matrix(pred_df, batch_ids, prediction_length, columns))
+        logger.info(f"Backtested {min(start + batch_items, len(item_ids))}/{len(item_ids)} windows")
+
+    forecast = np.concatenate(forecasts)
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'model': model or 'default',
+        'prediction_length': prediction_length,
+        'context_length': context_length,
+        'stride': stride,
+        'predict_seconds': round(predict_seconds, 3),
+        'overall': compute_metrics(forecast, all_actuals, columns),
+        'tickers': {
+            ticker: compute_metrics(forecast[owners == ticker], all_actuals[owners == ticker], columns)
+            for ticker in dict.fromkeys(owners)
+        },
+    }
+    return report
+
+
+def write_report(report: Dict, output: Optional[str] = None) -> str:
+    if output is None:
+        os.makedirs(BACKTEST_REPORT_DIR, exist_ok=True)
+        output = os.path.join(BACKTEST_REPORT_DIR, f"backtest_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the Chronos predictor on locally stored bars")
+    parser.add_argument("--tickers", nargs="*", help="Tickers to backtest (default: every ticker in the bar store)")
+    parser.add_argument("--model-path", default=os.path.join(os.path.dirname(__file__), MODEL_PATH))
+    parser.add_argument("--model", default=None, help="Model name from the predictor leaderboard (default: best)")
+    parser.add_argument("--windows", type=int, default=BACKTEST_WINDOWS)
+    parser.add_argument("--stride", type=int, default=BACKTEST_STRIDE_STEPS)
+    parser.add_argument("--context-length", type=int, default=BACKTEST_CONTEXT_STEPS)
+    parser.add_argument("--batch-items", type=int, default=BACKTEST_BATCH_ITEMS)
+    parser.add_argument("--output", default=None, help="Report path (default: BACKTEST_REPORT_DIR)")
+    args = parser.parse_args()
+
+    from autogluon.timeseries import TimeSeriesPredictor
+
+    logging.basicConfig(level=logging.INFO)
+    predictor = TimeSeriesPredictor.load(args.model_path, require_version_match=False)
+    report = run_backtest(
+        predictor, args.tickers or list_tickers(), n_windows=args.windows, stride=args.stride,
+        context_length=args.context_length, batch_items=args.batch_items, model=args.model
+    )
+    path = write_report(report, args.output)
+    overall = report['overall']
+    print(f"MAE {overall['mae']:.4f}  MAPE {overall['mape']:.3f}%  coverage {overall['interval_coverage']}")
+    print(f"Report written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Local store of regularized 5-minute bars, one Parquet file per ticker.
+
+The prediction service appends every batch of bars it fetches from FMP
+through queue_bars, which hands the merge and rewrite to a single writer
+thread so predictions never wait on disk. Batches queued for a ticker while
+an earlier one is still waiting are merged into one write. The backtester
+and the accuracy rollups then replay this history offline, without calling
+the API again. Files hold the same columns the predictor consumes: item_id,
+timestamp, target (close), open, high, low and volume.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from prediction_config import BAR_DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.Lock()
+_pending: Dict[str, pd.DataFrame] = {}
+_pending_lock = threading.Lock()
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bar-store")
+
+
+def _bar_path(ticker: str) -> str:
+    return os.path.join(BAR_DATA_DIR, f"{ticker.upper()}.parquet")
+
+
+def load_bars(ticker: str) -> Optional[pd.DataFrame]:
+    """All stored bars for a ticker, sorted by timestamp"""
+    path = _bar_path(ticker)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def save_bars(ticker: str, bars: pd.DataFrame):
+    """Merge newly fetched bars into the ticker's file; newer values win"""
+    try:
+        with _write_lock:
+            os.makedirs(BAR_DATA_DIR, exist_ok=True)
+            existing = load_bars(ticker)
+            if existing is not None:
+                bars = pd.concat([existing, bars], ignore_index=True)
+            bars = (
+                bars.drop_duplicates(subset='timestamp', keep='last')
+                .sort_values('timestamp')
+                .reset_index(drop=True)
+            )
+            tmp_path = _bar_path(ticker) + ".tmp"
+            bars.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, _bar_path(ticker))
+    except Exception as e:
+        logger.error(f"Failed to store bars for {ticker}: {e}")
+
+
+def queue_bars(ticker: str, bars: pd.DataFrame):
+    """save_bars on the writer thread; returns immediately"""
+    with _pending_lock:
+        waiting = _pending.get(ticker)
+        _pending[ticker] = bars if waiting is None else pd.concat([waiting, bars], ignore_index=True)
+    if waiting is None:
+        _writer.submit(_write_pending, ticker)
+
+
+def _write_pending(ticker: str):
+    with _pending_lock:
+        bars = _pending.pop(ticker, None)
+    if bars is not None:
+        save_bars(ticker, bars)
+
+
+def list_tickers() -> List[str]:
+    if not os.path.isdir(BAR_DATA_DIR):
+        return []
+    return sorted(
+        name[:-len(".parquet")] for name in os.listdir(BAR_DATA_DIR) if name.endswith(".parquet")
+    )
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Annotated
 from database import SessionLocal
-from models import Plaid_Transactions, Transaction_Category_Link, Users
+from models import Plaid_Transactions, Transaction_Category_Link, Plaid_Item
 from auth import get_current_user
 from pydantic import BaseModel
 
@@ -137,8 +137,8 @@ async def get_combined_transactions(
         # Get Plaid transactions if available
         plaid_transactions_data = []
         try:
-            db_user = db.query(Users).filter(Users.id == user["id"]).first()
-            if db_user and db_user.plaid_access_token:
+            linked = db.query(Plaid_Item.id).filter(Plaid_Item.user_id == user["id"]).first()
+            if linked:
                 db_transactions = db.query(Plaid_Transactions).join(
                     Plaid_Bank_Account, 
                     Plaid_Transactions.account_id == Plaid_Bank_Account.account_id
@@ -0,0 +1,53 @@
+"""
+Packed binary format for stored forecast runs.
+
+A run is a horizon x column matrix of float32 values. Column 0 is the mean
+forecast and the remaining columns are the quantile levels recorded on the
+row. The matrix is stored little-endian, row-major, with no header, so it can
+be decoded with `np.frombuffer` without copying.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+FORECAST_DTYPE = np.dtype('<f4')
+
+
+def encode_forecast(matrix: np.ndarray) -> bytes:
+    """Pack a (horizon_steps, n_columns) forecast matrix into bytes"""
+    return np.ascontiguousarray(matrix, dtype=FORECAST_DTYPE).tobytes()
+
+
+def decode_forecast(blob: bytes, horizon_steps: int, n_columns: int) -> np.ndarray:
+    """Read-only (horizon_steps, n_columns) view over a stored forecast"""
+    return np.frombuffer(blob, dtype=FORECAST_DTYPE).reshape(horizon_steps, n_columns)
+
+
+def format_quantile_levels(levels: List[float]) -> str:
+    return ",".join(f"{level:g}" for level in levels)
+
+
+def parse_quantile_levels(levels: str) -> List[float]:
+    return [float(level) for level in levels.split(",")] if levels else []
+
+
+def forecast_columns(quantile_levels: List[float]) -> List[str]:
+    """Column labels for a decoded matrix, matching AutoGluon's names"""
+    return ['mean'] + [f"{level:g}" for level in quantile_levels]
+
+
+def run_to_dict(run) -> Dict:
+    """Convert a Stock_Forecast_Run row to a JSON-friendly dict"""
+    levels = parse_quantile_levels(run.quantile_levels)
+    matrix = decode_forecast(run.forecast, run.horizon_steps, len(levels) + 1)
+    return {
+        'id': run.id,
+        'ticker': run.ticker,
+        'run_time': run.run_time,
+        'first_timestamp': run.first_timestamp,
+        'step_minutes': run.step_minutes,
+        'last_close': run.last_close,
+        'model_version': run.model_version,
+        'columns': forecast_columns(levels),
+        'forecast': matrix.tolist(),
+    }
@@ -0,0 +1,172 @@
+"""
+Throughput benchmark for the Plaid ingestion paths.
+
+Runs each path against plaid_stub (started in-process unless --plaid-host is
+given) and a throwaway database, then reports rows written per second and
+SQL statements per row written. Statements are counted with a SQLAlchemy
+before_cursor_execute listener, including those issued from worker threads.
+
+Paths:
+    link_import        import_plaid_item: 24-month backfill plus holdings (a new bank link)
+    transactions_sync  sync_item in sync mode, as run by /refresh_bank_data and scheduled refreshes
+    transactions_get   sync_item in get mode (last 30 days via transactions_get)
+    holdings           sync_item for a brokerage item (accounts, securities and holdings)
+    multi_item         sync_items in sync mode across --items bank items of one user
+
+    python ingest_benchmark.py --transactions 20000 --latency-ms 100
+    python ingest_benchmark.py --database-url mysql+pymysql://root:pw@127.0.0.1/finlytics_bench
+
+Each path runs for a fresh user on a fresh item, so every row is an insert.
+Point --database-url at a database you can throw away.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict
+
+from plaid_stub import PlaidStub, DEFAULT_PORT
+
+PATHS = ["link_import", "transactions_sync", "transactions_get", "holdings", "multi_item"]
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self.enabled = False
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            with self._lock:
+                self.count += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Plaid ingestion against a local Plaid stub")
+    parser.add_argument("--database-url", default=None, help="Default: a temporary SQLite file")
+    parser.add_argument("--plaid-host", default=None, help="Use a running stub instead of starting one")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT + 1)
+    parser.add_argument("--paths", nargs="*", choices=PATHS, default=PATHS)
+    parser.add_argument("--accounts", type=int, default=3)
+    parser.add_argument("--investment-accounts", type=int, default=1)
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--holdings", type=int, default=50)
+    parser.add_argument("--items", type=int, default=3, help="Bank items linked for the multi_item path")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--report", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # database and plaid_client read their settings at import time, so configure the environment first
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/ingest_benchmark.db"
+    stub = None
+    if args.plaid_host:
+        os.environ["PLAID_HOST"] = args.plaid_host
+    else:
+        stub = PlaidStub(args.accounts, args.investment_accounts, args.transactions, args.holdings, args.latency_ms)
+        stub.serve(args.port)
+        os.environ["PLAID_HOST"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("PLAID_CLIENT_ID", "benchmark")
+    os.environ.setdefault("PLAID_SECRET", "benchmark")
+    if not os.getenv("ENCRYPTION_KEY"):
+        from cryptography.fernet import Fernet
+        os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+
+    from sqlalchemy import func
+    from database import engine, Base, SessionLocal
+    from models import (
+        Users, Plaid_Bank_Account, Plaid_Transactions, Transaction_Category_Link, User_Categories,
+        Plaid_Investment, Plaid_Investment_Holding, Securities, Plaid_Item
+    )
+    from plaid_client import encrypt_token
+    from plaid_routes import import_plaid_item
+    from plaid_orchestrator import sync_item, sync_items
+
+    Base.metadata.create_all(bind=engine)
+    counted_tables = [
+        Plaid_Bank_Account, Plaid_Transactions, Transaction_Category_Link, User_Categories,
+        Plaid_Investment, Plaid_Investment_Holding, Securities
+    ]
+    counter = QueryCounter(engine)
+
+    def row_counts() -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            return {model.__tablename__: db.query(func.count(model.id)).scalar() for model in counted_tables}
+        finally:
+            db.close()
+
+    def new_user(token: str, bank_items: int):
+        """A user with bank_items bank items and one brokerage item; returns the user id and
+        the (pk, item_id) of their items by type"""
+        db = SessionLocal()
+        try:
+            suffix = uuid.uuid4().hex[:12]
+            user = Users(
+                email=f"bench-{suffix}@example.com", username=f"bench-{suffix}", first_name="Bench",
+                last_name="User", phone_number=suffix, hashed_password="-",
+            )
+            db.add(user)
+            db.flush()
+            # Placeholder item ids, replaced by the stub's ids on the first sync like migrated items
+            tokens = [("bank", f"{token}-{i}") for i in range(bank_items)] + [("brokerage", f"{token}-brokerage")]
+            items = {"bank": [], "brokerage": []}
+            for token_type, item_token in tokens:
+                item = Plaid_Item(user_id=user.id, item_id=f"pending-{item_token}", token_type=token_type,
+                                  access_token=encrypt_token(item_token))
+                db.add(item)
+                items[token_type].append(item)
+            db.commit()
+            return user.id, {token_type: [(item.id, item.item_id) for item in rows] for token_type, rows in items.items()}
+        finally:
+            db.close()
+
+    runners = {
+        "link_import": lambda user_id, items: import_plaid_item(user_id, items["bank"][0][1], {}),
+        "transactions_sync": lambda user_id, items: sync_item(items["bank"][0][0], transactions="sync"),
+        "transactions_get": lambda user_id, items: sync_item(items["bank"][0][0], transactions="get"),
+        "holdings": lambda user_id, items: sync_item(items["brokerage"][0][0]),
+        "multi_item": lambda user_id, items: sync_items([pk for pk, _ in items["bank"]], transactions="sync"),
+    }
+
+    results = []
+    for path in args.paths:
+        token = f"access-bench-{path}-{uuid.uuid4().hex[:8]}"
+        user_id, items = new_user(token, args.items if path == "multi_item" else 1)
+        before = row_counts()
+        plaid_requests = stub.requests if stub else None
+        counter.count = 0
+        counter.enabled = True
+        started = time.perf_counter()
+        runners[path](user_id, items)
+        elapsed = time.perf_counter() - started
+        counter.enabled = False
+        after = row_counts()
+
+        written = {table: after[table] - before[table] for table in after if after[table] != before[table]}
+        rows = sum(written.values())
+        results.append({
+            "path": path,
+            "seconds": round(elapsed, 3),
+            "rows": rows,
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+            "queries": counter.count,
+            "queries_per_row": round(counter.count / rows, 3) if rows else None,
+            "plaid_requests": stub.requests - plaid_requests if stub else None,
+            "tables": written,
+        })
+
+    print(f"\n{'path':<18} {'seconds':>8} {'rows':>8} {'rows/s':>10} {'queries':>8} {'q/row':>7} {'plaid':>6}")
+    for r in results:
+        print(f"{r['path']:<18} {r['seconds']:>8} {r['rows']:>8} {str(r['rows_per_second']):>10} "
+              f"{r['queries']:>8} {str(r['queries_per_row']):>7} {str(r['plaid_requests']):>6}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"database": engine.dialect.name, "args": vars(args), "results": results}, f, indent=2)
+        print(f"Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Durable background jobs for Plaid imports, stored in Background_Jobs.
+
+Jobs survive restarts and are picked up by whichever process runs a worker
+pool. The table enforces two rules:
+
+- dedupe_key is unique while a job is queued, so enqueueing the same
+  (kind, user, item) again returns the queued job instead of a new one. The
+  key is cleared when a worker claims the job, so a change that arrives while
+  the job runs queues one follow-up run instead of being lost. A failed job
+  waiting for its retry takes the key back, so it absorbs new enqueues too;
+  if a follow-up was queued meanwhile, the retry is dropped in its favour.
+- running_user_id is unique, so each user has at most one running job across
+  all workers.
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED. Failed jobs are
+retried with exponential backoff until max_attempts. Every pool refreshes
+locked_at on its running jobs each JOB_HEARTBEAT_SECONDS (and on every
+report_progress), so long imports and purges keep their lock. A job whose
+lock has not been refreshed for JOB_LOCK_TIMEOUT_SECONDS belonged to a
+crashed worker and is requeued. A worker only records the outcome of a job
+it still holds.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import Background_Job
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = 2
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 30     # 30s, 60s, 120s, ... between attempts
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_HEARTBEAT_SECONDS = 60
+JOB_LOCK_TIMEOUT_SECONDS = 300   # A running job not heartbeated for this long is assumed orphaned
+
+# kind -> handler(user_id, item_key, payload) returning a JSON-serializable result
+_handlers: Dict[str, Callable] = {}
+
+def register_handler(kind: str, handler: Callable):
+    _handlers[kind] = handler
+
+def job_to_dict(job: Background_Job) -> Dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "item_key": job.item_key,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "last_error": job.last_error,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+def _dedupe_key(kind: str, user_id: int, item_key: Optional[str]) -> str:
+    return f"{kind}:{user_id}:{item_key or ''}"
+
+def enqueue_job(kind: str, user_id: int, item_key: str = None, payload: Dict = None,
+                delay_seconds: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict:
+    """Queue a job, or return the already-queued job with the same kind, user and item"""
+    dedupe_key = _dedupe_key(kind, user_id, item_key)
+    db = SessionLocal()
+    try:
+        job = Background_Job(
+            kind=kind,
+            user_id=user_id,
+            item_key=item_key,
+            payload=json.dumps(payload) if payload else None,
+            dedupe_key=dedupe_key,
+            max_attempts=max_attempts,
+            run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            job = db.query(Background_Job).filter(Background_Job.dedupe_key == dedupe_key).first()
+            if job is None:  # Claimed between our insert and this read
+                return enqueue_job(kind, user_id, item_key, payload, delay_seconds, max_attempts)
+        return job_to_dict(job)
+    finally:
+        db.close()
+
+def get_job(job_id: int, user_id: int) -> Optional[Dict]:
+    db = SessionLocal()
+    try:
+        job = db.query(Background_Job).filter(Background_Job.id == job_id, Background_Job.user_id == user_id).first()
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+def list_jobs(user_id: int, limit: int = 20):
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(Background_Job)
+            .filter(Background_Job.user_id == user_id)
+            .order_by(Background_Job.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [job_to_dict(job) for job in jobs]
+    finally:
+        db.close()
+
+def report_progress(user_id: int, progress: Dict):
+    """Store progress for the user's running job in its result column.
+
+    A handler only knows its user, but each user has at most one running
+    job, so running_user_id identifies it. The handler's return value
+    replaces the progress when the job finishes.
+    """
+    db = SessionLocal()
+    try:
+        db.query(Background_Job).filter(Background_Job.running_user_id == user_id).update(
+            {"result": json.dumps(progress, default=str), "locked_at": datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+class JobWorkerPool:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_running = False
+        self._threads = []
+
+    def _heartbeat(self, db):
+        """Refresh the lock on every job this pool is running"""
+        db.query(Background_Job).filter(
+            Background_Job.status == "running", Background_Job.locked_by == self.worker_id
+        ).update({"locked_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+    def _requeue_orphans(self, db):
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS)
+        requeued = db.query(Background_Job).filter(
+            Background_Job.status == "running", Background_Job.locked_at < cutoff
+        ).update({"status": "queued", "running_user_id": None, "locked_by": None}, synchronize_session=False)
+        db.commit()
+        if requeued:
+            print(f"[JOBS] Requeued {requeued} orphaned jobs")
+
+    def _claim(self, db) -> Optional[Background_Job]:
+        """Lock the next runnable job whose user has nothing running and mark it running"""
+        now = datetime.utcnow()
+        busy_users = db.query(Background_Job.running_user_id).filter(Background_Job.running_user_id.isnot(None))
+        job = (
+            db.query(Background_Job)
+            .filter(
+                Background_Job.status == "queued",
+                Background_Job.run_after <= now,
+                Background_Job.user_id.notin_(busy_users),
+            )
+            .order_by(Background_Job.run_after)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.rollback()
+            return None
+        job.status = "running"
+        job.dedupe_key = None
+        job.running_user_id = job.user_id
+        job.locked_by = self.worker_id
+        job.locked_at = now
+        job.attempts += 1
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker started a job for this user first
+            db.rollback()
+            return None
+        return job
+
+    def _run(self, db, job: Background_Job):
+        job_id, kind, user_id, item_key = job.id, job.kind, job.user_id, job.item_key
+        attempts, max_attempts = job.attempts, job.max_attempts
+        payload = json.loads(job.payload) if job.payload else {}
+        db.commit()  # Don't hold a DB transaction open while the handler runs
+
+        handler = _handlers.get(kind)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind {kind}")
+            result = handler(user_id, item_key, payload)
+            values = {
+                "status": "done",
+                "result": json.dumps(result, default=str) if result is not None else None,
+                "last_error": None,
+            }
+        except Exception as e:
+            print(f"[JOBS] Job {job_id} ({kind}) attempt {attempts} failed:", e)
+            values = {"last_error": "".join(traceback.format_exception_only(type(e), e)).strip()}
+            if attempts < max_attempts:
+                delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+                values["status"] = "queued"
+                values["run_after"] = datetime.utcnow() + timedelta(seconds=delay)
+                values["dedupe_key"] = _dedupe_key(kind, user_id, item_key)
+            else:
+                values["status"] = "failed"
+
+        values["running_user_id"] = None
+        values["locked_by"] = None
+        if values["status"] in ("done", "failed"):
+            values["finished_at"] = datetime.utcnow()
+        # Only if we still hold the job: if it was requeued as orphaned, its new run owns the row
+        held = db.query(Background_Job).filter(
+            Background_Job.id == job_id, Background_Job.locked_by == self.worker_id,
+            Background_Job.attempts == attempts
+        )
+        try:
+            updated = held.update(values, synchronize_session=False)
+            db.commit()
+        except IntegrityError:
+            # A follow-up job with the same key was queued while this one ran; it replaces the retry
+            db.rollback()
+            values.update(status="failed", dedupe_key=None, finished_at=datetime.utcnow(),
+                          last_error=values["last_error"] + " (retry superseded by a newer queued job)")
+            updated = held.update(values, synchronize_session=False)
+            db.commit()
+        if not updated:
+            print(f"[JOBS] Lost the lock on job {job_id} ({kind}); discarding this run's outcome")
+
+    def _work(self):
+        while self.is_running:
+            db = SessionLocal()
+            try:
+                job = self._claim(db)
+                if job is None:
+                    time.sleep(JOB_POLL_SECONDS)
+                    continue
+                self._run(db, job)
+            except Exception as e:
+                db.rollback()
+                print("[JOBS] Worker error:", e)
+                time.sleep(JOB_POLL_SECONDS)
+            finally:
+                db.close()
+
+    def _maintain(self):
+        while self.is_running:
+            db = SessionLocal()
+            try:
+                self._heartbeat(db)
+                self._requeue_orphans(db)
+            except Exception as e:
+                db.rollback()
+                print("[JOBS] Failed to refresh job locks:", e)
+            finally:
+                db.close()
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+
+    def start(self):
+        if self.is_running or self.workers <= 0:
+            return
+        self.is_running = True
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._maintain, daemon=True).start()
+        print(f"[JOBS] Started {self.workers} job workers as {self.worker_id}")
+
+    def stop(self):
+        self.is_running = False
+
+# Global instance
+job_workers = JobWorkerPool()
@@ -0,0 +1,122 @@
+"""
+Lease-based leader election backed by the Service_Leases table.
+
+Every process that could run a singleton job (such as the prediction loop)
+holds a LeaderLease with the same name. At most one of them owns the row at a
+time. The owner renews it before it expires. If the owner stops renewing,
+another process takes the lease over once `expires_at` has passed.
+
+Hosts are expected to keep their clocks in sync (NTP); the TTL should be far
+larger than any expected skew.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+from models import Service_Lease
+from prediction_config import LEASE_TTL_SECONDS, LEASE_RENEW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    def __init__(self, name: str, ttl_seconds: int = LEASE_TTL_SECONDS, renew_seconds: int = LEASE_RENEW_SECONDS):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.renew_seconds = renew_seconds
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = 0.0  # time.monotonic() deadline of our current lease
+        self._running = False
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        # Stop acting as leader as soon as our lease could have expired,
+        # even if the renewal thread has not noticed yet
+        return time.monotonic() < self._valid_until
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease; returns True if this process holds it"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        db = SessionLocal()
+        try:
+            updated = (
+                db.query(Service_Lease)
+                .filter(
+                    Service_Lease.name == self.name,
+                    or_(Service_Lease.owner == self.owner_id, Service_Lease.expires_at < now)
+                )
+                .update({"owner": self.owner_id, "expires_at": expires_at}, synchronize_session=False)
+            )
+            if not updated:
+                if db.query(Service_Lease.name).filter(Service_Lease.name == self.name).first():
+                    db.rollback()
+                    self._valid_until = 0.0
+                    return False
+                db.add(Service_Lease(name=self.name, owner=self.owner_id, expires_at=expires_at))
+            db.commit()
+        except IntegrityError:
+            # Another process inserted the row first
+            db.rollback()
+            self._valid_until = 0.0
+            return False
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Lease {self.name} renewal failed: {e}")
+            return self.is_leader
+        finally:
+            db.close()
+
+        was_leader = self.is_leader
+        self._valid_until = started + self.ttl_seconds
+        if not was_leader:
+            logger.info(f"Acquired lease {self.name} as {self.owner_id}")
+        return True
+
+    def release(self):
+        """Give the lease up so a standby can take over immediately"""
+        if not self.is_leader:
+            return
+        self._valid_until = 0.0
+        db = SessionLocal()
+        try:
+            db.query(Service_Lease).filter(
+                Service_Lease.name == self.name,
+                Service_Lease.owner == self.owner_id
+            ).update({"expires_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            logger.info(f"Released lease {self.name}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to release lease {self.name}: {e}")
+        finally:
+            db.close()
+
+    def _renew_loop(self):
+        while self._running:
+            self.try_acquire()
+            time.sleep(self.renew_seconds)
+
+    def start(self):
+        """Keep trying to acquire/renew the lease in the background"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._renew_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self.release()
+
+    def status(self) -> dict:
+        return {"name": self.name, "owner_id": self.owner_id, "is_leader": self.is_leader}
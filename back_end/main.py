@@ -2,6 +2,7 @@ from fastapi import FastAPI, status, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import models
 import plaid_routes
+import plaid_webhooks
 from database import engine, SessionLocal
 from typing import Annotated
 from sqlalchemy.orm import Session
@@ -17,6 +18,9 @@ import user_transactions
 import entered_transactions
 import balance_routes
 from startup import initialize_prediction_service, cleanup_prediction_service
+from schema_migrations import run_schema_migrations
+from job_queue import job_workers
+from plaid_refresh import plaid_refresh_scheduler
 import atexit
 
 app = FastAPI()
@@ -37,6 +41,7 @@ app.add_middleware(
 
 app.include_router(auth.router)
 app.include_router(plaid_routes.router)  # Include Plaid API routes
+app.include_router(plaid_webhooks.router)
 app.include_router(user_info.router)
 app.include_router(user_settings.router)
 app.include_router(user_categories.router)
@@ -50,12 +55,21 @@ app.include_router(balance_routes.router)
 
 # Create MySQL tables (make sure this is called at least once)
 models.Base.metadata.create_all(bind=engine)
+run_schema_migrations(engine)
 
 # Initialize prediction service
 initialize_prediction_service()
 
-# Register cleanup function
+# Start the Plaid import job workers (JOB_WORKERS=0 for API-only processes)
+job_workers.start()
+
+# Queue periodic Plaid refreshes for linked users (runs on the lease holder only)
+plaid_refresh_scheduler.start()
+
+# Register cleanup functions
 atexit.register(cleanup_prediction_service)
+atexit.register(job_workers.stop)
+atexit.register(plaid_refresh_scheduler.stop)
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,178 @@
+"""
+Thin client for the local model server (see model_server.py).
+
+API workers use this instead of loading the AutoGluon predictor. Requests are
+newline-delimited JSON over a Unix socket, one connection per call. A
+background thread keeps a `subscribe` connection open, so predictions saved by
+the server also reach this worker's index and WebSocket subscribers.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from prediction_config import MODEL_SERVER_TIMEOUT_SECONDS
+from prediction_index import prediction_index
+from prediction_broadcaster import prediction_broadcaster
+
+logger = logging.getLogger(__name__)
+
+# How often workers send their WebSocket ticker subscriptions to the server
+INTEREST_REPORT_SECONDS = 30
+
+
+class ModelServerError(Exception):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_message(message: Dict) -> bytes:
+    return (json.dumps(message, default=_json_default) + "\n").encode()
+
+
+def decode_prediction(prediction: Dict) -> Dict:
+    """Restore datetime fields after a round trip through JSON"""
+    if isinstance(prediction.get('prediction_time'), str):
+        prediction['prediction_time'] = datetime.fromisoformat(prediction['prediction_time'])
+    return prediction
+
+
+class ModelServerClient:
+    def __init__(self, socket_path: str, local_service):
+        self.socket_path = socket_path
+        # Used only for DB/index reads, never to load the model
+        self.local = local_service
+        self._listening = False
+        self._listener_thread = None
+        self._reporter_thread = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _call(self, op: str, **params):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(MODEL_SERVER_TIMEOUT_SECONDS)
+            try:
+                conn.connect(self.socket_path)
+                conn.sendall(encode_message({"op": op, **params}))
+                response = json.loads(conn.makefile("rb").readline() or b"null")
+            except (OSError, ValueError) as e:
+                raise ModelServerError(f"Model server request '{op}' failed: {e}")
+        if not response or not response.get("ok"):
+            raise ModelServerError((response or {}).get("error", "Empty response from model server"))
+        return response.get("result")
+
+    # Same interface the routes use on StockPredictionService
+
+    @property
+    def is_running(self) -> bool:
+        return self.status()["is_running"]
+
+    def status(self) -> Dict:
+        try:
+            return self._call("status")
+        except ModelServerError as e:
+            logger.error(str(e))
+            return {"is_running": False, "model_loaded": False, "error": str(e)}
+
+    def make_prediction(self, ticker: str, priority: str = "interactive") -> Optional[Dict]:
+        try:
+            result = self._call("predict", ticker=ticker, priority=priority)
+        except ModelServerError as e:
+            logger.error(f"Prediction failed for {ticker}: {e}")
+            return None
+        return decode_prediction(result) if result else None
+
+    def make_interval_predictions(self, ticker: str, priority: str = "interactive") -> Optional[List[Dict]]:
+        try:
+            return self._call("predict_intervals", ticker=ticker, priority=priority)
+        except ModelServerError as e:
+            logger.error(f"Prediction failed for {ticker}: {e}")
+            return None
+
+    def run_unit(self, kind: str, ticker: str, priority: str):
+        """Run one queued unit of prediction work on the server (see prediction_jobs)"""
+        if kind == "intervals":
+            return self.make_interval_predictions(ticker, priority)
+        return self.make_prediction(ticker, priority)
+
+    def start_predictions(self, tickers: List[str] = None):
+        self._call("start", tickers=tickers)
+
+    def stop_predictions(self):
+        self._call("stop")
+
+    def benchmark_models(self, ticker: str) -> List[Dict]:
+        return self._call("benchmark", ticker=ticker)
+
+    def model_selection_status(self) -> Dict:
+        return self._call("models_status")
+
+    def configure_model_selection(self, latency_budget_ms=None, accuracy_tolerance=None) -> Dict:
+        return self._call(
+            "models_config", latency_budget_ms=latency_budget_ms, accuracy_tolerance=accuracy_tolerance
+        )
+
+    def model_versions(self) -> Dict:
+        return self._call("models_versions")
+
+    def swap_model(self, version: str) -> Dict:
+        return self._call("models_swap", version=version)
+
+    def get_latest_predictions(self, ticker: str = None, limit: int = 10) -> List[Dict]:
+        return self.local.get_latest_predictions(ticker, limit)
+
+    def get_forecast_runs(self, ticker: str, hours_back: int = 24) -> List[Dict]:
+        return self.local.get_forecast_runs(ticker, hours_back)
+
+    # Prediction events from the server
+
+    def _listen(self):
+        backoff = 1
+        while self._listening:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                    conn.connect(self.socket_path)
+                    conn.sendall(encode_message({"op": "subscribe"}))
+                    backoff = 1
+                    for line in conn.makefile("rb"):
+                        if not self._listening:
+                            return
+                        event = json.loads(line)
+                        if event.get("event") == "prediction":
+                            prediction = decode_prediction(event["data"])
+                            prediction_index.add(prediction)
+                            prediction_broadcaster.publish(prediction)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Model server event stream lost: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _report_interest(self):
+        # Lets the server rank tickers by what this worker's WebSocket clients watch
+        while self._listening:
+            try:
+                self._call("report_interest", source=self.worker_id,
+                           counts=dict(prediction_broadcaster.local_interest()))
+            except ModelServerError as e:
+                logger.warning(f"Failed to report ticker interest: {e}")
+            time.sleep(INTEREST_REPORT_SECONDS)
+
+    def start_listening(self):
+        if self._listening:
+            return
+        self._listening = True
+        self._listener_thread = threading.Thread(target=self._listen, daemon=True)
+        self._listener_thread.start()
+        self._reporter_thread = threading.Thread(target=self._report_interest, daemon=True)
+        self._reporter_thread.start()
+
+    def stop_listening(self):
+        self._listening = False
@@ -0,0 +1,114 @@
+"""
+Versioned predictor folders and the handle the service predicts through.
+
+    AI_model/registry/
+        2025-06-01/        <- TimeSeriesPredictor.save() output
+        2025-07-15/
+        ACTIVE             <- text file holding the version to serve
+
+If the registry has no versions, the legacy MODEL_PATH folder is served as
+version "ChronosFineTuned". Predictions hold a ModelHandle for as long as they
+run, so a swapped-out version can be released only after its in-flight calls
+have finished.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from model_selection import ModelSelector
+from prediction_config import MODEL_PATH, MODEL_REGISTRY_DIR
+
+logger = logging.getLogger(__name__)
+
+LEGACY_VERSION = "ChronosFineTuned"
+ACTIVE_FILE = "ACTIVE"
+
+
+class ModelHandle:
+    """A loaded predictor version with its model selection and in-flight count"""
+
+    def __init__(self, version: str, predictor, selector: ModelSelector):
+        self.version = version
+        self.predictor = predictor
+        self.selector = selector
+        self.loaded_at = time.time()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def use(self):
+        with self._cond:
+            self._in_flight += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until no prediction is using this version; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._in_flight == 0, timeout)
+
+
+class ModelRegistry:
+    def __init__(self, root: str = MODEL_REGISTRY_DIR, legacy_path: Optional[str] = None):
+        self.root = root
+        self.legacy_path = legacy_path or os.path.join(os.path.dirname(__file__), MODEL_PATH)
+
+    def list_versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def active_version(self) -> Optional[str]:
+        """Version named in ACTIVE, else the newest folder, else the legacy model"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                version = f.read().strip()
+            if version in self.list_versions():
+                return version
+            logger.warning(f"ACTIVE names unknown model version {version!r}")
+        except FileNotFoundError:
+            pass
+        versions = self.list_versions()
+        if versions:
+            return versions[-1]
+        return LEGACY_VERSION if os.path.exists(self.legacy_path) else None
+
+    def set_active(self, version: str):
+        """Point ACTIVE at version so restarts serve it (atomic rename)"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".{ACTIVE_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+
+    def path_for(self, version: str) -> str:
+        if version == LEGACY_VERSION and version not in self.list_versions():
+            return self.legacy_path
+        path = os.path.join(self.root, version)
+        if not os.path.isdir(path):
+            raise ValueError(f"Unknown model version: {version}")
+        return path
+
+    def load(self, version: str):
+        """Load a version's predictor (slow: reads weights from disk)"""
+        from autogluon.timeseries import TimeSeriesPredictor
+
+        return TimeSeriesPredictor.load(self.path_for(version), require_version_match=False)
+
+
+# Global instance
+model_registry = ModelRegistry()
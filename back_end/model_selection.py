@@ -0,0 +1,109 @@
+"""
+Latency-aware choice of which model inside the AutoGluon predictor to run.
+
+At startup every model in the predictor's leaderboard is timed on recent data.
+Each kind of request (interactive or background) then runs the fastest model
+that fits its latency budget and whose validation score is within the
+accuracy tolerance of the best model.
+"""
+import logging
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional
+
+from prediction_config import (
+    MODEL_LATENCY_BUDGET_MS, MODEL_ACCURACY_TOLERANCE, MODEL_TORCH_THREADS, MODEL_BENCHMARK_REPEATS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def configure_torch_threads(num_threads: Optional[int]):
+    """Limit CPU threads used by torch-backed models (e.g. Chronos)"""
+    if not num_threads:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        logger.info(f"Torch CPU threads set to {num_threads}")
+    except ImportError:
+        logger.warning("torch not installed, ignoring MODEL_TORCH_THREADS")
+
+
+class ModelSelector:
+    def __init__(self):
+        self.latency_budget_ms: Dict[str, float] = dict(MODEL_LATENCY_BUDGET_MS)
+        self.accuracy_tolerance = MODEL_ACCURACY_TOLERANCE
+        self.torch_threads = MODEL_TORCH_THREADS
+        self.benchmarks: List[Dict] = []
+        self.selected: Dict[str, Optional[str]] = {kind: None for kind in self.latency_budget_ms}
+        self.benchmarked_at = None
+        self._lock = threading.Lock()
+
+    def benchmark(self, predictor, ts_data, repeats: int = MODEL_BENCHMARK_REPEATS) -> List[Dict]:
+        """Time every leaderboard model on ts_data and record its validation score"""
+        leaderboard = predictor.leaderboard(silent=True)
+        results = []
+        for row in leaderboard.itertuples():
+            timings = []
+            try:
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    predictor.predict(ts_data, model=row.model)
+                    timings.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                logger.warning(f"Skipping model {row.model} in benchmark: {e}")
+                continue
+            results.append({
+                'model': row.model,
+                'score_val': float(row.score_val),
+                'latency_ms': statistics.median(timings),
+            })
+            logger.info(f"Benchmarked {row.model}: score_val={row.score_val:.4f}, {results[-1]['latency_ms']:.0f} ms")
+
+        with self._lock:
+            self.benchmarks = results
+            self.benchmarked_at = time.time()
+        self.reselect()
+        return results
+
+    def _choose(self, budget_ms: float) -> Optional[str]:
+        if not self.benchmarks:
+            return None
+        # AutoGluon scores are higher-is-better (errors are negated)
+        best_score = max(b['score_val'] for b in self.benchmarks)
+        floor = best_score - abs(best_score) * self.accuracy_tolerance
+        accurate = [b for b in self.benchmarks if b['score_val'] >= floor]
+        within_budget = [b for b in accurate if b['latency_ms'] <= budget_ms]
+        # Nothing fits the budget: still prefer the fastest accurate model
+        candidates = within_budget or accurate
+        return min(candidates, key=lambda b: b['latency_ms'])['model']
+
+    def reselect(self):
+        with self._lock:
+            self.selected = {
+                kind: self._choose(budget) for kind, budget in self.latency_budget_ms.items()
+            }
+        logger.info(f"Selected inference models: {self.selected}")
+
+    def configure(self, latency_budget_ms: Optional[Dict[str, float]] = None, accuracy_tolerance: Optional[float] = None):
+        if latency_budget_ms:
+            self.latency_budget_ms.update(latency_budget_ms)
+        if accuracy_tolerance is not None:
+            self.accuracy_tolerance = accuracy_tolerance
+        self.reselect()
+
+    def select(self, kind: str = "interactive") -> Optional[str]:
+        """Model name to pass to predictor.predict; None means the predictor's default"""
+        return self.selected.get(kind)
+
+    def status(self) -> Dict:
+        return {
+            'latency_budget_ms': self.latency_budget_ms,
+            'accuracy_tolerance': self.accuracy_tolerance,
+            'torch_threads': self.torch_threads,
+            'benchmarked_at': self.benchmarked_at,
+            'benchmarks': self.benchmarks,
+            'selected': self.selected,
+        }
@@ -0,0 +1,143 @@
+"""
+Local inference server that owns the Chronos predictor and the prediction loop.
+
+Run one per host:
+
+    MODEL_SERVER_SOCKET=/tmp/finlytics-model.sock python model_server.py
+
+and start the API workers with the same MODEL_SERVER_SOCKET. The workers then
+forward inference here (see model_client.py). Only one copy of the model is
+held in memory, and background predictions run once per host instead of once
+per worker.
+"""
+import json
+import logging
+import os
+import queue
+import signal
+import socketserver
+import threading
+
+from prediction_config import MODEL_SERVER_SOCKET, PREDICTION_JOB_TIMEOUT_SECONDS
+from stock_prediction_service import prediction_service
+from prediction_broadcaster import prediction_broadcaster
+from model_client import encode_message
+from prediction_jobs import prediction_jobs
+from startup import initialize_prediction_service, cleanup_prediction_service
+
+logger = logging.getLogger(__name__)
+
+
+def _handle_request(request: dict):
+    op = request.get("op")
+    if op == "status":
+        return prediction_service.status()
+    if op in ("predict", "predict_intervals"):
+        # Through the host-wide queue so requests from every worker are
+        # ordered against each other and against the background cycle
+        kind = "point" if op == "predict" else "intervals"
+        job = prediction_jobs.submit(None, [request["ticker"]], kind=kind,
+                                     priority=request.get("priority", "interactive"), persist=False)
+        if not prediction_jobs.wait(job, PREDICTION_JOB_TIMEOUT_SECONDS) or job.status == "failed":
+            return None
+        return job.results[0] if kind == "point" else job.results
+    if op == "start":
+        prediction_service.start_predictions(request.get("tickers"))
+        return prediction_service.status()
+    if op == "stop":
+        prediction_service.stop_predictions()
+        return prediction_service.status()
+    if op == "benchmark":
+        return prediction_service.benchmark_models(request["ticker"])
+    if op == "models_status":
+        return prediction_service.model_selection_status()
+    if op == "report_interest":
+        prediction_broadcaster.set_remote_interest(request["source"], request.get("counts") or {})
+        return None
+    if op == "models_config":
+        return prediction_service.configure_model_selection(
+            request.get("latency_budget_ms"), request.get("accuracy_tolerance")
+        )
+    if op == "models_versions":
+        return prediction_service.model_versions()
+    if op == "models_swap":
+        return prediction_service.swap_model(request["version"])
+    raise ValueError(f"Unknown op: {op}")
+
+
+class ModelRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.wfile.write(encode_message({"ok": False, "error": f"Invalid request: {e}"}))
+            return
+
+        if request.get("op") == "subscribe":
+            self._stream_predictions()
+            return
+
+        try:
+            response = {"ok": True, "result": _handle_request(request)}
+        except Exception as e:
+            logger.error(f"Model server request {request.get('op')} failed: {e}")
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(encode_message(response))
+
+    def _stream_predictions(self):
+        """Keep the connection open and write every saved prediction to it"""
+        events: queue.Queue = queue.Queue(maxsize=1000)
+
+        def enqueue(prediction):
+            try:
+                events.put_nowait(prediction)
+            except queue.Full:
+                logger.warning("Dropping prediction event for slow subscriber")
+
+        prediction_broadcaster.add_listener(enqueue)
+        try:
+            while True:
+                prediction = events.get()
+                self.wfile.write(encode_message({"event": "prediction", "data": prediction}))
+                self.wfile.flush()
+        except OSError:
+            logger.info("Model server subscriber disconnected")
+        finally:
+            prediction_broadcaster.remove_listener(enqueue)
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # Stale socket from a previous run
+
+    # Runs in local mode here: this process loads the model and owns the loop
+    initialize_prediction_service(local=True)
+
+    server = ModelServer(socket_path, ModelRequestHandler)
+    os.chmod(socket_path, 0o660)
+
+    def shutdown(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    logger.info(f"Model server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        cleanup_prediction_service(local=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    serve(MODEL_SERVER_SOCKET or "/tmp/finlytics-model.sock")
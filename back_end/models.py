@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Date, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Date, DateTime, UniqueConstraint, LargeBinary, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -13,10 +13,14 @@ class Users(Base):
     last_name = Column(String(255), nullable=False)
     phone_number = Column(String(20), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
+    # Legacy single-item tokens; copied into Plaid_Items by schema_migrations.migrate_plaid_items.
+    # Kept (and cleared on unlink) so the previous release still works after a rollback.
     plaid_access_token = Column(String(255), unique=True, nullable=True)
     plaid_brokerage_access_token = Column(String(255), unique=True, nullable=True)
+    plaid_tokens_migrated_at = Column(DateTime, nullable=True)  # Set once the tokens above were copied
     is_verified = Column(Boolean, default=False)
     verification_token = Column(String(255), nullable=True)
+    last_active_at = Column(DateTime, nullable=True)  # Last authenticated request (throttled), used to prioritize refreshes
     bank_accounts = relationship(
         "Plaid_Bank_Account",
         back_populates="user",
@@ -65,6 +69,8 @@ class Plaid_Bank_Account(Base):
     current_balance = Column(Float)
     available_balance = Column(Float)
     currency = Column(String(10))
+    balance_as_of = Column(DateTime, nullable=True)  # When the balances last came from /accounts/balance/get
+    item_id = Column(String(100), nullable=True, index=True)  # Plaid_Items.item_id; NULL for rows imported before multi-item support
     created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("Users", back_populates="bank_accounts")
     transactions = relationship(
@@ -138,6 +144,51 @@ class Transaction_Category_Link(Base):
     )
 
 
+class Plaid_Item(Base):
+    """One linked Plaid item (a login at one institution) and its sync state"""
+    __tablename__ = "Plaid_Items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("Users.id", ondelete="CASCADE"), nullable=False, index=True)
+    item_id = Column(String(100), unique=True, nullable=False)
+    token_type = Column(String(20), default="bank")  # Linked as "bank" or "brokerage"
+    access_token = Column(String(512), nullable=False)  # Fernet-encrypted
+    institution_id = Column(String(100), nullable=True)
+    institution_name = Column(String(255), nullable=True)
+    cursor = Column(Text, nullable=True)  # /transactions/sync next_cursor; empty until the first sync
+    last_synced_at = Column(DateTime, nullable=True)
+    holdings_synced_at = Column(DateTime, nullable=True)  # Last investment holdings refresh for the item
+    last_sync_status = Column(String(20), nullable=True)  # "ok" or "error"
+    last_sync_error = Column(Text, nullable=True)
+    last_attempt_at = Column(DateTime, nullable=True)  # End of the last sync, successful or not
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Background_Job(Base):
+    __tablename__ = "Background_Jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # Handler name, e.g. "plaid_bank_import"
+    user_id = Column(Integer, ForeignKey("Users.id", ondelete="CASCADE"), nullable=False, index=True)
+    item_key = Column(String(100), nullable=True)  # Plaid item the job is for, when it has one
+    payload = Column(Text, nullable=True)  # JSON arguments for the handler
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, done, failed
+    # Set while the job is queued, NULL once claimed: one queued job per key
+    dedupe_key = Column(String(255), unique=True, nullable=True)
+    # Set to user_id only while running: at most one running job per user
+    running_user_id = Column(Integer, unique=True, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_by = Column(String(255), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
 class Plaid_Investment(Base):
     __tablename__ = "Plaid_Investment"
 
@@ -150,6 +201,7 @@ class Plaid_Investment(Base):
     current_balance = Column(Float)
     available_balance = Column(Float)
     currency = Column(String(10))
+    item_id = Column(String(100), nullable=True, index=True)  # Plaid_Items.item_id; NULL for rows imported before multi-item support
     created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("Users", back_populates="investments")
     holdings = relationship(
@@ -169,15 +221,25 @@ class Plaid_Investment_Holding(Base):
         ForeignKey("Plaid_Investment.account_id", ondelete="CASCADE"),
         nullable=False
     )
-    security_id = Column(String(100))
-    symbol = Column(String(20))
-    name = Column(String(255))
+    security_id = Column(String(100), ForeignKey("Securities.security_id"), index=True)
     quantity = Column(Float)
     price = Column(Float)
     value = Column(Float)
     currency = Column(String(10))
     created_at = Column(DateTime, default=datetime.utcnow)
     investment_account = relationship("Plaid_Investment", back_populates="holdings")
+    security = relationship("Securities")
+
+class Securities(Base):
+    """Plaid securities, shared by every user's holdings"""
+    __tablename__ = "Securities"
+
+    id = Column(Integer, primary_key=True, index=True)
+    security_id = Column(String(100), unique=True, nullable=False)
+    ticker_symbol = Column(String(20), index=True)
+    name = Column(String(255))
+    type = Column(String(50))
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 class Save_Goals(Base):
     __tablename__ = "Save_Goals"
@@ -271,3 +333,65 @@ class Stock_Prediction(Base):
     model_version = Column(String(50), default="ChronosFineTuned")
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+class Stock_Forecast_Run(Base):
+    __tablename__ = "Stock_Forecast_Runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String(10), nullable=False, index=True)
+    run_time = Column(DateTime, default=datetime.utcnow, index=True)
+    first_timestamp = Column(DateTime, nullable=True)  # Timestamp of the first forecast step
+    step_minutes = Column(Integer, default=5)
+    horizon_steps = Column(Integer, nullable=False)
+    quantile_levels = Column(String(100), nullable=False)  # e.g. "0.1,0.5,0.9"
+    last_close = Column(Float, nullable=True)
+    forecast = Column(LargeBinary, nullable=False)  # Packed float32 matrix, see forecast_codec
+    model_version = Column(String(50), default="ChronosFineTuned")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        UniqueConstraint('ticker', 'run_time', name='_ticker_run_time_uc'),
+    )
+
+
+class Service_Lease(Base):
+    __tablename__ = "Service_Leases"
+
+    name = Column(String(100), primary_key=True)  # e.g. "prediction_loop"
+    owner = Column(String(255), nullable=False)   # host:pid:nonce of the current holder
+    expires_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Prediction_Accuracy_Rollup(Base):
+    __tablename__ = "Prediction_Accuracy_Rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String(10), nullable=False, index=True)
+    day = Column(Date, nullable=False)  # Day the predictions were made
+    horizon_minutes = Column(Integer, nullable=False)
+    n_predictions = Column(Integer, nullable=False)
+    mae = Column(Float)
+    mape = Column(Float)   # Percent
+    bias = Column(Float)   # Mean of predicted - realized
+    coverage = Column(Float)  # Share of realized prices inside [confidence_low, confidence_high]
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        UniqueConstraint('ticker', 'day', 'horizon_minutes', name='_ticker_day_horizon_uc'),
+    )
+
+
+class Prediction_Job(Base):
+    __tablename__ = "Prediction_Jobs"
+
+    id = Column(String(36), primary_key=True)  # uuid4
+    user_id = Column(Integer, ForeignKey("Users.id", ondelete="CASCADE"), nullable=True, index=True)
+    kind = Column(String(20), nullable=False)      # "point" or "intervals"
+    tickers = Column(String(255), nullable=False)  # Comma-separated
+    priority = Column(String(20), nullable=False)  # "interactive" or "background"
+    status = Column(String(20), nullable=False)    # queued, running, done, failed
+    results = Column(Text, nullable=True)          # JSON list
+    completed = Column(Integer, nullable=True)     # Tickers finished so far
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
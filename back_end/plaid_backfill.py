@@ -0,0 +1,202 @@
+"""
+Historical transaction backfill for newly linked Plaid items.
+
+The backfill range (BACKFILL_MONTHS back from today) is split into date
+windows. Up to BACKFILL_MAX_CONCURRENCY windows are fetched at once with
+transactions_get, each paging with count/offset. Every page is written and
+committed on its own, so memory and transaction size stay bounded by the page
+size no matter how much history an item has. Progress is kept per window on
+the item's import job and served by /backfill_status. Before the windows run,
+the item's /transactions/sync cursor is seeded so later syncs only fetch new
+changes.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date
+from typing import Callable, Dict, List, Tuple
+
+import plaid
+from plaid.model.transactions_get_request import TransactionsGetRequest
+from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+
+from database import SessionLocal
+from models import Background_Job, Plaid_Item
+from plaid_client import client, PLAID_CLIENT_ID, PLAID_SECRET
+from plaid_ingest import ingest_transactions
+from job_queue import report_progress
+
+BACKFILL_JOB_KIND = "plaid_bank_import"  # Import job of a new bank link; holds its backfill progress
+BACKFILL_MONTHS = 24
+BACKFILL_WINDOW_DAYS = 90
+# History requested at Link time; Plaid defaults to 90 days and allows at most 730
+BACKFILL_DAYS_REQUESTED = min(730, BACKFILL_MONTHS * 31)
+BACKFILL_MAX_CONCURRENCY = 4
+BACKFILL_PAGE_SIZE = 500         # transactions_get maximum; also the rows per commit
+PRODUCT_NOT_READY_RETRIES = 6    # Transactions for a brand-new item can take a while to become available
+PRODUCT_NOT_READY_WAIT_SECONDS = 10
+
+def backfill_windows(end: date, months: int = BACKFILL_MONTHS, window_days: int = BACKFILL_WINDOW_DAYS) -> List[Tuple[date, date]]:
+    """Newest-first (start, end) date windows covering `months` back from `end`"""
+    earliest = end - timedelta(days=months * 30)
+    windows = []
+    while end > earliest:
+        start = max(end - timedelta(days=window_days - 1), earliest)
+        windows.append((start, end))
+        end = start - timedelta(days=1)
+    return windows
+
+class BackfillProgress:
+    """State of one item's backfill, shared between its window threads.
+
+    Every change is written to the user's running import job through
+    job_queue.report_progress, so /backfill_status can serve it from any
+    process. The job queue runs one job per user, so that job is this
+    item's import.
+    """
+
+    def __init__(self, user_id: int, item_id: str, windows: List[Tuple[date, date]]):
+        self.user_id = user_id
+        self.item_id = item_id
+        self._lock = threading.Lock()
+        self._state = {
+            "status": "running",
+            "started_at": datetime.utcnow(),
+            "finished_at": None,
+            "windows": [
+                {"start_date": start, "end_date": end, "status": "queued", "fetched": 0, "total": None, "error": None}
+                for start, end in windows
+            ],
+        }
+        self._report()
+
+    def update_window(self, index: int, **fields):
+        with self._lock:
+            self._state["windows"][index].update(fields)
+        self._report()
+
+    def finish(self):
+        with self._lock:
+            failed = any(w["status"] == "failed" for w in self._state["windows"])
+            self._state["status"] = "failed" if failed else "done"
+            self._state["finished_at"] = datetime.utcnow()
+        self._report()
+
+    def get(self) -> Dict:
+        with self._lock:
+            windows = [dict(w) for w in self._state["windows"]]
+            return {
+                **self._state,
+                "windows": windows,
+                "fetched": sum(w["fetched"] for w in windows),
+                "windows_done": sum(w["status"] == "done" for w in windows),
+            }
+
+    def _report(self):
+        report_progress(self.user_id, {"item_id": self.item_id, "backfill": self.get()})
+
+def backfill_status(user_id: int) -> List[Dict]:
+    """Latest backfill of each of the user's bank items, read from their import jobs"""
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(Background_Job)
+            .filter(Background_Job.user_id == user_id, Background_Job.kind == BACKFILL_JOB_KIND)
+            .order_by(Background_Job.created_at.desc(), Background_Job.id.desc())
+            .all()
+        )
+        items = {}
+        for job in jobs:
+            backfill = (json.loads(job.result) if job.result else {}).get("backfill")
+            if job.item_key in items or backfill is None:
+                continue
+            items[job.item_key] = {"item_id": job.item_key, "job_id": job.id, "job_status": job.status, **backfill}
+        return list(items.values())
+    finally:
+        db.close()
+
+def _with_product_retry(call: Callable):
+    """Run a Plaid call, waiting while a brand-new item's transactions are not ready yet"""
+    for attempt in range(PRODUCT_NOT_READY_RETRIES):
+        try:
+            return call()
+        except plaid.ApiException as e:
+            try:
+                error_code = json.loads(e.body).get("error_code")
+            except (TypeError, ValueError):
+                error_code = None
+            if error_code != "PRODUCT_NOT_READY" or attempt == PRODUCT_NOT_READY_RETRIES - 1:
+                raise
+            time.sleep(PRODUCT_NOT_READY_WAIT_SECONDS)
+
+def _get_page(access_token: str, start: date, end: date, offset: int) -> Dict:
+    request = TransactionsGetRequest(
+        client_id=PLAID_CLIENT_ID,
+        secret=PLAID_SECRET,
+        access_token=access_token,
+        start_date=start,
+        end_date=end,
+        options=TransactionsGetRequestOptions(count=BACKFILL_PAGE_SIZE, offset=offset),
+    )
+    return _with_product_retry(lambda: client.transactions_get(request).to_dict())
+
+def _seed_cursor(user_id: int, item_id: str, access_token: str):
+    """Start the item's /transactions/sync cursor at the current point in time.
+
+    The windows import the history, so the first incremental sync only needs
+    the changes from now on. Without a cursor it would page the whole history
+    again and apply it in one transaction. Seeding before the windows run
+    means changes made during the backfill are picked up by that sync too.
+    """
+    db = SessionLocal()
+    try:
+        item = db.query(Plaid_Item).filter(Plaid_Item.user_id == user_id, Plaid_Item.item_id == item_id).first()
+        if item is None or item.cursor:
+            return
+        response = _with_product_retry(lambda: client.transactions_sync(TransactionsSyncRequest(
+            client_id=PLAID_CLIENT_ID, secret=PLAID_SECRET, access_token=access_token, cursor="now"
+        )).to_dict())
+        item.cursor = response["next_cursor"]
+        db.commit()
+    finally:
+        db.close()
+
+def _backfill_window(progress: BackfillProgress, access_token: str, index: int, start: date, end: date):
+    progress.update_window(index, status="running")
+    db = SessionLocal()
+    try:
+        offset, total = 0, None
+        while total is None or offset < total:
+            page = _get_page(access_token, start, end, offset)
+            transactions = page.get("transactions", [])
+            total = page.get("total_transactions", 0)
+            if not transactions:
+                break
+            ingest_transactions(db, progress.user_id, transactions)
+            db.commit()
+            offset += len(transactions)
+            progress.update_window(index, fetched=offset, total=total)
+        progress.update_window(index, status="done")
+    except Exception as e:
+        db.rollback()
+        print(f"Backfill window {start}..{end} failed for user {progress.user_id}:", e)
+        progress.update_window(index, status="failed", error=str(e))
+    finally:
+        db.close()
+
+def backfill_transactions(user_id: int, item_id: str, decrypted_access_token: str,
+                          months: int = BACKFILL_MONTHS) -> Dict:
+    """Import up to `months` of history for one item and seed its sync cursor.
+    Blocks until every window is done; returns the final progress."""
+    _seed_cursor(user_id, item_id, decrypted_access_token)
+    windows = backfill_windows(datetime.now().date(), months)
+    progress = BackfillProgress(user_id, item_id, windows)
+    with ThreadPoolExecutor(max_workers=BACKFILL_MAX_CONCURRENCY) as pool:
+        for index, (start, end) in enumerate(windows):
+            pool.submit(_backfill_window, progress, decrypted_access_token, index, start, end)
+    progress.finish()
+    result = progress.get()
+    print(f"Backfill finished for user {user_id}, item {item_id}: {result['fetched']} transactions")
+    return result
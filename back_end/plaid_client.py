@@ -0,0 +1,92 @@
+"""
+Shared Plaid API client and access-token encryption.
+
+Lives outside plaid_routes so the sync/ingest modules can use the client
+without importing the routes module.
+
+All Plaid HTTP traffic goes through two pooled clients with the same timeout
+policy (PLAID_CONNECT_TIMEOUT_SECONDS / PLAID_READ_TIMEOUT_SECONDS): the
+generated `client`, and `plaid_post` for the endpoints called as raw JSON.
+Both keep up to PLAID_POOL_SIZE connections alive, so concurrent calls made
+by plaid_orchestrator reuse connections instead of opening new ones.
+"""
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from cryptography.fernet import Fernet
+from plaid.api import plaid_api
+from plaid.configuration import Configuration
+from plaid.api_client import ApiClient
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Plaid Credentials from environment variables
+PLAID_CLIENT_ID = os.getenv("PLAID_CLIENT_ID")
+PLAID_SECRET = os.getenv("PLAID_SECRET")
+PLAID_ENVIRONMENT = os.getenv("PLAID_ENVIRONMENT", "sandbox")  # default to sandbox if not set
+# Overrides the Plaid base URL, e.g. http://127.0.0.1:8765 for plaid_stub.py
+PLAID_HOST = os.getenv("PLAID_HOST", f"https://{PLAID_ENVIRONMENT}.plaid.com").rstrip("/")
+
+# "sync" uses /transactions/sync with a stored cursor; "get" re-fetches the last 30 days
+PLAID_TRANSACTIONS_MODE = os.getenv("PLAID_TRANSACTIONS_MODE", "sync")
+
+# Public URL of /plaid/webhook; when set, new Link sessions register it with Plaid
+PLAID_WEBHOOK_URL = os.getenv("PLAID_WEBHOOK_URL")
+
+# /investments serves stored holdings and queues a refresh once they are older than this
+INVESTMENTS_MAX_AGE_MINUTES = int(os.getenv("INVESTMENTS_MAX_AGE_MINUTES", "15"))
+
+# /user_balances calls the (slow, billed per call) /accounts/balance/get only for snapshots older than this
+BALANCE_MAX_AGE_MINUTES = int(os.getenv("BALANCE_MAX_AGE_MINUTES", "60"))
+
+# One timeout policy for every Plaid call: (connect, read) seconds
+PLAID_CONNECT_TIMEOUT_SECONDS = float(os.getenv("PLAID_CONNECT_TIMEOUT_SECONDS", "5"))
+PLAID_READ_TIMEOUT_SECONDS = float(os.getenv("PLAID_READ_TIMEOUT_SECONDS", "60"))
+PLAID_TIMEOUT = (PLAID_CONNECT_TIMEOUT_SECONDS, PLAID_READ_TIMEOUT_SECONDS)
+PLAID_POOL_SIZE = int(os.getenv("PLAID_POOL_SIZE", "16"))  # Keep-alive connections per client
+
+if not all([PLAID_CLIENT_ID, PLAID_SECRET]):
+    raise Exception("Plaid credentials are not fully set in the environment variables.")
+
+class _TimeoutApiClient(ApiClient):
+    """ApiClient that applies PLAID_TIMEOUT to calls that don't set their own"""
+    def call_api(self, *args, **kwargs):
+        if kwargs.get("_request_timeout") is None:
+            kwargs["_request_timeout"] = PLAID_TIMEOUT
+        return super().call_api(*args, **kwargs)
+
+configuration = Configuration(
+    host=PLAID_HOST
+)
+configuration.connection_pool_maxsize = PLAID_POOL_SIZE
+api_client = _TimeoutApiClient(configuration)
+client = plaid_api.PlaidApi(api_client)
+
+# Pooled session for endpoints called as raw JSON
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=PLAID_POOL_SIZE))
+_http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=PLAID_POOL_SIZE))  # Local stub
+_http.headers.update({
+    "Content-Type": "application/json",
+    "PLAID-CLIENT-ID": PLAID_CLIENT_ID,
+    "PLAID-SECRET": PLAID_SECRET,
+})
+
+def plaid_post(path: str, body: dict) -> requests.Response:
+    """POST a JSON body to a Plaid endpoint, e.g. plaid_post("/investments/holdings/get", {...})"""
+    body = {"client_id": PLAID_CLIENT_ID, "secret": PLAID_SECRET, **body}
+    return _http.post(f"{configuration.host}{path}", json=body, timeout=PLAID_TIMEOUT)
+
+# Token encryption & decryption using a fixed key from .env
+ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
+if not ENCRYPTION_KEY:
+    raise Exception("ENCRYPTION_KEY not set in environment variables")
+cipher_suite = Fernet(ENCRYPTION_KEY.encode())
+
+def encrypt_token(token: str) -> str:
+    return cipher_suite.encrypt(token.encode()).decode()
+
+def decrypt_token(encrypted_token: str) -> str:
+    return cipher_suite.decrypt(encrypted_token.encode()).decode()
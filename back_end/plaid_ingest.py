@@ -0,0 +1,241 @@
+"""
+Batch ingestion of Plaid transactions and investment holdings.
+
+A batch is written with a fixed number of statements, whatever its size:
+one SELECT for the user's accounts, one for their categories, bulk creation
+of any missing categories, then multi-row upserts for the transactions and
+their category links. Holdings are written the same way: one upsert into the
+shared Securities table, one for the holdings and one DELETE for holdings that
+are gone. Nothing here commits; the caller owns the transaction.
+"""
+from datetime import datetime, date
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import (
+    Plaid_Bank_Account, Plaid_Transactions, User_Categories, Transaction_Category_Link,
+    Plaid_Investment, Plaid_Investment_Holding, Securities
+)
+
+UPSERT_CHUNK_ROWS = 1000  # Rows per INSERT statement, keeps packets under max_allowed_packet
+DEFAULT_CATEGORY_COLOR = "#000000"
+
+def transaction_category(t: Dict) -> Optional[str]:
+    """Category from personal_finance_category if available, else the legacy category list"""
+    if t.get("personal_finance_category"):
+        return t["personal_finance_category"].get("primary")
+    if t.get("category"):
+        return t["category"][0]
+    return None
+
+def transaction_date(t: Dict) -> date:
+    # If Plaid returns the date as a string, parse it
+    return t["date"] if isinstance(t["date"], date) else datetime.strptime(t["date"], "%Y-%m-%d").date()
+
+def _chunks(rows: List[Dict], size: int) -> Iterable[List[Dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def bulk_upsert(db: Session, model, rows: List[Dict], conflict_columns: List[str], update_columns: List[str]):
+    """Multi-row INSERT that updates update_columns on a unique-key conflict.
+
+    With no update_columns, conflicting rows are left as they are. Uses
+    ON DUPLICATE KEY UPDATE on MySQL and ON CONFLICT elsewhere.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    for chunk in _chunks(rows, UPSERT_CHUNK_ROWS):
+        if dialect == "mysql":
+            stmt = mysql.insert(table).values(chunk)
+            # Assigning a key column to itself is MySQL's no-op update
+            updates = {c: stmt.inserted[c] for c in update_columns} or {conflict_columns[0]: table.c[conflict_columns[0]]}
+            stmt = stmt.on_duplicate_key_update(updates)
+        elif dialect in ("sqlite", "postgresql"):
+            insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = insert(table).values(chunk)
+            if update_columns:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=conflict_columns,
+                    set_={c: stmt.excluded[c] for c in update_columns}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+        else:
+            raise NotImplementedError(f"bulk_upsert does not support {dialect}")
+        db.execute(stmt)
+
+def ensure_categories(db: Session, user_id: int, names: Iterable[str]) -> Dict[str, int]:
+    """Map category names to the user's category ids, creating missing ones in bulk"""
+    names = set(names)
+    categories = {
+        name: category_id for category_id, name in
+        db.query(User_Categories.id, User_Categories.name).filter(User_Categories.user_id == user_id)
+    }
+    missing = names - categories.keys()
+    if missing:
+        now = datetime.utcnow()
+        bulk_upsert(db, User_Categories, [
+            {"user_id": user_id, "name": name, "color": DEFAULT_CATEGORY_COLOR, "weekly_limit": None, "created_at": now}
+            for name in sorted(missing)
+        ], conflict_columns=["user_id", "name"], update_columns=[])
+        categories.update(
+            (name, category_id) for category_id, name in
+            db.query(User_Categories.id, User_Categories.name).filter(
+                User_Categories.user_id == user_id, User_Categories.name.in_(missing)
+            )
+        )
+    return categories
+
+def store_bank_accounts(db: Session, user_id: int, accounts_data: List[Dict], balance_as_of: Optional[datetime] = None,
+                        item_id: Optional[str] = None):
+    """Upsert Plaid accounts into Plaid_Bank_Account (caller commits).
+    Pass balance_as_of when the balances are real-time (from /accounts/balance/get)."""
+    existing = {
+        account.account_id: account for account in db.query(Plaid_Bank_Account).filter(
+            Plaid_Bank_Account.account_id.in_([acc["account_id"] for acc in accounts_data])
+        )
+    }
+    for acc in accounts_data:
+        values = {
+            "name": acc["name"],
+            "type": acc["type"],
+            "subtype": acc.get("subtype"),
+            "current_balance": acc["balances"].get("current"),
+            "available_balance": acc["balances"].get("available"),
+            "currency": acc["balances"].get("iso_currency_code"),
+        }
+        if balance_as_of is not None:
+            values["balance_as_of"] = balance_as_of
+        if item_id is not None:
+            values["item_id"] = item_id
+        existing_account = existing.get(acc["account_id"])
+        if existing_account:
+            for key, value in values.items():
+                setattr(existing_account, key, value)
+        else:
+            db.add(Plaid_Bank_Account(user_id=user_id, account_id=acc["account_id"], **values))
+
+def store_investment_accounts(db: Session, user_id: int, accounts_data: List[Dict], item_id: Optional[str] = None) -> List[str]:
+    """Upsert the investment accounts among accounts_data into Plaid_Investment (caller commits).
+    Returns their account ids."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "account_id": acc["account_id"],
+            "name": acc["name"],
+            "type": acc["type"],
+            "subtype": acc.get("subtype"),
+            "current_balance": acc["balances"].get("current"),
+            "available_balance": acc["balances"].get("available"),
+            "currency": acc["balances"].get("iso_currency_code"),
+            "item_id": item_id,
+            "created_at": now,
+        }
+        for acc in accounts_data if acc.get("type") == "investment"
+    ]
+    bulk_upsert(db, Plaid_Investment, rows, conflict_columns=["account_id"],
+                update_columns=["name", "type", "subtype", "current_balance", "available_balance", "currency", "item_id"])
+    return [row["account_id"] for row in rows]
+
+def ingest_transactions(db: Session, user_id: int, transactions: List[Dict]) -> int:
+    """Upsert Plaid transactions for a user's bank accounts and link new ones to categories.
+
+    Transactions for accounts the user has no Plaid_Bank_Account row for
+    (e.g. investment accounts) are skipped. Existing category links are kept
+    so a user's re-categorization survives later imports. Returns the number
+    of transactions written.
+    """
+    if not transactions:
+        return 0
+    account_ids = {
+        account_id for (account_id,) in
+        db.query(Plaid_Bank_Account.account_id).filter(Plaid_Bank_Account.user_id == user_id)
+    }
+
+    now = datetime.utcnow()
+    rows = {}
+    for t in transactions:
+        if t["account_id"] not in account_ids:
+            continue
+        # Later entries win, so a modified copy replaces an added one in the same batch
+        rows[t["transaction_id"]] = {
+            "transaction_id": t["transaction_id"],
+            "account_id": t["account_id"],
+            "amount": t["amount"],
+            "currency": t.get("iso_currency_code"),
+            "category": transaction_category(t),
+            "merchant_name": t.get("merchant_name"),
+            "date": transaction_date(t),
+            "created_at": now,
+        }
+    rows = list(rows.values())
+
+    bulk_upsert(db, Plaid_Transactions, rows, conflict_columns=["transaction_id"],
+                update_columns=["account_id", "amount", "currency", "category", "merchant_name", "date"])
+
+    categories = ensure_categories(db, user_id, (r["category"] for r in rows if r["category"]))
+    bulk_upsert(db, Transaction_Category_Link, [
+        {"transaction_id": r["transaction_id"], "category_id": categories[r["category"]], "created_at": now}
+        for r in rows if r["category"]
+    ], conflict_columns=["transaction_id"], update_columns=[])
+
+    return len(rows)
+
+def ingest_holdings(db: Session, account_ids: Iterable[str], holdings: List[Dict], securities: List[Dict]) -> int:
+    """Replace the holdings of account_ids with a /investments/holdings/get snapshot.
+
+    Securities are upserted into the shared table first. Holdings of these
+    accounts missing from the snapshot are deleted. Returns the number of
+    holdings written.
+    """
+    account_ids = set(account_ids)
+    now = datetime.utcnow()
+    security_rows = {
+        s["security_id"]: {
+            "security_id": s["security_id"],
+            "ticker_symbol": s.get("ticker_symbol"),
+            "name": s.get("name"),
+            "type": s.get("type"),
+            "updated_at": now,
+        }
+        for s in securities
+    }
+
+    rows = {}
+    for h in holdings:
+        if h["account_id"] not in account_ids:
+            continue
+        security_id = h.get("security_id")
+        if security_id and security_id not in security_rows:
+            # Keep the foreign key satisfiable if Plaid omits a security
+            security_rows[security_id] = {"security_id": security_id, "ticker_symbol": None, "name": None,
+                                          "type": None, "updated_at": now}
+        holding_id = f"{h['account_id']}_{security_id}"
+        rows[holding_id] = {
+            "holding_id": holding_id,
+            "account_id": h["account_id"],
+            "security_id": security_id,
+            "quantity": float(h.get("quantity") or 0),
+            "price": float(h.get("institution_price") or 0),
+            "value": float(h.get("institution_value") or 0),
+            "currency": h.get("iso_currency_code"),
+            "created_at": now,
+        }
+
+    bulk_upsert(db, Securities, list(security_rows.values()), conflict_columns=["security_id"],
+                update_columns=["ticker_symbol", "name", "type", "updated_at"])
+    bulk_upsert(db, Plaid_Investment_Holding, list(rows.values()), conflict_columns=["holding_id"],
+                update_columns=["quantity", "price", "value", "currency"])
+
+    if account_ids:
+        stale = db.query(Plaid_Investment_Holding).filter(Plaid_Investment_Holding.account_id.in_(account_ids))
+        if rows:
+            stale = stale.filter(Plaid_Investment_Holding.holding_id.notin_(rows.keys()))
+        stale.delete(synchronize_session=False)
+
+    return len(rows)
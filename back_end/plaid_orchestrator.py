@@ -0,0 +1,257 @@
+"""
+Plaid syncs for linked items, with the independent calls run concurrently.
+
+A sync of one item (a Plaid_Items row) makes a single accounts_get, stores
+the bank and investment accounts from that one response, then fans out the
+transactions stage and the holdings stage on a thread pool. Each stage uses
+its own DB session. The sync takes roughly accounts_get plus the slower of
+the two stages, not the sum of every call. The outcome is recorded on the
+item (last_synced_at, last_sync_status, last_sync_error).
+
+sync_items runs several items, typically all of a user's, in parallel on a
+separate pool, so a user with several institutions waits for the slowest
+item rather than the sum of them.
+
+All calls go through the pooled clients in plaid_client, so they share its
+connection pool and timeout policy.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
+from plaid.model.accounts_get_request import AccountsGetRequest
+from plaid.model.transactions_get_request import TransactionsGetRequest
+
+from database import SessionLocal
+from models import Plaid_Item, Plaid_Bank_Account, Plaid_Investment
+from plaid_client import client, plaid_post, PLAID_CLIENT_ID, PLAID_SECRET
+from token_cache import token_cache, item_access_token
+from plaid_ingest import store_bank_accounts, store_investment_accounts, ingest_holdings, ingest_transactions
+from plaid_sync import sync_transactions
+from plaid_backfill import backfill_transactions
+
+RECENT_TRANSACTION_DAYS = 30  # Range re-fetched by the "get" transactions mode
+ITEM_SYNC_WORKERS = 8         # Items synced at once per process
+# Holdings errors that mean the item simply has no holdings; any other error fails the sync
+NO_HOLDINGS_ERROR_CODES = {"PRODUCTS_NOT_SUPPORTED", "NO_INVESTMENT_ACCOUNTS", "NO_INVESTMENT_AUTH_ACCOUNTS"}
+
+# Shared by every sync in the process; stages are I/O bound. Items get their
+# own pool: an item waits on its stages, so they must not share one.
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="plaid-sync")
+_item_pool = ThreadPoolExecutor(max_workers=ITEM_SYNC_WORKERS, thread_name_prefix="plaid-item")
+
+def fetch_holdings(access_token: str) -> Optional[Dict]:
+    """Holdings and securities for an item, or None if Plaid has none for it.
+    Other errors (login required, rate limits, outages) are raised."""
+    response = plaid_post("/investments/holdings/get", {"access_token": access_token})
+    if response.status_code == 200:
+        return response.json()
+    try:
+        error_code = response.json().get("error_code")
+    except ValueError:
+        error_code = None
+    if error_code in NO_HOLDINGS_ERROR_CODES:
+        print("Holdings not available:", error_code)
+        return None
+    raise RuntimeError(f"Holdings request failed with HTTP {response.status_code}: {error_code or response.text[:200]}")
+
+def _transactions_stage(user_id: int, access_token: str, item_id: str, mode: str):
+    if mode == "backfill":
+        progress = backfill_transactions(user_id, item_id, access_token)
+        if progress["status"] == "failed":
+            raise Exception("Some transaction backfill windows failed")
+        return progress
+
+    db = SessionLocal()
+    try:
+        if mode == "sync":
+            return sync_transactions(db, user_id, item_id, access_token)
+        end_date = datetime.now().date()
+        response = client.transactions_get(TransactionsGetRequest(
+            client_id=PLAID_CLIENT_ID,
+            secret=PLAID_SECRET,
+            access_token=access_token,
+            start_date=end_date - timedelta(days=RECENT_TRANSACTION_DAYS),
+            end_date=end_date,
+        )).to_dict()
+        written = ingest_transactions(db, user_id, response.get("transactions", []))
+        db.commit()
+        return {"fetched": written}
+    finally:
+        db.close()
+
+def _holdings_stage(access_token: str, investment_account_ids: List[str]):
+    holdings_data = fetch_holdings(access_token)
+    if holdings_data is None:
+        return None
+    db = SessionLocal()
+    try:
+        # Securities, holdings and removals are written in one transaction
+        written = ingest_holdings(
+            db, investment_account_ids, holdings_data.get("holdings", []), holdings_data.get("securities", [])
+        )
+        db.commit()
+        return written
+    finally:
+        db.close()
+
+def user_item_ids(user_id: int, token_type: Optional[str] = None) -> List[int]:
+    """Primary keys of the user's linked items, optionally only "bank" or "brokerage" links"""
+    db = SessionLocal()
+    try:
+        query = db.query(Plaid_Item.id).filter(Plaid_Item.user_id == user_id)
+        if token_type is not None:
+            query = query.filter(Plaid_Item.token_type == token_type)
+        return [item_pk for (item_pk,) in query.order_by(Plaid_Item.id)]
+    finally:
+        db.close()
+
+def _load_item(item_pk: int) -> Optional[Dict]:
+    db = SessionLocal()
+    try:
+        item = db.query(Plaid_Item).filter(Plaid_Item.id == item_pk).first()
+        if item is None:
+            return None
+        return {"user_id": item.user_id, "item_id": item.item_id, "token_type": item.token_type or "bank",
+                "access_token": item_access_token(item)}
+    finally:
+        db.close()
+
+def _update_item(item_pk: int, **fields):
+    db = SessionLocal()
+    try:
+        db.query(Plaid_Item).filter(Plaid_Item.id == item_pk).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def sync_item(item_pk: int, transactions: Optional[str] = None) -> Optional[Dict]:
+    """Refresh one item's accounts, and its transactions and holdings concurrently.
+
+    transactions selects the transactions stage for bank links: "backfill"
+    (full history for a new link), "sync" (cursor-based changes), "get" (the
+    last RECENT_TRANSACTION_DAYS) or None to skip it. Brokerage links only
+    import investments. Bank links store every account in Plaid_Bank_Account;
+    investment accounts of either kind also go to Plaid_Investment. The
+    holdings stage only runs when the item has investment accounts. Returns
+    None if the item is no longer linked; raises the first stage error after
+    both stages finish.
+
+    last_synced_at only moves when the item's transactions were synced (or,
+    for brokerage links, their holdings), so a holdings-only refresh does not
+    postpone the scheduled transactions sync. holdings_synced_at only moves
+    when the holdings stage ran.
+    """
+    item = _load_item(item_pk)
+    if item is None:
+        return None
+    user_id, access_token, token_type = item["user_id"], item["access_token"], item["token_type"]
+    if token_type != "bank":
+        transactions = None
+
+    try:
+        accounts_response = client.accounts_get(AccountsGetRequest(
+            client_id=PLAID_CLIENT_ID, secret=PLAID_SECRET, access_token=access_token
+        )).to_dict()
+        item_id = accounts_response["item"]["item_id"]
+        accounts_data = accounts_response.get("accounts", [])
+
+        db = SessionLocal()
+        try:
+            record = db.query(Plaid_Item).filter(Plaid_Item.id == item_pk).first()
+            if record is None:
+                return None  # Unlinked during the accounts call
+            if record.item_id != item_id:
+                # Items migrated from the single-token columns start with a placeholder id
+                token_cache.invalidate(user_id, record.item_id)
+                for model in (Plaid_Bank_Account, Plaid_Investment):
+                    db.query(model).filter(model.user_id == user_id, model.item_id == record.item_id).update(
+                        {"item_id": item_id}, synchronize_session=False
+                    )
+                record.item_id = item_id
+            record.institution_id = accounts_response["item"].get("institution_id") or record.institution_id
+            if token_type == "bank":
+                store_bank_accounts(db, user_id, accounts_data, item_id=item_id)
+            investment_account_ids = store_investment_accounts(db, user_id, accounts_data, item_id=item_id)
+            db.commit()
+        finally:
+            db.close()
+
+        futures = {}
+        if transactions:
+            futures["transactions"] = _pool.submit(_transactions_stage, user_id, access_token, item_id, transactions)
+        if investment_account_ids:
+            futures["holdings"] = _pool.submit(_holdings_stage, access_token, investment_account_ids)
+
+        result = {"item_id": item_id, "accounts": len(accounts_data), "transactions": None, "holdings": None}
+        errors = []
+        for stage, future in futures.items():
+            try:
+                result[stage] = future.result()
+            except Exception as e:
+                print(f"Plaid {stage} stage failed for user {user_id}, item {item_id}:", e)
+                errors.append(e)
+        if errors:
+            raise errors[0]
+    except Exception as e:
+        _update_item(item_pk, last_sync_status="error", last_sync_error=str(e), last_attempt_at=datetime.utcnow())
+        raise
+
+    now = datetime.utcnow()
+    synced = {"last_sync_status": "ok", "last_sync_error": None, "last_attempt_at": now}
+    if "transactions" in futures or token_type != "bank":
+        synced["last_synced_at"] = now
+    if "holdings" in futures:
+        synced["holdings_synced_at"] = now
+    _update_item(item_pk, **synced)
+    return result
+
+def for_items(fn: Callable[[int], Optional[Dict]], item_pks: List[int], raise_errors: bool = True) -> List[Dict]:
+    """Run fn(item_pk) for every item in parallel and collect the results.
+
+    Every item is attempted. With raise_errors the first error is raised
+    once all items finish (so a job retries); otherwise failed items appear
+    in the results as {"item_pk", "error"}.
+    """
+    futures = [(item_pk, _item_pool.submit(fn, item_pk)) for item_pk in item_pks]
+    results, errors = [], []
+    for item_pk, future in futures:
+        try:
+            result = future.result()
+        except Exception as e:
+            errors.append(e)
+            results.append({"item_pk": item_pk, "error": str(e)})
+            continue
+        if result is not None:
+            results.append(result)
+    if errors and raise_errors:
+        raise errors[0]
+    return results
+
+def sync_items(item_pks: List[int], transactions: Optional[str] = None, raise_errors: bool = True) -> List[Dict]:
+    """sync_item for several items in parallel"""
+    return for_items(lambda item_pk: sync_item(item_pk, transactions), item_pks, raise_errors)
+
+def refresh_item_balances(item_pk: int) -> Optional[Dict]:
+    """Store real-time balances for one bank item from /accounts/balance/get.
+    Every stored account of the item is stamped, including closed ones Plaid no
+    longer returns, so they do not keep the item stale."""
+    item = _load_item(item_pk)
+    if item is None:
+        return None
+    now = datetime.utcnow()
+    response = client.accounts_balance_get(AccountsBalanceGetRequest(
+        client_id=PLAID_CLIENT_ID, secret=PLAID_SECRET, access_token=item["access_token"]
+    )).to_dict()
+    accounts = response.get("accounts", [])
+    db = SessionLocal()
+    try:
+        store_bank_accounts(db, item["user_id"], accounts, balance_as_of=now, item_id=item["item_id"])
+        db.query(Plaid_Bank_Account).filter(
+            Plaid_Bank_Account.user_id == item["user_id"], Plaid_Bank_Account.item_id == item["item_id"]
+        ).update({"balance_as_of": now}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return {"item_id": item["item_id"], "accounts": len(accounts), "balance_as_of": now}
@@ -0,0 +1,106 @@
+"""
+Chunked removal of a user's Plaid data after /unlink.
+
+Deleting every account in one statement and letting the cascades remove years
+of transactions holds row locks on the hot Plaid tables for the whole delete.
+The purge job instead deletes children before parents:
+
+    category links -> transactions -> bank accounts -> holdings -> investment accounts
+
+Each table is deleted PURGE_CHUNK_ROWS rows at a time, in primary-key order,
+with a commit after every chunk, so each transaction only locks one chunk.
+Progress is reported through the job's result (see /import_jobs/{job_id}).
+The job's item_key scopes it to the accounts of one Plaid item; without it
+all of the user's Plaid data is purged.
+The job queue runs at most one job per user, so imports queued by a re-link
+wait until the purge is done.
+"""
+from typing import Callable, Dict, Optional
+
+from database import SessionLocal
+from models import (
+    Plaid_Bank_Account, Plaid_Transactions, Transaction_Category_Link,
+    Plaid_Investment, Plaid_Investment_Holding
+)
+from job_queue import register_handler, report_progress
+
+PURGE_JOB_KIND = "plaid_purge"
+PURGE_CHUNK_ROWS = 1000
+
+def _accounts(query, model, user_id: int, item_key: Optional[str]):
+    query = query.filter(model.user_id == user_id)
+    if item_key is not None:
+        return query.filter(model.item_id == item_key)
+    return query
+
+def _bank_account_ids(db, user_id: int, item_key: Optional[str]):
+    return _accounts(db.query(Plaid_Bank_Account.account_id), Plaid_Bank_Account, user_id, item_key)
+
+def _investment_account_ids(db, user_id: int, item_key: Optional[str]):
+    return _accounts(db.query(Plaid_Investment.account_id), Plaid_Investment, user_id, item_key)
+
+# (name, model, query for the ids of the user's rows) in deletion order
+PURGE_STEPS = [
+    ("category_links", Transaction_Category_Link, lambda db, user_id, item_key: (
+        db.query(Transaction_Category_Link.id)
+        .join(Plaid_Transactions, Plaid_Transactions.transaction_id == Transaction_Category_Link.transaction_id)
+        .filter(Plaid_Transactions.account_id.in_(_bank_account_ids(db, user_id, item_key)))
+    )),
+    ("transactions", Plaid_Transactions, lambda db, user_id, item_key: (
+        db.query(Plaid_Transactions.id)
+        .filter(Plaid_Transactions.account_id.in_(_bank_account_ids(db, user_id, item_key)))
+    )),
+    ("bank_accounts", Plaid_Bank_Account, lambda db, user_id, item_key: (
+        _accounts(db.query(Plaid_Bank_Account.id), Plaid_Bank_Account, user_id, item_key)
+    )),
+    ("holdings", Plaid_Investment_Holding, lambda db, user_id, item_key: (
+        db.query(Plaid_Investment_Holding.id)
+        .filter(Plaid_Investment_Holding.account_id.in_(_investment_account_ids(db, user_id, item_key)))
+    )),
+    ("investment_accounts", Plaid_Investment, lambda db, user_id, item_key: (
+        _accounts(db.query(Plaid_Investment.id), Plaid_Investment, user_id, item_key)
+    )),
+]
+
+def _purge_step(db, user_id: int, item_key: Optional[str], model, ids_query: Callable,
+                on_chunk: Callable[[int], None]) -> int:
+    deleted = 0
+    last_id = 0
+    while True:
+        # Select the chunk first: MySQL does not allow LIMIT in an IN (subquery) delete
+        ids = [row[0] for row in (
+            ids_query(db, user_id, item_key).filter(model.id > last_id).order_by(model.id).limit(PURGE_CHUNK_ROWS).all()
+        )]
+        if not ids:
+            return deleted
+        db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        deleted += len(ids)
+        last_id = ids[-1]
+        on_chunk(deleted)
+
+def purge_plaid_data(user_id: int, item_key: str = None, payload: Dict = None) -> Dict:
+    """Job handler: delete the user's Plaid accounts, transactions, links and holdings in chunks,
+    limited to one item's accounts when item_key is given"""
+    progress = {step: 0 for step, _, _ in PURGE_STEPS}
+    progress["step"] = None
+    db = SessionLocal()
+    try:
+        for step, model, ids_query in PURGE_STEPS:
+            progress["step"] = step
+
+            def on_chunk(deleted: int, step=step):
+                progress[step] = deleted
+                report_progress(user_id, progress)
+
+            progress[step] = _purge_step(db, user_id, item_key, model, ids_query, on_chunk)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    progress["step"] = "done"
+    print(f"[PURGE] Removed Plaid data for user {user_id}, item {item_key or 'all'}: {progress}")
+    return progress
+
+register_handler(PURGE_JOB_KIND, purge_plaid_data)
@@ -0,0 +1,201 @@
+"""
+Scheduled background refresh of Plaid data for every linked user.
+
+Once a minute, the process holding the "plaid_refresh" lease picks the
+users with linked items that are due and queues a plaid_scheduled_refresh
+job for each, listing the due items; the job syncs them in parallel. Active
+users are due after ACTIVE_REFRESH_HOURS and idle users after
+IDLE_REFRESH_HOURS. The most overdue users go first, and recently active users
+break ties. Items whose last sync failed (often a login that needs the user)
+are retried every FAILED_REFRESH_HOURS, measured from the failed attempt, so
+they cannot hold the queue and the in-flight slots. Each tick queues at most REFRESH_BUDGET_PER_MINUTE jobs and keeps
+at most REFRESH_MAX_IN_FLIGHT queued or running. Start times are jittered
+across the minute.
+
+Every sync records last_synced_at on its Plaid_Items row, so readers know
+how fresh the stored data is. Holdings refreshes (scheduled, webhook or
+queued by a stale /investments read) also record holdings_synced_at.
+
+Real-time balances are not part of the schedule: /accounts/balance/get is
+slow and billed per call. They are refreshed by plaid_balance_refresh jobs,
+queued by /user_balances only when the stored snapshot is older than
+BALANCE_MAX_AGE_MINUTES.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import SessionLocal
+from models import Users, Plaid_Item, Background_Job, Plaid_Bank_Account
+from plaid_client import PLAID_TRANSACTIONS_MODE, BALANCE_MAX_AGE_MINUTES
+from plaid_orchestrator import sync_items, for_items, refresh_item_balances, user_item_ids
+from job_queue import enqueue_job, register_handler
+from leader_election import LeaderLease
+
+REFRESH_JOB_KIND = "plaid_scheduled_refresh"
+BALANCE_JOB_KIND = "plaid_balance_refresh"
+SCHEDULER_TICK_SECONDS = 60
+REFRESH_BUDGET_PER_MINUTE = 20    # Refresh jobs queued per tick (each costs 2-3 Plaid calls)
+REFRESH_MAX_IN_FLIGHT = 10        # Refresh jobs queued or running at once
+ACTIVE_USER_DAYS = 7              # Users seen within this window count as active
+ACTIVE_REFRESH_HOURS = 1
+IDLE_REFRESH_HOURS = 24
+FAILED_REFRESH_HOURS = 24
+
+def _job_items(user_id: int, item_key: Optional[str], payload: Optional[Dict]) -> List[int]:
+    """Item primary keys a refresh job covers: payload["item_ids"], the item named
+    by item_key (or all "bank"/"brokerage" items, as queued by older versions),
+    or every item of the user. Items unlinked since the job was queued are dropped."""
+    item_pks = (payload or {}).get("item_ids")
+    if item_pks is None and item_key in ("bank", "brokerage"):
+        return user_item_ids(user_id, item_key)
+    db = SessionLocal()
+    try:
+        query = db.query(Plaid_Item.id).filter(Plaid_Item.user_id == user_id)
+        if item_pks is not None:
+            query = query.filter(Plaid_Item.id.in_(item_pks))
+        elif item_key is not None:
+            query = query.filter(Plaid_Item.item_id == item_key)
+        return [item_pk for (item_pk,) in query.order_by(Plaid_Item.id)]
+    finally:
+        db.close()
+
+def refresh_holdings(user_id: int, item_key: str, payload: Dict):
+    """Job handler: refresh investment accounts and holdings for the job's items"""
+    item_pks = _job_items(user_id, item_key, payload)
+    if not item_pks:
+        return None  # Unlinked since the job was queued
+    # Holdings are refreshed on every sync (when the item has investment accounts)
+    return sync_items(item_pks, transactions=None)
+
+def refresh_plaid_item(user_id: int, item_key: str, payload: Dict):
+    """Job handler: refresh the job's bank and brokerage items from Plaid, in parallel"""
+    item_pks = _job_items(user_id, item_key, payload)
+    if not item_pks:
+        return None
+    # Brokerage items skip the transactions stage
+    transactions = "sync" if PLAID_TRANSACTIONS_MODE == "sync" else "get"
+    return sync_items(item_pks, transactions=transactions)
+
+def stale_balance_items(db, user_id: int) -> List[int]:
+    """Linked bank items with no stored accounts yet, or whose balance snapshot is
+    older than BALANCE_MAX_AGE_MINUTES. Accounts of unlinked items are ignored."""
+    items = db.query(Plaid_Item.id, Plaid_Item.item_id).filter(
+        Plaid_Item.user_id == user_id, Plaid_Item.token_type == "bank"
+    ).all()
+    if not items:
+        return []
+    cutoff = datetime.utcnow() - timedelta(minutes=BALANCE_MAX_AGE_MINUTES)
+    stale, fresh = set(), set()
+    for item_id, balance_as_of in db.query(Plaid_Bank_Account.item_id, Plaid_Bank_Account.balance_as_of).filter(
+        Plaid_Bank_Account.user_id == user_id, Plaid_Bank_Account.item_id.in_([item.item_id for item in items])
+    ):
+        (stale if balance_as_of is None or balance_as_of < cutoff else fresh).add(item_id)
+    return [item.id for item in items if item.item_id in stale or item.item_id not in fresh]
+
+def balances_stale(db, user_id: int) -> bool:
+    """True if any linked bank item's stored balances are older than BALANCE_MAX_AGE_MINUTES"""
+    return bool(stale_balance_items(db, user_id))
+
+def refresh_balances(user_id: int, item_key: str = None, payload: Dict = None):
+    """Job handler: store real-time balances, unless the snapshot is still fresh"""
+    db = SessionLocal()
+    try:
+        item_pks = stale_balance_items(db, user_id)
+    finally:
+        db.close()
+    if not item_pks:
+        return None
+    return for_items(refresh_item_balances, item_pks)
+
+register_handler(REFRESH_JOB_KIND, refresh_plaid_item)
+register_handler("plaid_holdings_refresh", refresh_holdings)
+register_handler(BALANCE_JOB_KIND, refresh_balances)
+
+def due_refreshes(db, now: datetime) -> List[Dict]:
+    """Users with linked items that are due, with those items, most overdue first"""
+    items = db.query(
+        Plaid_Item.id, Plaid_Item.user_id, Plaid_Item.last_synced_at, Plaid_Item.last_sync_status,
+        Plaid_Item.last_attempt_at, Users.last_active_at
+    ).join(Users, Users.id == Plaid_Item.user_id).all()
+
+    active_since = now - timedelta(days=ACTIVE_USER_DAYS)
+    due: Dict[int, Dict] = {}
+    for item in items:
+        active = item.last_active_at is not None and item.last_active_at >= active_since
+        interval = timedelta(hours=ACTIVE_REFRESH_HOURS if active else IDLE_REFRESH_HOURS)
+        last_synced: Optional[datetime] = item.last_synced_at
+        if item.last_sync_status == "error":
+            # Back off from the failed attempt instead of growing more overdue every tick
+            interval = timedelta(hours=FAILED_REFRESH_HOURS)
+            last_synced = item.last_attempt_at or last_synced
+        overdue = float("inf") if last_synced is None else (now - last_synced) / interval
+        if overdue < 1:
+            continue
+        refresh = due.setdefault(item.user_id, {
+            "user_id": item.user_id,
+            "item_ids": [],
+            "overdue": overdue,
+            "last_active_at": item.last_active_at or datetime.min,
+        })
+        refresh["item_ids"].append(item.id)
+        # The most overdue item decides the user's place in the queue
+        refresh["overdue"] = max(refresh["overdue"], overdue)
+    return sorted(due.values(), key=lambda d: (d["overdue"], d["last_active_at"]), reverse=True)
+
+class PlaidRefreshScheduler:
+    def __init__(self):
+        self.lease = LeaderLease("plaid_refresh")
+        self.is_running = False
+        self._thread = None
+
+    def tick(self) -> int:
+        """Queue this minute's refresh jobs; returns how many were queued"""
+        db = SessionLocal()
+        try:
+            live_jobs = db.query(Background_Job.user_id).filter(
+                Background_Job.kind == REFRESH_JOB_KIND, Background_Job.status.in_(["queued", "running"])
+            ).all()
+            slots = min(REFRESH_BUDGET_PER_MINUTE, REFRESH_MAX_IN_FLIGHT - len(live_jobs))
+            if slots <= 0:
+                return 0
+            live = {job.user_id for job in live_jobs}
+            due = [d for d in due_refreshes(db, datetime.utcnow()) if d["user_id"] not in live]
+        finally:
+            db.close()
+
+        for refresh in due[:slots]:
+            enqueue_job(
+                REFRESH_JOB_KIND, refresh["user_id"], payload={"item_ids": refresh["item_ids"]},
+                delay_seconds=random.uniform(0, SCHEDULER_TICK_SECONDS)
+            )
+        queued = min(slots, len(due))
+        if queued:
+            print(f"[REFRESH] Queued {queued} of {len(due)} due Plaid refreshes")
+        return queued
+
+    def _loop(self):
+        while self.is_running:
+            if self.lease.is_leader:
+                try:
+                    self.tick()
+                except Exception as e:
+                    print("[REFRESH] Scheduler tick failed:", e)
+            time.sleep(SCHEDULER_TICK_SECONDS)
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.lease.start()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self.lease.stop()
+
+# Global instance
+plaid_refresh_scheduler = PlaidRefreshScheduler()
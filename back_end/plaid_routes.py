@@ -1,48 +1,33 @@
-import os
+from typing import Optional
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from cryptography.fernet import Fernet
-from plaid.api import plaid_api
 from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.products import Products
 from plaid.model.country_code import CountryCode
+from plaid.model.link_token_transactions import LinkTokenTransactions
 from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
 from plaid.model.accounts_get_request import AccountsGetRequest
-from plaid.model.transactions_get_request import TransactionsGetRequest
-from plaid.configuration import Configuration
-from plaid.api_client import ApiClient
 from database import SessionLocal
 from models import Users
 from auth import get_current_user
-from dotenv import load_dotenv
-from models import Users, Plaid_Bank_Account, Plaid_Transactions, User_Categories, Transaction_Category_Link, Plaid_Investment, Plaid_Investment_Holding
+from models import Users, Plaid_Investment, Plaid_Investment_Holding, Securities, Plaid_Item
 from datetime import datetime, timedelta
-from datetime import date
-from user_categories import create_user_category, UserCategoryCreate
-import requests
-import json
-
-# Load environment variables from .env file
-load_dotenv()
+from plaid_client import (
+    client, PLAID_CLIENT_ID, PLAID_SECRET, PLAID_TRANSACTIONS_MODE, PLAID_WEBHOOK_URL,
+    INVESTMENTS_MAX_AGE_MINUTES,
+    encrypt_token
+)
+from token_cache import token_cache, item_access_token
+from plaid_backfill import backfill_status, BACKFILL_DAYS_REQUESTED, BACKFILL_JOB_KIND
+from plaid_orchestrator import sync_item, sync_items, user_item_ids
+from plaid_purge import PURGE_JOB_KIND
+from job_queue import enqueue_job, get_job, list_jobs, register_handler
+import plaid
 
 router = APIRouter()
 
-# Plaid Credentials from environment variables
-PLAID_CLIENT_ID = os.getenv("PLAID_CLIENT_ID")
-PLAID_SECRET = os.getenv("PLAID_SECRET")
-PLAID_ENVIRONMENT = os.getenv("PLAID_ENVIRONMENT", "sandbox")  # default to sandbox if not set
-
-if not all([PLAID_CLIENT_ID, PLAID_SECRET]):
-    raise Exception("Plaid credentials are not fully set in the environment variables.")
-
-configuration = Configuration(
-    host=f"https://{PLAID_ENVIRONMENT}.plaid.com"
-)
-api_client = ApiClient(configuration)
-client = plaid_api.PlaidApi(api_client)
-
 # Dependency for Database Session
 def get_db():
     db = SessionLocal()
@@ -51,22 +36,12 @@ def get_db():
     finally:
         db.close()
 
-# Token encryption & decryption using a fixed key from .env
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
-if not ENCRYPTION_KEY:
-    raise Exception("ENCRYPTION_KEY not set in environment variables")
-cipher_suite = Fernet(ENCRYPTION_KEY.encode())
-
-def encrypt_token(token: str) -> str:
-    return cipher_suite.encrypt(token.encode()).decode()
-
-def decrypt_token(encrypted_token: str) -> str:
-    return cipher_suite.decrypt(encrypted_token.encode()).decode()
-
 # Pydantic Model for Public Token Request
 class PublicTokenRequest(BaseModel):
     public_token: str
     account_type: str  # "bank" or "brokerage"
+    institution_id: Optional[str] = None    # From Link's onSuccess metadata, if the frontend sends it
+    institution_name: Optional[str] = None
 
 @router.post("/create_link_token")
 async def create_link_token(user: dict = Depends(get_current_user)):
@@ -80,9 +55,13 @@ async def create_link_token(user: dict = Depends(get_current_user)):
             "user": {"client_user_id": str(user["id"])},
             "client_name": "MyApp",
             "products": [Products("auth"), Products("transactions"), Products("investments")],
+            # Without this Plaid only makes 90 days available and older backfill windows come back empty
+            "transactions": LinkTokenTransactions(days_requested=BACKFILL_DAYS_REQUESTED),
             "country_codes": [CountryCode("US")],
             "language": "en",
         }
+        if PLAID_WEBHOOK_URL:
+            request_data["webhook"] = PLAID_WEBHOOK_URL
 
         request = LinkTokenCreateRequest(**request_data)
         response = client.link_token_create(request)
@@ -90,161 +69,37 @@ async def create_link_token(user: dict = Depends(get_current_user)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def fetch_and_store_accounts(user_id: int):
-    """Background task to fetch Plaid accounts for this user and store them in Plaid_Bank_Account."""
+def import_plaid_item(user_id: int, item_key: str, payload: dict):
+    """Background job to import a newly linked item.
+    Bank links get accounts, full transaction history and holdings; brokerage links
+    get investment accounts and holdings. Errors are raised so the job queue can retry."""
     db = SessionLocal()
     try:
-        # 1) Retrieve user & decrypt token
-        db_user = db.query(Users).filter(Users.id == user_id).first()
-        if not db_user or not db_user.plaid_access_token:
-            return  # user or token missing
-
-        decrypted_access_token = decrypt_token(db_user.plaid_access_token)
-
-        # 2) Fetch accounts
-        accounts_request = AccountsGetRequest(
-            client_id=PLAID_CLIENT_ID,
-            secret=PLAID_SECRET,
-            access_token=decrypted_access_token
-        )
-        accounts_response = client.accounts_get(accounts_request)
-        accounts_data = accounts_response.to_dict().get("accounts", [])
-
-        # 3) Save accounts
-        for acc in accounts_data:
-            # Check if this account already exists
-            existing_account = (
-                db.query(Plaid_Bank_Account)
-                .filter_by(account_id=acc["account_id"])
-                .first()
-            )
-            if existing_account:
-                # Optionally update balances, etc.
-                existing_account.current_balance = acc["balances"].get("current")
-                existing_account.available_balance = acc["balances"].get("available")
-                existing_account.currency = acc["balances"].get("iso_currency_code")
-                existing_account.name = acc["name"]
-                existing_account.type = acc["type"]
-                existing_account.subtype = acc.get("subtype")
-            else:
-                # Create a new bank account record
-                new_account = Plaid_Bank_Account(
-                    user_id=user_id,
-                    account_id=acc["account_id"],
-                    name=acc["name"],
-                    type=acc["type"],
-                    subtype=acc.get("subtype"),
-                    current_balance=acc["balances"].get("current"),
-                    available_balance=acc["balances"].get("available"),
-                    currency=acc["balances"].get("iso_currency_code"),
-                )
-                db.add(new_account)
-        db.commit()
-
-        # 4) Now fetch transactions for these accounts
-        #    You can fetch them in one call or multiple calls per account.
-        fetch_and_store_transactions(db, decrypted_access_token)
-        
-        # 5) Fetch investment data
-        fetch_and_store_investments(db, decrypted_access_token, user_id)
-
-    except Exception as e:
-        print("Error fetching/storing accounts:", e)
+        item = db.query(Plaid_Item.id).filter(Plaid_Item.user_id == user_id, Plaid_Item.item_id == item_key).first()
     finally:
         db.close()
+    if item is None:
+        return None  # Unlinked since the job was queued
 
-def fetch_and_store_transactions(db: Session, decrypted_access_token: str):
-    """Fetch transactions for the last 30 days and store them in Plaid_Transactions."""
     try:
-        # 1) Prepare date range
-        end_date = datetime.now().date()
-        start_date = (datetime.now() - timedelta(days=30)).date()
-
-        # 2) Fetch transactions
-        transactions_request = TransactionsGetRequest(
-            client_id=PLAID_CLIENT_ID,
-            secret=PLAID_SECRET,
-            access_token=decrypted_access_token,
-            start_date=start_date,
-            end_date=end_date,
-        )
-        transactions_response = client.transactions_get(transactions_request)
-        transactions_data = transactions_response.to_dict().get("transactions", [])
-
-        # 3) Store each transaction
-        for t in transactions_data:
-            existing_tx = (
-                db.query(Plaid_Transactions)
-                .filter_by(transaction_id=t["transaction_id"])
-                .first()
-            )
-            if existing_tx:
-                continue  # or update if you prefer
-
-            # If Plaid returns the date as a string, parse it:
-            tx_date = (
-                t["date"]
-                if isinstance(t["date"], date)
-                else datetime.strptime(t["date"], "%Y-%m-%d").date()
-            )
-
-            # Get category from personal_finance_category if available
-            category = None
-            if t.get("personal_finance_category"):
-                category = t["personal_finance_category"].get("primary")
-            elif t.get("category"):
-                category = t["category"][0] if t["category"] else None 
-
-            new_tx = Plaid_Transactions(
-                transaction_id=t["transaction_id"],
-                account_id=t["account_id"],  # references Plaid_Bank_Account.account_id
-                amount=t["amount"],
-                currency=t.get("iso_currency_code"),
-                category=category,
-                merchant_name=t.get("merchant_name"),
-                date=tx_date,
-            )
-            db.add(new_tx)
-            db.flush()  # Flush to get the transaction ID
-            
-            # Handle category linking
-            if category:
-                # Check if the user already has a category with this name
-                bank_account = db.query(Plaid_Bank_Account).filter_by(account_id=t["account_id"]).first()
-                if not bank_account:
-                    continue
-
-                user_id = bank_account.user_id
-                user_category = (
-                    db.query(User_Categories)
-                    .filter_by(user_id=user_id, name=category)
-                    .first()
-                )
-
-                # If the category doesn't exist, create it
-                if not user_category:
-                    try:
-                        category_data = UserCategoryCreate(name=category, color="#000000", weekly_limit=None)
-                        user_category = create_user_category(user_id, category_data, db)
-                        db.flush()  # Flush to get the category ID
-                    except HTTPException:
-                        continue  # Skip this transaction and proceed to the next one
-
-                # Create a Transaction_Category_Link
-                category_link = Transaction_Category_Link(
-                    transaction_id=new_tx.transaction_id,
-                    category_id=user_category.id,
-                )
-                db.add(category_link)
-        db.commit()
+        # Transactions backfill and holdings run concurrently off one accounts_get
+        result = sync_item(item.id, transactions="backfill")
+        if result is None:
+            return None
+        backfill = result["transactions"]
+        return {"item_id": result["item_id"], "accounts": result["accounts"],
+                "transactions": backfill["fetched"] if backfill else 0, "backfill": backfill}
     except Exception as e:
-        db.rollback()
-        print("Error importing transactions:", e)
+        print("Error importing Plaid item:", e)
+        raise
+
+# Durable import jobs run by the worker pool in job_queue
+register_handler(BACKFILL_JOB_KIND, import_plaid_item)
+register_handler("plaid_brokerage_import", import_plaid_item)
 
 @router.post("/exchange_public_token")
 async def exchange_public_token(
     request: PublicTokenRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
@@ -257,261 +112,174 @@ async def exchange_public_token(
         )
         exchange_response = client.item_public_token_exchange(exchange_request)
         access_token = exchange_response["access_token"]
+        item_id = exchange_response["item_id"]
 
         # Encrypt before storing
         encrypted_access_token = encrypt_token(access_token)
 
-        # Store the encrypted access token in the database
         db_user = db.query(Users).filter(Users.id == user["id"]).first()
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Store token based on account type
-        if request.account_type == "brokerage":
-            db_user.plaid_brokerage_access_token = encrypted_access_token
-        else:  # bank
-            db_user.plaid_access_token = encrypted_access_token
+        # Each link is its own item; linking another institution adds a row instead of replacing a token
+        token_type = "brokerage" if request.account_type == "brokerage" else "bank"
+        item = db.query(Plaid_Item).filter(Plaid_Item.item_id == item_id).first()
+        if item is None:
+            item = Plaid_Item(user_id=user["id"], item_id=item_id)
+            db.add(item)
+        item.token_type = token_type
+        item.access_token = encrypted_access_token
+        item.institution_id = request.institution_id or item.institution_id
+        item.institution_name = request.institution_name or item.institution_name
         
         db.commit()
+        token_cache.invalidate(user["id"], item_id)
 
-        # Schedule the appropriate data import as a background task
+        # Queue the appropriate data import as a durable background job
         if request.account_type == "brokerage":
-            background_tasks.add_task(fetch_and_store_investments, user["id"])
+            job = enqueue_job("plaid_brokerage_import", user["id"], item_key=item_id)
         else:  # bank
-            background_tasks.add_task(fetch_and_store_accounts, user["id"])
+            job = enqueue_job(BACKFILL_JOB_KIND, user["id"], item_key=item_id)
 
-        return {"status": "success", "message": f"{request.account_type.capitalize()} account connected successfully"}
+        return {
+            "status": "success",
+            "message": f"{request.account_type.capitalize()} account connected successfully",
+            "job_id": job["job_id"]
+        }
 
-    except PlaidError as e:
+    except plaid.ApiException as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/import_jobs")
+async def get_import_jobs(user: dict = Depends(get_current_user)):
+    """Recent Plaid import jobs for the current user."""
+    return {"jobs": list_jobs(user["id"])}
+
+@router.get("/import_jobs/{job_id}")
+async def get_import_job(job_id: int, user: dict = Depends(get_current_user)):
+    """Status of one Plaid import job."""
+    job = get_job(job_id, user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/backfill_status")
+def get_backfill_status(user: dict = Depends(get_current_user)):
+    """Progress of the historical transaction import started when each bank item was linked."""
+    items = backfill_status(user["id"])
+    if not items:
+        raise HTTPException(status_code=404, detail="No transaction backfill has run for this account")
+    return {"items": items}
+
+
 @router.get("/accounts")
 async def get_accounts(
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
+    """Live accounts from every linked bank item"""
     try:
-        db_user = db.query(Users).filter(Users.id == user["id"]).first()
-        if not db_user or not db_user.plaid_access_token:
+        items = db.query(Plaid_Item).filter(Plaid_Item.user_id == user["id"], Plaid_Item.token_type == "bank").all()
+        if not items:
             raise HTTPException(status_code=400, detail="No Plaid account linked")
 
-        # Decrypt the stored Plaid token
-        decrypted_access_token = decrypt_token(db_user.plaid_access_token)
-
-        # Create a request object including client_id and secret
-        request_obj = AccountsGetRequest(
-            client_id=PLAID_CLIENT_ID,
-            secret=PLAID_SECRET,
-            access_token=decrypted_access_token
-        )
-
-        # Call the accounts_get endpoint on the client
-        response = client.accounts_get(request_obj)
-        return response.to_dict()
+        accounts, item_data = [], []
+        for item in items:
+            # Create a request object including client_id and secret
+            request_obj = AccountsGetRequest(
+                client_id=PLAID_CLIENT_ID,
+                secret=PLAID_SECRET,
+                access_token=item_access_token(item)
+            )
+            response = client.accounts_get(request_obj).to_dict()
+            accounts.extend(response.get("accounts", []))
+            item_data.append(response["item"])
+        return {"accounts": accounts, "items": item_data}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/refresh_bank_data", status_code=status.HTTP_200_OK)
-async def refresh_bank_data(
+def refresh_bank_data(
     db: Session = Depends(get_db), 
     user: dict = Depends(get_current_user)
 ):
     """
     Refreshes the user's bank account and transaction data from Plaid.
-    This endpoint will:
+    This endpoint will, for every linked bank item in parallel:
       - Re-fetch and update bank account information in Plaid_Bank_Account.
-      - Re-fetch and insert new transactions in Plaid_Transactions (for the past 30 days).
+      - Apply transaction changes since the last sync (or, with PLAID_TRANSACTIONS_MODE=get,
+        re-fetch and insert new transactions for the past 30 days).
+    Items that fail are listed under "errors"; the others are still refreshed.
     """
     try:
-        db_user = db.query(Users).filter(Users.id == user["id"]).first()
-        if not db_user or not db_user.plaid_access_token:
+        item_pks = user_item_ids(user["id"], "bank")
+        if not item_pks:
             raise HTTPException(status_code=400, detail="Plaid account not linked.")
 
-        # Decrypt the stored Plaid token
-        decrypted_access_token = decrypt_token(db_user.plaid_access_token)
-
-        # Refresh Bank Accounts
-        try:
-            accounts_request = AccountsGetRequest(
-                client_id=PLAID_CLIENT_ID,
-                secret=PLAID_SECRET,
-                access_token=decrypted_access_token
-            )
-            accounts_response = client.accounts_get(accounts_request)
-            accounts_data = accounts_response.to_dict().get("accounts", [])
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error fetching accounts: {str(e)}")
-
-        for acc in accounts_data:
-            # Upsert account record based on the unique account_id
-            existing_account = (
-                db.query(Plaid_Bank_Account)
-                .filter(Plaid_Bank_Account.account_id == acc["account_id"])
-                .first()
-            )
-            if existing_account:
-                # Update account details
-                existing_account.name = acc["name"]
-                existing_account.type = acc["type"]
-                existing_account.subtype = acc.get("subtype")
-                existing_account.current_balance = acc["balances"].get("current")
-                existing_account.available_balance = acc["balances"].get("available")
-                existing_account.currency = acc["balances"].get("iso_currency_code")
-            else:
-                new_account = Plaid_Bank_Account(
-                    user_id=user["id"],
-                    account_id=acc["account_id"],
-                    name=acc["name"],
-                    type=acc["type"],
-                    subtype=acc.get("subtype"),
-                    current_balance=acc["balances"].get("current"),
-                    available_balance=acc["balances"].get("available"),
-                    currency=acc["balances"].get("iso_currency_code")
-                )
-                db.add(new_account)
-        db.commit()
-
-        # Refresh Transactions (for the past 30 days)
-        try:
-            end_date = datetime.now().date()
-            start_date = (datetime.now() - timedelta(days=30)).date()
-            transactions_request = TransactionsGetRequest(
-                client_id=PLAID_CLIENT_ID,
-                secret=PLAID_SECRET,
-                access_token=decrypted_access_token,
-                start_date=start_date,
-                end_date=end_date
-            )
-            transactions_response = client.transactions_get(transactions_request)
-            transactions_data = transactions_response.to_dict().get("transactions", [])
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error fetching transactions: {str(e)}")
-
-        for t in transactions_data:
-            existing_tx = (
-                db.query(Plaid_Transactions)
-                .filter(Plaid_Transactions.transaction_id == t["transaction_id"])
-                .first()
-            )
-            if existing_tx:
-                continue
-
-            # Parse the transaction date if it is a string
-            try:
-                if isinstance(t["date"], str):
-                    tx_date = datetime.strptime(t["date"], "%Y-%m-%d").date()
-                else:
-                    tx_date = t["date"]
-            except Exception:
-                tx_date = None
-
-            # Get category from personal_finance_category if available
-            category = None
-            if t.get("personal_finance_category"):
-                category = t["personal_finance_category"].get("primary")
-            elif t.get("category"):
-
-                raw_category = t["category"][0] if t["category"] else None
-                if raw_category:
-                    # Convert to title case and replace underscores with spaces
-                    category = raw_category.replace("_", " ").title()
-
-            new_tx = Plaid_Transactions(
-                transaction_id=t["transaction_id"],
-                account_id=t["account_id"],  # This FK references Plaid_Bank_Account.account_id
-                amount=t["amount"],
-                currency=t.get("iso_currency_code"),
-                category=category,
-                merchant_name=t.get("merchant_name"),
-                date=tx_date
-            )
-            db.add(new_tx)
-            db.flush()  # Flush to get the transaction ID
-
-            # Handle category linking
-            if category:
-                # Check if the user already has a category with this name
-                bank_account = db.query(Plaid_Bank_Account).filter_by(account_id=t["account_id"]).first()
-                if not bank_account:
-                    continue
-
-                user_id = bank_account.user_id
-                user_category = (
-                    db.query(User_Categories)
-                    .filter_by(user_id=user_id, name=category)
-                    .first()
-                )
-
-                # If the category doesn't exist, create it
-                if not user_category:
-                    try:
-                        category_data = UserCategoryCreate(name=category, color="#000000", weekly_limit=None)
-                        user_category = create_user_category(user_id, category_data, db)
-                        db.flush()  # Flush to get the category ID
-                    except HTTPException:
-                        continue
-
-                # Create a Transaction_Category_Link
-                category_link = Transaction_Category_Link(
-                    transaction_id=new_tx.transaction_id,
-                    category_id=user_category.id,
-                )
-                db.add(category_link)
-
-        db.commit()
-        return {"message": "Bank accounts and transactions refreshed successfully."}
+        mode = "sync" if PLAID_TRANSACTIONS_MODE == "sync" else "get"
+        results = sync_items(item_pks, transactions=mode, raise_errors=False)
+        errors = [r for r in results if "error" in r]
+        if len(errors) == len(item_pks):
+            raise HTTPException(status_code=500, detail=f"Error refreshing Plaid data: {errors[0]['error']}")
+        return {
+            "message": "Bank accounts and transactions refreshed successfully.",
+            "items": [{"item_id": r["item_id"], "transactions": r["transactions"]} for r in results if "error" not in r],
+            "errors": errors
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/unlink")
 async def unlink_plaid(
+    item_id: Optional[str] = None,
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
-    """Remove the stored Plaid token and delete all Plaid-related data for the current user."""
+    """Remove stored Plaid items and queue deletion of their data.
+    Unlinks only item_id when given, otherwise every item of the current user.
+    The data is removed in chunks by a background purge job; poll /import_jobs/{job_id} for progress."""
     try:
         db_user = db.query(Users).filter(Users.id == user["id"]).first()
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Clear the Plaid access token
-        db_user.plaid_access_token = None
-
-        # Delete all bank accounts and their associated transactions
-        # (transactions will be deleted by cascade)
-        db.query(Plaid_Bank_Account).filter(
-            Plaid_Bank_Account.user_id == user["id"]
-        ).delete(synchronize_session=False)
-
-        # Delete all investment accounts and their associated holdings
-        # (holdings will be deleted by cascade)
-        db.query(Plaid_Investment).filter(
-            Plaid_Investment.user_id == user["id"]
-        ).delete(synchronize_session=False)
-
-        # Delete any orphaned transaction category links
-        db.query(Transaction_Category_Link).filter(
-            Transaction_Category_Link.transaction_id.in_(
-                db.query(Plaid_Transactions.transaction_id).filter(
-                    Plaid_Transactions.account_id.in_(
-                        db.query(Plaid_Bank_Account.account_id).filter(
-                            Plaid_Bank_Account.user_id == user["id"]
-                        )
-                    )
-                )
-            )
-        ).delete(synchronize_session=False)
+        # Forget the items (and their tokens), so webhooks for them are ignored
+        items = db.query(Plaid_Item).filter(Plaid_Item.user_id == user["id"])
+        if item_id is not None:
+            items = items.filter(Plaid_Item.item_id == item_id)
+            if items.first() is None:
+                raise HTTPException(status_code=404, detail="Plaid item not found")
+        # Also clear the legacy per-user token an item was migrated from, so a
+        # rollback to the single-token release does not bring the link back
+        unlinked_tokens = {token for (token,) in items.with_entities(Plaid_Item.access_token)}
+        if item_id is None or db_user.plaid_access_token in unlinked_tokens:
+            db_user.plaid_access_token = None
+        if item_id is None or db_user.plaid_brokerage_access_token in unlinked_tokens:
+            db_user.plaid_brokerage_access_token = None
+        items.delete(synchronize_session=False)
 
         db.commit()
+        token_cache.invalidate(user["id"], item_id)
+
+        # Accounts, transactions, category links and holdings are deleted in chunks
+        job = enqueue_job(PURGE_JOB_KIND, user["id"], item_key=item_id)
         
         return {
-            "message": "Plaid access token and all associated data (bank accounts, transactions, investments, and holdings) deleted. Please re-link your account."
+            "message": "Plaid access token removed. Bank accounts, transactions, investments, and holdings are being deleted. Please re-link your account.",
+            "job_id": job["job_id"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -519,193 +287,76 @@ async def unlink_plaid(
             detail=f"Error unlinking Plaid account: {str(e)}"
         )
 
-def fetch_and_store_investments(db: Session, decrypted_access_token: str, user_id: int):
-    """Fetch investment accounts and holdings from Plaid and store them in the database."""
-    try:
-        # 1. Get investment accounts
-        accounts_request = AccountsGetRequest(
-            client_id=PLAID_CLIENT_ID,
-            secret=PLAID_SECRET,
-            access_token=decrypted_access_token
-        )
-        accounts_response = client.accounts_get(accounts_request)
-        accounts_data = accounts_response.to_dict()
-        
-        # Filter for investment accounts
-        investment_accounts = [acc for acc in accounts_data.get("accounts", []) if acc.get("type") == "investment"]
-        
-        for acc in investment_accounts:
-            # Check if this investment account already exists
-            existing_account = (
-                db.query(Plaid_Investment)
-                .filter_by(account_id=acc["account_id"])
-                .first()
-            )
-            
-            if existing_account:
-                # Update account details
-                existing_account.name = acc["name"]
-                existing_account.type = acc["type"]
-                existing_account.subtype = acc.get("subtype")
-                existing_account.current_balance = acc["balances"].get("current")
-                existing_account.available_balance = acc["balances"].get("available")
-                existing_account.currency = acc["balances"].get("iso_currency_code")
-            else:
-                # Create a new investment account record
-                new_account = Plaid_Investment(
-                    user_id=user_id,
-                    account_id=acc["account_id"],
-                    name=acc["name"],
-                    type=acc["type"],
-                    subtype=acc.get("subtype"),
-                    current_balance=acc["balances"].get("current"),
-                    available_balance=acc["balances"].get("available"),
-                    currency=acc["balances"].get("iso_currency_code"),
-                )
-                db.add(new_account)
-        
-        db.commit()
-        
-        # 2. Get holdings and securities using direct REST API calls
-        headers = {
-            'Content-Type': 'application/json',
-            'PLAID-CLIENT-ID': PLAID_CLIENT_ID,
-            'PLAID-SECRET': PLAID_SECRET,
-        }
-        
-        payload = {
-            'client_id': PLAID_CLIENT_ID,
-            'secret': PLAID_SECRET,
-            'access_token': decrypted_access_token
-        }
-        
-        # Get holdings and securities data
-        securities_response = requests.post(
-            f'https://{PLAID_ENVIRONMENT}.plaid.com/investments/holdings/get',
-            headers=headers,
-            json=payload
-        )
-        
-        if securities_response.status_code == 200:
-            holdings_data = securities_response.json()
-            holdings = holdings_data.get('holdings', [])
-            securities = holdings_data.get('securities', [])
-            
-            # Create a map of security_id to security details
-            securities_map = {
-                security['security_id']: {
-                    'name': security.get('name', ''),
-                    'ticker_symbol': security.get('ticker_symbol', ''),
-                    'type': security.get('type', '')
-                }
-                for security in securities
-            }
-            
-            # Process holdings
-            for holding in holdings:
-                security_id = holding.get('security_id')
-                security = securities_map.get(security_id, {})
-                
-                # Check if this holding already exists
-                existing_holding = (
-                    db.query(Plaid_Investment_Holding)
-                    .filter_by(
-                        account_id=holding['account_id'],
-                        security_id=security_id
-                    )
-                    .first()
-                )
-                
-                holding_data = {
-                    'quantity': float(holding.get('quantity', 0)),
-                    'price': float(holding.get('institution_price', 0)),
-                    'value': float(holding.get('institution_value', 0)),
-                    'currency': holding.get('iso_currency_code'),
-                    'symbol': security.get('ticker_symbol', ''),
-                    'name': security.get('name', '')
-                }
-                
-                if existing_holding:
-                    # Update holding details
-                    for key, value in holding_data.items():
-                        setattr(existing_holding, key, value)
-                else:
-                    # Create a new holding record
-                    new_holding = Plaid_Investment_Holding(
-                        holding_id=f"{holding['account_id']}_{security_id}",
-                        account_id=holding['account_id'],
-                        security_id=security_id,
-                        **holding_data
-                    )
-                    db.add(new_holding)
-            
-            db.commit()
-                
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching investment data: {str(e)}")
-
-
 @router.get("/investments")
 async def get_investments(
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     """
-    Fetch and return the user's investment accounts and holdings from Plaid.
-    This endpoint will:
-    1. Get all investment accounts
-    2. Get all holdings for each investment account
-    3. Return the data in a structured format
+    Return the user's stored investment accounts and holdings.
+    Reads the database only; when any item's holdings are older than
+    INVESTMENTS_MAX_AGE_MINUTES a background refresh of those items is
+    queued and the stored data is returned meanwhile.
     """
     try:
-        # Get user's Plaid access token
-        db_user = db.query(Users).filter(Users.id == user["id"]).first()
-        if not db_user or not db_user.plaid_access_token:
+        items = db.query(
+            Plaid_Item.id, Plaid_Item.item_id, Plaid_Item.token_type, Plaid_Item.holdings_synced_at
+        ).filter(Plaid_Item.user_id == user["id"]).all()
+        if not items:
             raise HTTPException(status_code=400, detail="No Plaid account linked")
-        
-        # Decrypt the stored Plaid token
-        decrypted_access_token = decrypt_token(db_user.plaid_access_token)
-        
-        # Fetch and store investment data
-        fetch_and_store_investments(db, decrypted_access_token, user["id"])
-        
-        # Retrieve the stored investment data
-        investment_accounts = db.query(Plaid_Investment).filter(Plaid_Investment.user_id == user["id"]).all()
-        
-        result = []
-        for account in investment_accounts:
-            account_data = {
-                "account_id": account.account_id,
-                "name": account.name,
-                "type": account.type,
-                "subtype": account.subtype,
-                "current_balance": account.current_balance,
-                "available_balance": account.available_balance,
-                "currency": account.currency,
-                "holdings": []
-            }
-            
-            # Get holdings for this account
-            holdings = db.query(Plaid_Investment_Holding).filter(
-                Plaid_Investment_Holding.account_id == account.account_id
-            ).all()
-            
-            for holding in holdings:
-                holding_data = {
+
+        # Accounts, holdings and their securities in one query
+        rows = (
+            db.query(Plaid_Investment, Plaid_Investment_Holding, Securities)
+            .outerjoin(Plaid_Investment_Holding, Plaid_Investment_Holding.account_id == Plaid_Investment.account_id)
+            .outerjoin(Securities, Securities.security_id == Plaid_Investment_Holding.security_id)
+            .filter(Plaid_Investment.user_id == user["id"])
+            .order_by(Plaid_Investment.id)
+            .all()
+        )
+
+        accounts = {}
+        for account, holding, security in rows:
+            account_data = accounts.get(account.account_id)
+            if account_data is None:
+                account_data = accounts[account.account_id] = {
+                    "account_id": account.account_id,
+                    "name": account.name,
+                    "type": account.type,
+                    "subtype": account.subtype,
+                    "current_balance": account.current_balance,
+                    "available_balance": account.available_balance,
+                    "currency": account.currency,
+                    "holdings": []
+                }
+            if holding is not None:
+                account_data["holdings"].append({
                     "holding_id": holding.holding_id,
                     "security_id": holding.security_id,
-                    "symbol": holding.symbol,
-                    "name": holding.name,
+                    "symbol": security.ticker_symbol if security else None,
+                    "name": security.name if security else None,
                     "quantity": holding.quantity,
                     "price": holding.price,
                     "value": holding.value,
                     "currency": holding.currency
-                }
-                account_data["holdings"].append(holding_data)
-            
-            result.append(account_data)
-        
-        return {"investments": result}
+                })
+        result = list(accounts.values())
+
+        # Stale-while-revalidate: queue a refresh of the items whose holdings are too old.
+        # Bank items without investment accounts have no holdings to refresh.
+        investment_item_ids = {account.item_id for account, _, _ in rows}
+        holding_items = [item for item in items if item.token_type == "brokerage" or item.item_id in investment_item_ids]
+        cutoff = datetime.utcnow() - timedelta(minutes=INVESTMENTS_MAX_AGE_MINUTES)
+        stale = [item.id for item in holding_items if item.holdings_synced_at is None or item.holdings_synced_at < cutoff]
+        synced = [item.holdings_synced_at for item in holding_items if item.holdings_synced_at is not None]
+        synced_at = min(synced) if synced and len(synced) == len(holding_items) else None
+        refreshing = bool(stale)
+        if refreshing:
+            enqueue_job("plaid_holdings_refresh", user["id"], payload={"item_ids": stale})
+
+        return {"investments": result, "last_synced_at": synced_at, "refreshing": refreshing}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,259 @@
+"""
+Local Plaid-compatible stub for measuring the ingestion paths.
+
+Serves generated data for the endpoints the importers call:
+
+    /accounts/get, /accounts/balance/get, /transactions/get,
+    /transactions/sync and /investments/holdings/get
+
+Every access token gets its own deterministic item: ACCOUNTS depository
+accounts holding TRANSACTIONS transactions spread over the last HISTORY_DAYS
+days, plus INVESTMENT_ACCOUNTS investment accounts sharing HOLDINGS holdings.
+Security ids are shared across tokens, like real Plaid securities. Each
+request sleeps for the configured latency before answering. Responses follow
+Plaid's schemas closely enough for the generated plaid-python client.
+
+    python plaid_stub.py --transactions 20000 --latency-ms 150
+    PLAID_HOST=http://127.0.0.1:8765 uvicorn main:app
+
+ingest_benchmark.py starts the stub in-process.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+DEFAULT_PORT = 8765
+HISTORY_DAYS = 730
+CATEGORIES = [
+    ("FOOD_AND_DRINK", "FOOD_AND_DRINK_RESTAURANT"),
+    ("GENERAL_MERCHANDISE", "GENERAL_MERCHANDISE_ONLINE_MARKETPLACES"),
+    ("TRANSPORTATION", "TRANSPORTATION_GAS"),
+    ("RENT_AND_UTILITIES", "RENT_AND_UTILITIES_GAS_AND_ELECTRICITY"),
+    ("ENTERTAINMENT", "ENTERTAINMENT_TV_AND_MOVIES"),
+    ("INCOME", "INCOME_WAGES"),
+]
+MERCHANTS = ["Starbucks", "Amazon", "Shell", "Uber", "Netflix", "Whole Foods", "Target", "Delta", None]
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "VOO", "VTI", "QQQ", "SPY", "BRK.B"]
+
+def _balances(current: float) -> Dict:
+    return {
+        "available": current, "current": current, "limit": None,
+        "iso_currency_code": "USD", "unofficial_currency_code": None, "last_updated_datetime": None,
+    }
+
+def _account(account_id: str, name: str, account_type: str, subtype: str, current: float) -> Dict:
+    return {
+        "account_id": account_id, "balances": _balances(current), "mask": account_id[-4:],
+        "name": name, "official_name": name, "type": account_type, "subtype": subtype,
+    }
+
+def _transaction(account_id: str, transaction_id: str, day: date, amount: float, rng: random.Random) -> Dict:
+    primary, detailed = rng.choice(CATEGORIES)
+    merchant = rng.choice(MERCHANTS)
+    name = merchant or "Transfer"
+    return {
+        "account_id": account_id, "account_owner": None, "amount": amount,
+        "iso_currency_code": "USD", "unofficial_currency_code": None,
+        "category": [primary.replace("_", " ").title()], "category_id": "13005000", "check_number": None,
+        "counterparties": [], "date": day.isoformat(), "datetime": None,
+        "authorized_date": day.isoformat(), "authorized_datetime": None,
+        "location": {
+            "address": None, "city": None, "region": None, "postal_code": None,
+            "country": None, "lat": None, "lon": None, "store_number": None,
+        },
+        "logo_url": None, "merchant_entity_id": None, "merchant_name": merchant, "name": name,
+        "original_description": None,
+        "payment_meta": {
+            "by_order_of": None, "payee": None, "payer": None, "payment_method": None,
+            "payment_processor": None, "ppd_id": None, "reason": None, "reference_number": None,
+        },
+        "payment_channel": "in store", "pending": False, "pending_transaction_id": None,
+        "personal_finance_category": {"primary": primary, "detailed": detailed, "confidence_level": "HIGH"},
+        "transaction_code": None,
+        "transaction_id": transaction_id, "transaction_type": "place", "website": None,
+    }
+
+def _security(ticker: str) -> Dict:
+    return {
+        "security_id": f"sec-{ticker}", "isin": None, "cusip": None, "sedol": None,
+        "institution_security_id": None, "institution_id": None, "proxy_security_id": None,
+        "name": f"{ticker} Stub Security", "ticker_symbol": ticker, "is_cash_equivalent": False,
+        "type": "equity", "close_price": 100.0, "close_price_as_of": None, "update_datetime": None,
+        "iso_currency_code": "USD", "unofficial_currency_code": None, "market_identifier_code": None,
+        "sector": None, "industry": None, "option_contract": None, "fixed_income": None,
+    }
+
+class StubItem:
+    """Generated accounts, transactions and holdings for one access token"""
+
+    def __init__(self, access_token: str, accounts: int, investment_accounts: int, transactions: int, holdings: int):
+        seed = int(hashlib.sha256(access_token.encode()).hexdigest()[:12], 16)
+        rng = random.Random(seed)
+        prefix = f"{seed:012x}"
+        self.item = {
+            "item_id": f"item-{prefix}", "institution_id": "ins_stub", "webhook": None, "error": None,
+            "available_products": [], "billed_products": ["transactions", "investments"],
+            "products": ["transactions", "investments"], "consented_products": [],
+            "consent_expiration_time": None, "update_type": "background",
+        }
+        self.accounts = [
+            _account(f"acc-{prefix}-{i:04d}", f"Checking {i}", "depository", "checking", round(rng.uniform(100, 20000), 2))
+            for i in range(accounts)
+        ] + [
+            _account(f"inv-{prefix}-{i:04d}", f"Brokerage {i}", "investment", "brokerage", 0.0)
+            for i in range(investment_accounts)
+        ]
+
+        today = date.today()
+        self.transactions: List[Dict] = []  # Newest first, like transactions/get
+        if accounts:
+            for i in range(transactions):
+                day = today - timedelta(days=int(i * HISTORY_DAYS / max(transactions, 1)))
+                account_id = self.accounts[i % accounts]["account_id"]
+                self.transactions.append(
+                    _transaction(account_id, f"txn-{prefix}-{i:08d}", day, round(rng.uniform(-2000, 500), 2), rng)
+                )
+
+        self.holdings: List[Dict] = []
+        self.securities: Dict[str, Dict] = {}
+        investment_ids = [a["account_id"] for a in self.accounts if a["type"] == "investment"]
+        for i in range(holdings if investment_ids else 0):
+            ticker = TICKERS[i % len(TICKERS)] if i < len(TICKERS) else f"STB{i:04d}"
+            security = self.securities.setdefault(ticker, _security(ticker))
+            quantity = round(rng.uniform(1, 200), 4)
+            self.holdings.append({
+                "account_id": investment_ids[i % len(investment_ids)], "security_id": security["security_id"],
+                "institution_price": 100.0, "institution_price_as_of": None, "institution_price_datetime": None,
+                "institution_value": round(quantity * 100.0, 2), "cost_basis": None, "quantity": quantity,
+                "iso_currency_code": "USD", "unofficial_currency_code": None,
+                "vested_quantity": None, "vested_value": None,
+            })
+
+class PlaidStub:
+    def __init__(self, accounts: int = 3, investment_accounts: int = 1, transactions: int = 5000,
+                 holdings: int = 50, latency_ms: float = 0):
+        self.sizes = dict(accounts=accounts, investment_accounts=investment_accounts,
+                          transactions=transactions, holdings=holdings)
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._items: Dict[str, StubItem] = {}
+        self._lock = threading.Lock()
+
+    def item(self, access_token: str) -> StubItem:
+        with self._lock:
+            self.requests += 1
+            item = self._items.get(access_token)
+            if item is None:
+                item = self._items[access_token] = StubItem(access_token, **self.sizes)
+            return item
+
+    def _request_id(self) -> str:
+        return f"stub-{self.requests}"
+
+    def accounts_get(self, body: Dict) -> Dict:
+        item = self.item(body["access_token"])
+        return {"accounts": item.accounts, "item": item.item, "request_id": self._request_id()}
+
+    def transactions_get(self, body: Dict) -> Dict:
+        item = self.item(body["access_token"])
+        start, end = body["start_date"], body["end_date"]
+        options = body.get("options") or {}
+        count, offset = min(options.get("count", 100), 500), options.get("offset", 0)
+        in_range = [t for t in item.transactions if start <= t["date"] <= end]
+        return {
+            "accounts": item.accounts, "item": item.item, "transactions": in_range[offset:offset + count],
+            "total_transactions": len(in_range), "request_id": self._request_id(),
+        }
+
+    def transactions_sync(self, body: Dict) -> Dict:
+        item = self.item(body["access_token"])
+        cursor = body.get("cursor")
+        offset = len(item.transactions) if cursor == "now" else int(cursor or 0)
+        count = min(body.get("count", 100), 500)
+        page = item.transactions[offset:offset + count]
+        next_offset = offset + len(page)
+        return {
+            "accounts": item.accounts, "added": page, "modified": [], "removed": [],
+            "next_cursor": str(next_offset), "has_more": next_offset < len(item.transactions),
+            "transactions_update_status": "HISTORICAL_UPDATE_COMPLETE", "request_id": self._request_id(),
+        }
+
+    def holdings_get(self, body: Dict) -> Dict:
+        item = self.item(body["access_token"])
+        return {
+            "accounts": [a for a in item.accounts if a["type"] == "investment"], "item": item.item,
+            "holdings": item.holdings, "securities": list(item.securities.values()),
+            "request_id": self._request_id(),
+        }
+
+    def routes(self) -> Dict:
+        return {
+            "/accounts/get": self.accounts_get,
+            "/accounts/balance/get": self.accounts_get,
+            "/transactions/get": self.transactions_get,
+            "/transactions/sync": self.transactions_sync,
+            "/investments/holdings/get": self.holdings_get,
+        }
+
+    def serve(self, port: int = DEFAULT_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Start serving on a daemon thread; returns the server (call shutdown() to stop)"""
+        stub = self
+        routes = self.routes()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled clients reuse connections
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                route = routes.get(self.path)
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                if route is None:
+                    status, payload = 404, {
+                        "error_type": "INVALID_REQUEST", "error_code": "NOT_FOUND",
+                        "error_message": f"{self.path} is not served by plaid_stub", "request_id": "stub",
+                    }
+                else:
+                    status, payload = 200, route(body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve generated Plaid data locally")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--accounts", type=int, default=3, help="Depository accounts per item")
+    parser.add_argument("--investment-accounts", type=int, default=1, help="Investment accounts per item")
+    parser.add_argument("--transactions", type=int, default=5000, help="Transactions per item")
+    parser.add_argument("--holdings", type=int, default=50, help="Holdings per item")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    args = parser.parse_args()
+
+    stub = PlaidStub(args.accounts, args.investment_accounts, args.transactions, args.holdings, args.latency_ms)
+    server = stub.serve(args.port)
+    print(f"Plaid stub on http://127.0.0.1:{args.port} (set PLAID_HOST to this URL)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Incremental transaction import with Plaid's /transactions/sync.
+
+A cursor is stored per item in Plaid_Items. Each sync pages from
+that cursor until has_more is false. The added, modified and removed changes
+are then applied in one DB transaction, and the new cursor is saved only after
+that commit. A failed sync therefore resumes from the last applied cursor.
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import plaid
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+from sqlalchemy.orm import Session
+
+from models import Plaid_Bank_Account, Plaid_Transactions, Transaction_Category_Link, Plaid_Item
+from plaid_client import client, PLAID_CLIENT_ID, PLAID_SECRET
+from plaid_ingest import ingest_transactions
+
+SYNC_PAGE_SIZE = 500  # Plaid's maximum for /transactions/sync
+MAX_PAGINATION_RESTARTS = 3
+
+def _plaid_error_code(e: plaid.ApiException) -> Optional[str]:
+    try:
+        return json.loads(e.body).get("error_code")
+    except (TypeError, ValueError):
+        return None
+
+def fetch_transaction_changes(access_token: str, cursor: Optional[str]):
+    """Page /transactions/sync from cursor; returns (added, modified, removed, next_cursor)"""
+    for _ in range(MAX_PAGINATION_RESTARTS):
+        added, modified, removed = [], [], []
+        next_cursor = cursor
+        try:
+            while True:
+                params = {"client_id": PLAID_CLIENT_ID, "secret": PLAID_SECRET,
+                          "access_token": access_token, "count": SYNC_PAGE_SIZE}
+                if next_cursor:
+                    params["cursor"] = next_cursor
+                response = client.transactions_sync(TransactionsSyncRequest(**params)).to_dict()
+                added.extend(response.get("added", []))
+                modified.extend(response.get("modified", []))
+                removed.extend(response.get("removed", []))
+                next_cursor = response["next_cursor"]
+                if not response.get("has_more"):
+                    return added, modified, removed, next_cursor
+        except plaid.ApiException as e:
+            # Data changed while paging: Plaid requires restarting from the original cursor
+            if _plaid_error_code(e) != "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION":
+                raise
+            print("Transactions changed during sync pagination, restarting from stored cursor")
+    raise Exception("Transactions kept changing during sync pagination")
+
+def apply_transaction_changes(db: Session, user_id: int, added: List[Dict], modified: List[Dict], removed: List[Dict]) -> Dict[str, int]:
+    """Upsert added/modified transactions and delete removed ones (no commit)"""
+    ingest_transactions(db, user_id, added + modified)
+
+    removed_ids = [r["transaction_id"] for r in removed]
+    if removed_ids:
+        account_ids = db.query(Plaid_Bank_Account.account_id).filter(Plaid_Bank_Account.user_id == user_id)
+        db.query(Transaction_Category_Link).filter(
+            Transaction_Category_Link.transaction_id.in_(removed_ids)
+        ).delete(synchronize_session=False)
+        db.query(Plaid_Transactions).filter(
+            Plaid_Transactions.transaction_id.in_(removed_ids),
+            Plaid_Transactions.account_id.in_(account_ids)
+        ).delete(synchronize_session=False)
+
+    return {"added": len(added), "modified": len(modified), "removed": len(removed_ids)}
+
+def sync_transactions(db: Session, user_id: int, item_id: str, decrypted_access_token: str) -> Dict[str, int]:
+    """Bring a user's transactions for one item up to date from its stored cursor"""
+    state = db.query(Plaid_Item).filter_by(user_id=user_id, item_id=item_id).first()
+    if state is None:
+        raise ValueError(f"Plaid item {item_id} is not linked to user {user_id}")
+
+    try:
+        added, modified, removed, next_cursor = fetch_transaction_changes(decrypted_access_token, state.cursor)
+        counts = apply_transaction_changes(db, user_id, added, modified, removed)
+        state.cursor = next_cursor
+        state.last_synced_at = datetime.utcnow()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    print(f"Synced transactions for user {user_id}, item {item_id}: {counts}")
+    return counts
@@ -0,0 +1,147 @@
+"""
+Plaid webhook receiver.
+
+Plaid signs every webhook with an ES256 JWT in the Plaid-Verification header.
+The JWT's kid names a public key fetched from /webhook_verification_key/get
+(cached per kid), and its request_body_sha256 claim must match the raw body.
+Set PLAID_WEBHOOK_VERIFY=false to accept unsigned payloads from
+webhook_sender.py during local development.
+
+Update webhooks do not import anything inline. They enqueue an incremental
+job for the item with a short delay. While that job is queued, further
+webhooks for the item return the same job, so a burst collapses into one sync.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from jose import jwt, JWTError
+from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
+
+from database import SessionLocal
+from models import Plaid_Item
+from plaid_client import client, PLAID_CLIENT_ID, PLAID_SECRET
+from token_cache import get_access_token
+from plaid_sync import sync_transactions
+from job_queue import enqueue_job, register_handler
+
+router = APIRouter()
+
+PLAID_WEBHOOK_VERIFY = os.getenv("PLAID_WEBHOOK_VERIFY", "true").lower() != "false"
+WEBHOOK_MAX_AGE_SECONDS = 5 * 60      # Plaid's recommended limit on the JWT's iat
+WEBHOOK_COALESCE_SECONDS = 30         # Delay before an item's sync job runs, absorbing bursts
+
+TRANSACTION_UPDATE_CODES = {
+    "SYNC_UPDATES_AVAILABLE", "DEFAULT_UPDATE", "INITIAL_UPDATE", "HISTORICAL_UPDATE", "TRANSACTIONS_REMOVED"
+}
+
+_verification_keys: Dict[str, Dict] = {}
+_keys_lock = threading.Lock()
+
+def _verification_key(kid: str) -> Dict:
+    with _keys_lock:
+        key = _verification_keys.get(kid)
+    if key is None:
+        response = client.webhook_verification_key_get(
+            WebhookVerificationKeyGetRequest(client_id=PLAID_CLIENT_ID, secret=PLAID_SECRET, key_id=kid)
+        ).to_dict()
+        key = response["key"]
+        with _keys_lock:
+            _verification_keys[kid] = key
+    return key
+
+def verify_webhook(body: bytes, token: Optional[str]):
+    """Raise HTTPException(401) unless token is Plaid's signature for body"""
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing Plaid-Verification header")
+    try:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "ES256":
+            raise HTTPException(status_code=401, detail="Unexpected webhook signature algorithm")
+        key = _verification_key(header["kid"])
+        if key.get("expired_at"):
+            raise HTTPException(status_code=401, detail="Webhook signed with an expired key")
+        claims = jwt.decode(token, key, algorithms=["ES256"])
+    except (JWTError, KeyError) as e:
+        raise HTTPException(status_code=401, detail=f"Invalid webhook signature: {e}")
+
+    if time.time() - claims.get("iat", 0) > WEBHOOK_MAX_AGE_SECONDS:
+        raise HTTPException(status_code=401, detail="Webhook is too old")
+    body_hash = hashlib.sha256(body).hexdigest()
+    if not hmac.compare_digest(body_hash, claims.get("request_body_sha256", "")):
+        raise HTTPException(status_code=401, detail="Webhook body does not match its signature")
+
+def _item_owner(item_id: str) -> Optional[Plaid_Item]:
+    db = SessionLocal()
+    try:
+        return db.query(Plaid_Item).filter(Plaid_Item.item_id == item_id).first()
+    finally:
+        db.close()
+
+def _record_item_error(item_id: str, error: Optional[Dict]):
+    db = SessionLocal()
+    try:
+        db.query(Plaid_Item).filter(Plaid_Item.item_id == item_id).update(
+            {"last_sync_status": "error", "last_sync_error": json.dumps(error)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+@router.post("/plaid/webhook")
+async def plaid_webhook(request: Request):
+    """Receive Plaid webhooks and queue an incremental update for the item."""
+    body = await request.body()
+    # Verification may fetch Plaid's key, and handling touches the DB: keep both off the event loop
+    if PLAID_WEBHOOK_VERIFY:
+        await asyncio.to_thread(verify_webhook, body, request.headers.get("Plaid-Verification"))
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON")
+    return await asyncio.to_thread(_handle_webhook, payload)
+
+def _handle_webhook(payload: Dict) -> Dict:
+    webhook_type = payload.get("webhook_type")
+    webhook_code = payload.get("webhook_code")
+    item_id = payload.get("item_id")
+    print(f"[WEBHOOK] {webhook_type}.{webhook_code} for item {item_id}")
+
+    item = _item_owner(item_id) if item_id else None
+    if item is None:
+        # Acknowledge anyway: Plaid retries non-2xx responses
+        return {"status": "ignored", "reason": "unknown item"}
+
+    if webhook_type == "TRANSACTIONS" and webhook_code in TRANSACTION_UPDATE_CODES:
+        job = enqueue_job("plaid_transactions_sync", item.user_id, item_key=item_id,
+                          delay_seconds=WEBHOOK_COALESCE_SECONDS)
+        return {"status": "queued", "job_id": job["job_id"]}
+    if webhook_type == "HOLDINGS" and webhook_code == "DEFAULT_UPDATE":
+        job = enqueue_job("plaid_holdings_refresh", item.user_id, item_key=item_id,
+                          delay_seconds=WEBHOOK_COALESCE_SECONDS)
+        return {"status": "queued", "job_id": job["job_id"]}
+    if webhook_type == "ITEM":
+        print(f"[WEBHOOK] Item {item_id} for user {item.user_id} reported {webhook_code}: {payload.get('error')}")
+        if webhook_code == "ERROR":
+            _record_item_error(item_id, payload.get("error"))
+    return {"status": "ignored"}
+
+def run_transactions_sync(user_id: int, item_id: str, payload: Dict):
+    db = SessionLocal()
+    try:
+        access_token = get_access_token(db, user_id, item_id)
+        if access_token is None:
+            return None  # Unlinked since the webhook arrived
+        return sync_transactions(db, user_id, item_id, access_token)
+    finally:
+        db.close()
+
+register_handler("plaid_transactions_sync", run_transactions_sync)
+# plaid_holdings_refresh is handled in plaid_refresh
@@ -0,0 +1,15 @@
+"""
+The object the API routes use for predictions.
+
+Without MODEL_SERVER_SOCKET this is the in-process StockPredictionService.
+With it, this is a thin client of the shared model server, and this process
+never loads the model.
+"""
+from prediction_config import MODEL_SERVER_SOCKET
+from stock_prediction_service import prediction_service
+
+if MODEL_SERVER_SOCKET:
+    from model_client import ModelServerClient
+    prediction_backend = ModelServerClient(MODEL_SERVER_SOCKET, prediction_service)
+else:
+    prediction_backend = prediction_service
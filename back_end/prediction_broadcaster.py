@@ -0,0 +1,117 @@
+"""
+Fan-out of newly saved predictions to WebSocket subscribers.
+
+The prediction loop runs in a background thread, while WebSocket handlers live
+on the event loop. `publish` is safe to call from any thread: it hands each
+message to the subscriber's event loop with `call_soon_threadsafe`.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Set
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per connection before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+# Interest reported by other processes is ignored once it is this old
+REMOTE_INTEREST_TTL_SECONDS = 120
+
+
+class PredictionSubscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.tickers: Set[str] = set()
+
+    def _put(self, message: Dict):
+        # Runs on the subscriber's event loop; a slow client loses its oldest messages
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def deliver(self, message: Dict):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+
+class PredictionBroadcaster:
+    def __init__(self):
+        self._subscriptions: Set[PredictionSubscription] = set()
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._remote_interest: Dict[str, tuple] = {}  # source -> (reported_at, Counter)
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Call `callback(prediction)` from the publishing thread for every prediction"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def subscribe(self) -> PredictionSubscription:
+        """Register a new connection; must be called from the event loop"""
+        subscription = PredictionSubscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: PredictionSubscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def update_tickers(self, subscription: PredictionSubscription, add: Iterable[str] = (), remove: Iterable[str] = ()):
+        with self._lock:
+            subscription.tickers.update(t.upper() for t in add)
+            subscription.tickers.difference_update(t.upper() for t in remove)
+
+    def local_interest(self) -> Counter:
+        """Number of connections in this process subscribed to each ticker"""
+        with self._lock:
+            return Counter(t for s in self._subscriptions for t in s.tickers)
+
+    def set_remote_interest(self, source: str, counts: Dict[str, int]):
+        """Record subscriber counts reported by another process (e.g. an API worker)"""
+        with self._lock:
+            self._remote_interest[source] = (time.time(), Counter(counts))
+
+    def interest(self) -> Counter:
+        """Live subscriber counts per ticker across this process and reporting workers"""
+        total = self.local_interest()
+        cutoff = time.time() - REMOTE_INTEREST_TTL_SECONDS
+        with self._lock:
+            for source, (reported_at, counts) in list(self._remote_interest.items()):
+                if reported_at < cutoff:
+                    del self._remote_interest[source]
+                else:
+                    total.update(counts)
+        return total
+
+    def publish(self, prediction: Dict):
+        """Send a saved prediction to every connection subscribed to its ticker"""
+        ticker = prediction['ticker'].upper()
+        with self._lock:
+            targets = [s for s in self._subscriptions if ticker in s.tickers]
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(prediction)
+            except Exception as e:
+                logger.error(f"Prediction listener failed: {e}")
+        message = {"type": "prediction", "data": prediction}
+        for subscription in targets:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # Event loop already closed; the handler will unsubscribe
+                pass
+        if targets:
+            logger.info(f"Published prediction for {ticker} to {len(targets)} subscribers")
+
+
+# Global instance
+prediction_broadcaster = PredictionBroadcaster()
@@ -1,6 +1,7 @@
 """
 Configuration for the stock prediction service
 """
+import os
 
 # Default tickers to predict (can be modified via API)
 DEFAULT_TICKERS = ['AAPL']
@@ -10,12 +11,73 @@ PREDICTION_INTERVAL_MINUTES = 5
 HISTORICAL_DAYS_BACK = 30
 PREDICTION_HORIZON_MINUTES = 5
 
+# Ticker prioritization settings
+PREDICTION_TICKERS_PER_CYCLE = 1  # Inference budget per background cycle; each extra ticker is one more model run
+TICKER_HOLDER_WEIGHT = 1.0        # Score per user holding the ticker
+TICKER_VIEWER_WEIGHT = 2.0        # Score per live WebSocket subscription to the ticker
+
 # Model settings
-MODEL_PATH = "../AI_model/AutoGluonModels_multi"
+MODEL_PATH = "../AI_model/AutoGluonModels_multi"  # Used when the registry has no versions
+
+# Model registry settings
+# One predictor folder per version under MODEL_REGISTRY_DIR; the ACTIVE file names the version to serve
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(os.path.dirname(__file__), "..", "AI_model", "registry"))
+MODEL_DRAIN_TIMEOUT_SECONDS = 120  # Max wait for in-flight predictions on the old version after a swap
+MODEL_ADMIN_USERNAMES = [u for u in os.getenv("MODEL_ADMIN_USERNAMES", "").split(",") if u]
+
+# Model selection settings
+MODEL_BENCHMARK_ON_STARTUP = True
+MODEL_BENCHMARK_REPEATS = 3
+MODEL_LATENCY_BUDGET_MS = {
+    "interactive": 500,   # /predictions/generate and interval requests
+    "background": 5000,   # Scheduled prediction loop
+}
+MODEL_ACCURACY_TOLERANCE = 0.05  # Accept models scoring within 5% of the best validation score
+MODEL_TORCH_THREADS = None  # CPU threads for torch-backed models; None keeps torch's default
+
+# Local bar storage (used by the backtester and accuracy rollups)
+BAR_DATA_DIR = os.getenv("BAR_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "bars"))
+STORE_FETCHED_BARS = True
+
+# Backtest settings
+BACKTEST_REPORT_DIR = os.getenv("BACKTEST_REPORT_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "backtests"))
+BACKTEST_WINDOWS = 50           # Rolling origins per ticker
+BACKTEST_STRIDE_STEPS = 12      # Bars between origins (1 hour of 5-minute bars)
+BACKTEST_CONTEXT_STEPS = 2048   # Bars of history fed to the model per window
+BACKTEST_BATCH_ITEMS = 64       # Windows per predictor.predict call
+
+# Accuracy rollup settings
+ACCURACY_ROLLUP_INTERVAL_MINUTES = 60
+ACCURACY_LOOKBACK_DAYS = 3              # Recompute rollups for predictions made in this window
+ACCURACY_MATCH_TOLERANCE_MINUTES = 10   # Latest bar must be at most this old at the target time
 
 # Database settings
 MAX_PREDICTIONS_TO_KEEP = 1000  # Keep last 1000 predictions per ticker
+FORECAST_RUN_MAX_AGE_MINUTES = PREDICTION_INTERVAL_MINUTES  # Reuse a stored run this recent instead of re-predicting
 
 # API settings
 MAX_PREDICTIONS_PER_REQUEST = 100
 
+# Prediction job queue settings
+PREDICTION_JOB_WORKERS = 1               # Units run concurrently against the predictor
+MAX_ACTIVE_PREDICTION_JOBS_PER_USER = 2  # Queued + running jobs per user
+PREDICTION_JOB_TTL_SECONDS = 600         # Finished jobs kept in memory this long
+PREDICTION_JOB_TIMEOUT_SECONDS = 120     # Max wait for a job (per ticker for background cycles); it is failed after that
+PREDICTION_JOB_STALE_SECONDS = 900       # Unfinished jobs older than this stop counting against the per-user cap
+PREDICTION_JOB_RETENTION_HOURS = 24      # Prediction_Jobs rows are deleted this long after creation
+PREDICTION_JOB_PURGE_INTERVAL_SECONDS = 3600
+
+# In-memory index settings
+LATEST_PREDICTIONS_PER_TICKER = 50  # Most recent predictions held in memory per ticker
+
+# Leader election settings
+# Only the process holding this lease runs the background prediction loop
+PREDICTION_LEASE_NAME = "prediction_loop"
+LEASE_TTL_SECONDS = 60     # A standby takes over this long after the leader stops renewing
+LEASE_RENEW_SECONDS = 15
+
+# Model server settings
+# When set, API workers forward inference to the model server on this Unix socket
+# instead of loading the model themselves (run it with `python model_server.py`).
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET")
+MODEL_SERVER_TIMEOUT_SECONDS = 120
@@ -0,0 +1,117 @@
+"""
+In-process index of the most recent predictions per ticker.
+
+The prediction service pushes every saved prediction into this index and the
+read endpoints serve from it, so `/stocks/predictions/latest` does not need a
+database round trip. The index is filled from the database on startup.
+"""
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from database import SessionLocal
+from models import Stock_Prediction
+from prediction_config import LATEST_PREDICTIONS_PER_TICKER
+
+logger = logging.getLogger(__name__)
+
+
+def prediction_to_dict(pred: Stock_Prediction) -> Dict:
+    """Convert a Stock_Prediction row to the dict shape returned by the API"""
+    return {
+        'id': pred.id,
+        'ticker': pred.ticker,
+        'predicted_price': pred.predicted_price,
+        'confidence_low': pred.confidence_low,
+        'confidence_high': pred.confidence_high,
+        'prediction_time': pred.prediction_time,
+        'horizon_minutes': pred.horizon_minutes,
+        'model_version': pred.model_version
+    }
+
+
+class LatestPredictionIndex:
+    def __init__(self, per_ticker: int = LATEST_PREDICTIONS_PER_TICKER):
+        self.per_ticker = per_ticker
+        self._by_ticker: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def add(self, prediction: Dict):
+        """Record a newly saved prediction (newest first)"""
+        with self._lock:
+            entries = self._by_ticker.get(prediction['ticker'])
+            if entries is None:
+                entries = deque(maxlen=self.per_ticker)
+                self._by_ticker[prediction['ticker']] = entries
+            entries.appendleft(prediction)
+
+    def can_serve(self, limit: int) -> bool:
+        """The index only answers requests it holds enough history for"""
+        return self.loaded and limit <= self.per_ticker
+
+    def latest(self, ticker: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Return the newest `limit` predictions, optionally for one ticker"""
+        with self._lock:
+            if ticker:
+                return list(self._by_ticker.get(ticker, ()))[:limit]
+            merged = [pred for entries in self._by_ticker.values() for pred in entries]
+        merged.sort(key=lambda pred: pred['prediction_time'], reverse=True)
+        return merged[:limit]
+
+    def tickers(self) -> List[str]:
+        with self._lock:
+            return list(self._by_ticker)
+
+    def load_from_db(self) -> bool:
+        """Fill the index with the most recent predictions for every ticker"""
+        try:
+            db = SessionLocal()
+            try:
+                # Newest per_ticker rows of every ticker in one query: rank within each
+                # ticker, then join the ranked ids back to the table
+                ranked = db.query(
+                    Stock_Prediction.id.label('id'),
+                    func.row_number().over(
+                        partition_by=Stock_Prediction.ticker,
+                        order_by=(Stock_Prediction.prediction_time.desc(), Stock_Prediction.id.desc())
+                    ).label('rank')
+                ).subquery()
+                rows = (
+                    db.query(Stock_Prediction)
+                    .join(ranked, ranked.c.id == Stock_Prediction.id)
+                    .filter(ranked.c.rank <= self.per_ticker)
+                    .order_by(Stock_Prediction.ticker, ranked.c.rank)
+                    .all()
+                )
+                by_ticker = {}
+                for row in rows:
+                    entries = by_ticker.get(row.ticker)
+                    if entries is None:
+                        entries = by_ticker[row.ticker] = deque(maxlen=self.per_ticker)
+                    entries.append(prediction_to_dict(row))
+            finally:
+                db.close()
+
+            with self._lock:
+                # Keep anything saved while we were loading
+                for ticker, entries in self._by_ticker.items():
+                    loaded = by_ticker.setdefault(ticker, deque(maxlen=self.per_ticker))
+                    known_ids = {pred['id'] for pred in loaded}
+                    for pred in reversed(entries):
+                        if pred['id'] not in known_ids:
+                            loaded.appendleft(pred)
+                self._by_ticker = by_ticker
+                self.loaded = True
+
+            logger.info(f"Loaded latest predictions for {len(by_ticker)} tickers into index")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load prediction index: {e}")
+            return False
+
+
+# Global instance
+prediction_index = LatestPredictionIndex()
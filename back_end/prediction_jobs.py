@@ -0,0 +1,331 @@
+"""
+Priority queue for prediction work.
+
+Every unit of inference, whether an interactive request for one ticker or one
+ticker of a background cycle, goes through this queue. Jobs are split per
+ticker, so an interactive job submitted during a background cycle runs before
+the cycle's remaining tickers. A predict call that has already started still
+finishes first.
+
+Job state is kept in memory for this process and written through to
+Prediction_Jobs after every unit, so a status poll can be answered by any API
+worker. The per-user cap counts the user's unfinished rows there and inserts
+the new row in the same transaction, with the user's row locked, so it holds
+across workers. Rows older than PREDICTION_JOB_RETENTION_HOURS are deleted.
+
+wait() fails a job that does not finish in time. A unit stuck in the
+predictor cannot be interrupted, so its worker is replaced and exits when the
+call finally returns.
+"""
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from database import SessionLocal
+from models import Prediction_Job, Users
+from prediction_config import (
+    PREDICTION_JOB_WORKERS, MAX_ACTIVE_PREDICTION_JOBS_PER_USER, PREDICTION_JOB_TTL_SECONDS,
+    PREDICTION_JOB_STALE_SECONDS, PREDICTION_JOB_RETENTION_HOURS, PREDICTION_JOB_PURGE_INTERVAL_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"interactive": 0, "background": 10}
+
+
+class JobLimitError(Exception):
+    pass
+
+
+class PredictionJob:
+    def __init__(self, user_id: Optional[int], tickers: List[str], kind: str, priority: str):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.tickers = tickers
+        self.kind = kind
+        self.priority = priority
+        self.status = "queued"
+        self.results: List = []
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.remaining = len(tickers)
+        self.running = 0  # Units of this job inside the runner right now
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "tickers": self.tickers,
+            "priority": self.priority,
+            "status": self.status,
+            "completed": len(self.tickers) - self.remaining,
+            "total": len(self.tickers),
+            "results": self.results,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _job_row_to_dict(row: Prediction_Job) -> Dict:
+    tickers = row.tickers.split(",") if row.tickers else []
+    results = json.loads(row.results) if row.results else []
+    return {
+        "job_id": row.id,
+        "kind": row.kind,
+        "tickers": tickers,
+        "priority": row.priority,
+        "status": row.status,
+        "completed": len(tickers) if row.status in ("done", "failed") else row.completed or 0,
+        "total": len(tickers),
+        "results": results,
+        "error": row.error,
+        "created_at": row.created_at,
+        "started_at": row.started_at,
+        "finished_at": row.finished_at,
+    }
+
+
+class PredictionJobQueue:
+    def __init__(self, workers: int = PREDICTION_JOB_WORKERS):
+        self.workers = workers
+        self.runner: Optional[Callable] = None
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, PredictionJob] = {}
+        self._threads = []
+        self._last_purge = 0.0
+        self._submit_lock = threading.Lock()
+
+    def start(self, runner: Callable[[str, str, str], object]):
+        """Start worker threads; runner(kind, ticker, priority) does one unit of work"""
+        with self._cond:
+            if self._threads:
+                return
+            self.runner = runner
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Prediction job queue started with {self.workers} workers")
+
+    @property
+    def started(self) -> bool:
+        return bool(self._threads)
+
+    def _insert_within_cap(self, job: PredictionJob):
+        """Insert the job's row unless the user already has the maximum of unfinished jobs.
+
+        The user's row is locked first, so concurrent submits for the same
+        user on any worker count and insert one at a time.
+        """
+        db = SessionLocal()
+        try:
+            db.query(Users.id).filter(Users.id == job.user_id).with_for_update().first()
+            active = db.query(Prediction_Job.id).filter(
+                Prediction_Job.user_id == job.user_id,
+                Prediction_Job.status.in_(["queued", "running"]),
+                Prediction_Job.created_at >= datetime.utcnow() - timedelta(seconds=PREDICTION_JOB_STALE_SECONDS)
+            ).count()
+            if active >= MAX_ACTIVE_PREDICTION_JOBS_PER_USER:
+                raise JobLimitError(
+                    f"At most {MAX_ACTIVE_PREDICTION_JOBS_PER_USER} prediction jobs may run at once"
+                )
+            db.add(Prediction_Job(
+                id=job.id, user_id=job.user_id, kind=job.kind, tickers=",".join(job.tickers),
+                priority=job.priority, created_at=job.created_at, **self._row_values(job)
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def submit(self, user_id: Optional[int], tickers: List[str], kind: str = "point",
+               priority: str = "interactive", persist: bool = True) -> PredictionJob:
+        """Queue a job with one unit per ticker; raises JobLimitError over the per-user cap.
+        Only persisted jobs of a user count against the cap."""
+        job = PredictionJob(user_id, tickers, kind, priority)
+        # Insert the row before a worker can pick the job up, so every update lands on it
+        if persist and user_id is not None:
+            with self._submit_lock:  # SQLite ignores the row lock; serialize this process's submits
+                self._insert_within_cap(job)
+        with self._cond:
+            self._jobs[job.id] = job
+            for ticker in tickers:
+                heapq.heappush(self._heap, (PRIORITIES.get(priority, 0), next(self._seq), job, ticker))
+            self._cond.notify(len(tickers))
+        if not tickers:
+            self._finish(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job state from this process, or from the DB if another worker owns it"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        db = SessionLocal()
+        try:
+            row = db.query(Prediction_Job).filter(Prediction_Job.id == job_id).first()
+            return _job_row_to_dict(row) if row else None
+        finally:
+            db.close()
+
+    def owner(self, job_id: str) -> Optional[int]:
+        local = self._jobs.get(job_id)
+        if local is not None:
+            return local.user_id
+        db = SessionLocal()
+        try:
+            row = db.query(Prediction_Job.user_id).filter(Prediction_Job.id == job_id).first()
+            return row[0] if row else None
+        finally:
+            db.close()
+
+    def local_job(self, job_id: str) -> Optional[PredictionJob]:
+        return self._jobs.get(job_id)
+
+    def wait(self, job: PredictionJob, timeout: float) -> bool:
+        """Wait for the job; past the timeout, fail it and return False"""
+        if job.wait(timeout):
+            return True
+        self.fail(job, f"Timed out after {timeout:.0f}s")
+        return False
+
+    def fail(self, job: PredictionJob, error: str):
+        """Fail an unfinished job: drop its queued units and replace workers stuck in its running ones"""
+        with self._cond:
+            if job.done or job.error is not None:
+                return
+            self._heap = [entry for entry in self._heap if entry[2] is not job]
+            heapq.heapify(self._heap)
+            job.error = error
+            job.remaining = 0
+            stuck = job.running
+            for _ in range(stuck):
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        if stuck:
+            logger.error(f"Prediction job {job.id}: {error}; replaced {stuck} stuck worker(s)")
+        self._finish(job)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job, ticker = heapq.heappop(self._heap)
+                if job.status == "queued":
+                    job.status = "running"
+                    job.started_at = datetime.utcnow()
+                job.running += 1
+
+            error = "Failed to generate prediction"
+            try:
+                result = self.runner(job.kind, ticker, job.priority)
+            except Exception as e:
+                logger.error(f"Prediction job {job.id} failed for {ticker}: {e}")
+                result = None
+                error = str(e) or error
+
+            with self._cond:
+                job.running -= 1
+                if job.error is not None:
+                    # Failed by fail() while this unit ran; a replacement worker took this thread's place
+                    self._threads.remove(threading.current_thread())
+                    return
+                if job.kind == "intervals" and result:
+                    job.results.extend(result)
+                elif result:
+                    job.results.append(result)
+                else:
+                    job.results.append({"ticker": ticker, "error": error})
+                job.remaining -= 1
+                finished = job.remaining == 0
+            if finished:
+                self._finish(job)
+            else:
+                self._persist(job)  # Progress for polls served by other workers
+
+    def _finish(self, job: PredictionJob):
+        succeeded = any("error" not in r for r in job.results) or not job.tickers
+        job.status = "done" if succeeded and job.error is None else "failed"
+        job.finished_at = datetime.utcnow()
+        self._persist(job)  # Before waking waiters, so what they read back from the DB is final
+        job._done.set()
+        self._expire_old_jobs()
+
+    def _row_values(self, job: PredictionJob) -> Dict:
+        with self._cond:
+            return {
+                "status": job.status,
+                "results": json.dumps(jsonable_encoder(job.results)),
+                "completed": len(job.tickers) - job.remaining,
+                "error": job.error,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+            }
+
+    def _persist(self, job: PredictionJob):
+        if job.user_id is None:
+            return  # Background cycles are not exposed through the job API
+        db = SessionLocal()
+        try:
+            db.query(Prediction_Job).filter(Prediction_Job.id == job.id).update(self._row_values(job))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to persist prediction job {job.id}: {e}")
+        finally:
+            db.close()
+
+    def _expire_old_jobs(self):
+        now = datetime.utcnow()
+        with self._cond:
+            for job_id, job in list(self._jobs.items()):
+                if job.done and (now - job.finished_at).total_seconds() > PREDICTION_JOB_TTL_SECONDS:
+                    del self._jobs[job_id]
+            purge_due = time.monotonic() - self._last_purge >= PREDICTION_JOB_PURGE_INTERVAL_SECONDS
+            if purge_due:
+                self._last_purge = time.monotonic()
+        if purge_due:
+            self.purge_stored_jobs(now - timedelta(hours=PREDICTION_JOB_RETENTION_HOURS))
+
+    def purge_stored_jobs(self, before: datetime) -> int:
+        """Delete Prediction_Jobs rows created before `before`"""
+        db = SessionLocal()
+        try:
+            deleted = db.query(Prediction_Job).filter(Prediction_Job.created_at < before).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to purge prediction jobs: {e}")
+            return 0
+        finally:
+            db.close()
+
+
+# Global instance
+prediction_jobs = PredictionJobQueue()
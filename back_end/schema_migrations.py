@@ -0,0 +1,206 @@
+"""
+Small additive schema updates for tables that already exist.
+
+`Base.metadata.create_all` only creates missing tables. It never adds indexes,
+columns or foreign keys to tables that already exist. This module covers that
+gap for the additive changes the models have picked up since. Run it right
+after create_all. It also copies data into the tables that replaced older
+columns: holding symbols into Securities and the legacy per-user Plaid tokens
+into Plaid_Items.
+"""
+from datetime import datetime
+from sqlalchemy import inspect, text, or_, select, MetaData, Table
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import Base
+
+def ensure_columns(engine):
+    """Add columns declared on the models that are missing in the database.
+
+    Columns are added as nullable; existing rows get NULL (the model's Python
+    default applies to rows inserted afterwards).
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            print(f"[SCHEMA] Adding column {column.name} to {table.name}")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type} NULL"))
+
+def ensure_indexes(engine):
+    """Create indexes declared on the models that are missing in the database"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {idx["name"] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                print(f"[SCHEMA] Creating index {index.name} on {table.name}")
+                index.create(bind=engine)
+
+def migrate_securities(engine):
+    """Fill Securities from the symbol and name columns holdings had before it existed.
+
+    Holdings now read their symbol and name through Securities, so without
+    this, holdings not refreshed since the upgrade would lose both and drop
+    out of the holder-count ranking. Only security ids missing from
+    Securities are inserted; a holdings refresh later overwrites them with
+    Plaid's data.
+    """
+    inspector = inspect(engine)
+    if "Plaid_Investment_Holding" not in inspector.get_table_names():
+        return
+    if "symbol" not in {col["name"] for col in inspector.get_columns("Plaid_Investment_Holding")}:
+        return  # Created after the Securities table; nothing to copy
+    quote = engine.dialect.identifier_preparer.quote
+    holdings, securities = quote("Plaid_Investment_Holding"), quote("Securities")
+    try:
+        with engine.begin() as conn:
+            copied = conn.execute(text(
+                f"INSERT INTO {securities} (security_id, ticker_symbol, name, updated_at) "
+                f"SELECT h.security_id, MAX(h.symbol), MAX(h.name), :now FROM {holdings} h "
+                f"WHERE h.security_id IS NOT NULL AND NOT EXISTS "
+                f"(SELECT 1 FROM {securities} s WHERE s.security_id = h.security_id) "
+                f"GROUP BY h.security_id"
+            ), {"now": datetime.utcnow()}).rowcount
+    except IntegrityError:
+        return  # Another worker copied them at the same time
+    if copied:
+        print(f"[SCHEMA] Copied {copied} securities from existing holdings")
+
+def ensure_foreign_keys(engine):
+    """Add foreign keys declared on the models that are missing in the database.
+
+    SQLite cannot add constraints to an existing table, so it is skipped there.
+    A key the existing rows violate is reported and left out rather than
+    failing startup.
+    """
+    if engine.dialect.name == "sqlite":
+        return
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {
+            (tuple(fk["constrained_columns"]), fk["referred_table"]) for fk in inspector.get_foreign_keys(table.name)
+        }
+        for constraint in table.foreign_key_constraints:
+            columns = tuple(constraint.column_keys)
+            if (columns, constraint.referred_table.name) in existing:
+                continue
+            referred = [element.column.name for element in constraint.elements]
+            ddl = (
+                f"ALTER TABLE {quote(table.name)} ADD FOREIGN KEY ({', '.join(quote(c) for c in columns)}) "
+                f"REFERENCES {quote(constraint.referred_table.name)} ({', '.join(quote(c) for c in referred)})"
+            )
+            if constraint.ondelete:
+                ddl += f" ON DELETE {constraint.ondelete}"
+            print(f"[SCHEMA] Adding foreign key {columns} -> {constraint.referred_table.name} on {table.name}")
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(ddl))
+            except Exception as e:
+                print(f"[SCHEMA] Could not add foreign key on {table.name}{columns}:", e)
+
+def _migrate_user_tokens(db, user, sync_state) -> list:
+    """Add Plaid_Items for one user's legacy tokens (no commit); returns what was copied"""
+    from models import Plaid_Item, Plaid_Bank_Account, Plaid_Investment
+
+    moved, item_ids = [], {}
+    for token_type, column in (("bank", "plaid_access_token"), ("brokerage", "plaid_brokerage_access_token")):
+        encrypted = getattr(user, column)
+        if not encrypted:
+            continue
+        state = None
+        if sync_state is not None:
+            token_type_col = sync_state.c.get("token_type")
+            query = select(sync_state).where(sync_state.c.user_id == user.id)
+            if token_type_col is not None:
+                matches = token_type_col == token_type
+                if token_type == "bank":
+                    matches = or_(matches, token_type_col.is_(None))  # Rows from before token_type
+                query = query.where(matches)
+            state = db.execute(query.order_by(sync_state.c.last_synced_at.desc())).mappings().first()
+        item_id = state["item_id"] if state else f"legacy-{token_type}-{user.id}"
+        if db.query(Plaid_Item.id).filter(Plaid_Item.item_id == item_id).first() is None:
+            db.add(Plaid_Item(
+                user_id=user.id,
+                item_id=item_id,
+                token_type=token_type,
+                access_token=encrypted,
+                cursor=state["cursor"] if state else None,
+                last_synced_at=state["last_synced_at"] if state else None,
+                holdings_synced_at=state.get("holdings_synced_at") if state else None,
+                created_at=datetime.utcnow(),
+            ))
+        item_ids[token_type] = item_id
+        moved.append(f"{token_type} ({item_id})")
+    # Tag the accounts imported before multi-item support with their item, so
+    # unlinking the item also purges them. The single-token release imported
+    # investment accounts with the bank token.
+    account_items = ((Plaid_Bank_Account, item_ids.get("bank")),
+                     (Plaid_Investment, item_ids.get("bank") or item_ids.get("brokerage")))
+    for model, item_id in account_items:
+        if item_id is not None:
+            db.query(model).filter(model.user_id == user.id, model.item_id.is_(None)).update(
+                {"item_id": item_id}, synchronize_session=False
+            )
+    user.plaid_tokens_migrated_at = datetime.utcnow()
+    return moved
+
+def migrate_plaid_items(engine):
+    """Copy Users.plaid_access_token / plaid_brokerage_access_token into Plaid_Items.
+
+    The item id and cursor come from the old Plaid_Sync_State table when it
+    has a row for the token. Otherwise a placeholder "legacy-..." item id is
+    used, and the first sync replaces it with the real one. The user's
+    accounts without an item_id are assigned to the migrated items. Each
+    user is migrated once (Users.plaid_tokens_migrated_at) in its own
+    transaction.
+    Every API worker runs this at startup: a worker that loses the race on
+    the unique item id rolls back and leaves that user to the winner.
+
+    The Users columns are left in place so a rollback to the previous
+    release keeps every link; clearing them is for a later migration.
+    """
+    from models import Users
+
+    sync_state = None
+    if "Plaid_Sync_State" in inspect(engine).get_table_names():
+        sync_state = Table("Plaid_Sync_State", MetaData(), autoload_with=engine)
+
+    with Session(engine) as db:
+        user_ids = [user_id for (user_id,) in db.query(Users.id).filter(
+            Users.plaid_tokens_migrated_at.is_(None),
+            or_(Users.plaid_access_token.isnot(None), Users.plaid_brokerage_access_token.isnot(None))
+        )]
+        for user_id in user_ids:
+            user = db.query(Users).filter(Users.id == user_id, Users.plaid_tokens_migrated_at.is_(None)).first()
+            if user is None:
+                continue  # Migrated by another worker meanwhile
+            try:
+                moved = _migrate_user_tokens(db, user, sync_state)
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # Another worker inserted the same item first
+                continue
+            print(f"[SCHEMA] Copied Plaid tokens of user {user_id} to Plaid_Items: {', '.join(moved)}")
+
+def run_schema_migrations(engine):
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    migrate_securities(engine)  # Before the foreign key that needs every holding's security
+    ensure_foreign_keys(engine)
+    migrate_plaid_items(engine)
@@ -3,32 +3,61 @@ Startup script to initialize the prediction service when the backend starts
 """
 import logging
 from stock_prediction_service import prediction_service
+from prediction_backend import prediction_backend
+from prediction_index import prediction_index
+from accuracy_rollup import accuracy_rollup_job
+from prediction_jobs import prediction_jobs
+from prediction_config import MODEL_BENCHMARK_ON_STARTUP, DEFAULT_TICKERS, MODEL_SERVER_SOCKET
 
 logger = logging.getLogger(__name__)
 
-def initialize_prediction_service():
-    """Initialize the prediction service on startup"""
+def initialize_prediction_service(local: bool = not MODEL_SERVER_SOCKET):
+    """Initialize the prediction service on startup.
+
+    With local=False (API workers behind a model server) only the index is
+    loaded and the server's prediction events are followed; the model and the
+    prediction loop live in the model server process.
+    """
     try:
+        # Fill the latest-prediction index so read endpoints skip the DB
+        prediction_index.load_from_db()
+
+        if not local:
+            # Jobs queued here are forwarded to the model server, which queues them again host-wide
+            prediction_jobs.start(prediction_backend.run_unit)
+            prediction_backend.start_listening()
+            logger.info(f"Using model server at {MODEL_SERVER_SOCKET}")
+            return
+
+        # Every prediction, interactive or background, runs through the job queue.
+        # Started even without a model, so requests fail fast instead of waiting forever.
+        prediction_jobs.start(prediction_service.run_unit)
+
         # Load the model
         if prediction_service.load_model():
             logger.info("Prediction service initialized successfully")
-            # Optionally start predictions for default tickers
-            tickers = prediction_service.get_daily_prediction_tickers()
-            if tickers:
-                prediction_service.start_predictions(tickers)
-                logger.info(f"Started prediction service for tickers: {tickers}")
-            else:
-                logger.warning("No tickers available to start prediction service")
+            # Pick the fastest accurate model for each request priority
+            if MODEL_BENCHMARK_ON_STARTUP:
+                prediction_service.benchmark_models(DEFAULT_TICKERS[0])
+            # Start predictions; tickers are re-ranked from holdings and viewers every cycle
+            prediction_service.start_predictions()
+            logger.info("Started prediction service with per-cycle ticker ranking")
+            # Materialize accuracy stats for matured predictions, on the host whose bar store the loop fills
+            accuracy_rollup_job.start(prediction_service.leader_lease)
         else:
             logger.error("Failed to initialize prediction service - model could not be loaded")
     except Exception as e:
         logger.error(f"Error initializing prediction service: {e}")
 
-def cleanup_prediction_service():
+def cleanup_prediction_service(local: bool = not MODEL_SERVER_SOCKET):
     """Cleanup the prediction service on shutdown"""
     try:
-        prediction_service.stop_predictions()
+        if not local:
+            prediction_backend.stop_listening()
+        else:
+            accuracy_rollup_job.stop()
+            if prediction_service.is_running:
+                prediction_service.stop_predictions()
         logger.info("Prediction service cleaned up successfully")
     except Exception as e:
         logger.error(f"Error cleaning up prediction service: {e}")
-
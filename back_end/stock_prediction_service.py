@@ -5,11 +5,27 @@ import logging
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from models import Stock_Prediction
+from sqlalchemy import func
+from models import Stock_Prediction, Stock_Forecast_Run, Plaid_Investment, Plaid_Investment_Holding, Securities
+from forecast_codec import (
+    FORECAST_DTYPE, encode_forecast, decode_forecast, forecast_columns,
+    format_quantile_levels, parse_quantile_levels, run_to_dict
+)
+from prediction_config import (
+    PREDICTION_HORIZON_MINUTES, FORECAST_RUN_MAX_AGE_MINUTES, PREDICTION_LEASE_NAME, STORE_FETCHED_BARS,
+    PREDICTION_TICKERS_PER_CYCLE, TICKER_HOLDER_WEIGHT, TICKER_VIEWER_WEIGHT,
+    DEFAULT_TICKERS, MODEL_BENCHMARK_ON_STARTUP, MODEL_DRAIN_TIMEOUT_SECONDS, PREDICTION_JOB_TIMEOUT_SECONDS
+)
+from model_selection import ModelSelector, configure_torch_threads
+from model_registry import ModelHandle, model_registry
+from leader_election import LeaderLease
+from bar_store import queue_bars
+from prediction_jobs import prediction_jobs
+from prediction_index import prediction_index, prediction_to_dict
+from prediction_broadcaster import prediction_broadcaster
 import threading
 import time
 import random
@@ -22,26 +38,99 @@ logger = logging.getLogger(__name__)
 
 class StockPredictionService:
     def __init__(self):
-        self.predictor = None
+        # Active predictor version; replaced as a whole by swap_model
+        self.model: Optional[ModelHandle] = None
         self.fmp_api_key = os.getenv("FMP_API_KEY")
         self.fmp_base_url = "https://financialmodelingprep.com/api/v3"
-        self.model_path = os.path.join(os.path.dirname(__file__), "..", "AI_model", "AutoGluonModels_multi")
         self.is_running = False
         self.prediction_thread = None
-        
-    def load_model(self):
-        """Load the trained Chronos model"""
+        self._default_selector = ModelSelector()
+        self.leader_lease = LeaderLease(PREDICTION_LEASE_NAME)
+        self.model_swap: Optional[Dict] = None
+        self._swap_lock = threading.Lock()
+
+    @property
+    def predictor(self):
+        return self.model.predictor if self.model else None
+
+    @property
+    def model_selector(self) -> ModelSelector:
+        return self.model.selector if self.model else self._default_selector
+
+    def _new_selector(self) -> ModelSelector:
+        """Fresh selector for a new version, keeping the configured budgets"""
+        selector = ModelSelector()
+        selector.configure(self.model_selector.latency_budget_ms, self.model_selector.accuracy_tolerance)
+        return selector
+
+    def load_model(self, version: str = None):
+        """Load the trained Chronos model (the registry's active version by default)"""
         try:
-            if not os.path.exists(self.model_path):
-                logger.error(f"Model path not found: {self.model_path}")
+            version = version or model_registry.active_version()
+            if version is None:
+                logger.error(f"No model versions in {model_registry.root} and no model at {model_registry.legacy_path}")
                 return False
-                
-            self.predictor = TimeSeriesPredictor.load(self.model_path, require_version_match=False)
-            logger.info("Chronos model loaded successfully")
+
+            configure_torch_threads(self.model_selector.torch_threads)
+            # Loaded through the registry so API workers that use the model server never import AutoGluon
+            predictor = model_registry.load(version)
+            self.model = ModelHandle(version, predictor, self._new_selector())
+            logger.info(f"Chronos model {version} loaded successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             return False
+
+    def swap_model(self, version: str) -> Dict:
+        """Load, warm up and switch to another model version in the background"""
+        model_registry.path_for(version)  # Raises ValueError for unknown versions
+        with self._swap_lock:
+            if self.model_swap and self.model_swap['state'] not in ('done', 'failed'):
+                raise RuntimeError(f"Swap to {self.model_swap['version']} already in progress")
+            self.model_swap = {'version': version, 'state': 'loading', 'error': None, 'started_at': datetime.now()}
+        threading.Thread(target=self._swap_worker, args=(version,), daemon=True).start()
+        return self.model_swap
+
+    def _swap_worker(self, version: str):
+        swap = self.model_swap
+        try:
+            handle = ModelHandle(version, model_registry.load(version), self._new_selector())
+
+            # Warm up before taking traffic; benchmarking also picks the per-priority models
+            swap['state'] = 'warming'
+            df, ts_data = self._load_ts_data(DEFAULT_TICKERS[0])
+            if ts_data is None:
+                raise RuntimeError(f"No warm-up data for {DEFAULT_TICKERS[0]}")
+            if MODEL_BENCHMARK_ON_STARTUP:
+                handle.selector.benchmark(handle.predictor, ts_data)
+            else:
+                handle.predictor.predict(ts_data)
+
+            # Requests already running keep their handle; new ones get the new version
+            old, self.model = self.model, handle
+            model_registry.set_active(version)
+            logger.info(f"Swapped model {old.version if old else None} -> {version}")
+
+            if old is not None:
+                swap['state'] = 'draining'
+                if not old.drain(MODEL_DRAIN_TIMEOUT_SECONDS):
+                    logger.warning(f"Model {old.version} still had {old.in_flight} predictions after drain timeout")
+            swap['state'] = 'done'
+        except Exception as e:
+            logger.error(f"Model swap to {version} failed: {e}")
+            swap['state'] = 'failed'
+            swap['error'] = str(e)
+        finally:
+            swap['finished_at'] = datetime.now()
+
+    def model_versions(self) -> Dict:
+        return {
+            'active': self.model.version if self.model else None,
+            'loaded_at': self.model.loaded_at if self.model else None,
+            'in_flight': self.model.in_flight if self.model else 0,
+            'available': model_registry.list_versions(),
+            'swap': self.model_swap,
+        }
     
     def fetch_stock_data(self, ticker: str, days_back: int = 730) -> Optional[pd.DataFrame]:
         """Fetch historical stock data from FMP API"""
@@ -90,6 +179,10 @@ class StockPredictionService:
             
             # Regularize to 5-minute intervals
             df = self._regularize_data(df, ticker)
+
+            # Keep the history locally for backtests and accuracy rollups, off the request path
+            if STORE_FETCHED_BARS:
+                queue_bars(ticker, df)
             
             logger.info(f"Fetched {len(df)} records for {ticker}")
             return df
@@ -136,26 +229,47 @@ class StockPredictionService:
         
         return out
     
-    def make_prediction(self, ticker: str) -> Optional[Dict]:
-        """Make prediction for a given ticker"""
+    def _load_ts_data(self, ticker: str):
+        """Fetch recent bars for a ticker as a TimeSeriesDataFrame"""
+        from autogluon.timeseries import TimeSeriesDataFrame
+
+        df = self.fetch_stock_data(ticker)
+        if df is None or len(df) < 365:  # Need sufficient history
+            logger.warning(f"Insufficient data for {ticker}")
+            return None, None
+        ts_data = TimeSeriesDataFrame.from_data_frame(
+            df, id_column="item_id", timestamp_column="timestamp"
+        )
+        return df, ts_data
+
+    def benchmark_models(self, ticker: str) -> List[Dict]:
+        """Time each model in the predictor on recent data and pick per-priority models"""
+        model = self.model
+        if not model:
+            logger.error("Model not loaded")
+            return []
+        df, ts_data = self._load_ts_data(ticker)
+        if ts_data is None:
+            return []
+        with model.use():
+            return model.selector.benchmark(model.predictor, ts_data)
+
+    def make_forecast(self, ticker: str, priority: str = "interactive") -> Optional[Dict]:
+        """Run the model and keep the full horizon x quantile forecast for a ticker"""
         try:
-            if not self.predictor:
+            model = self.model
+            if not model:
                 logger.error("Model not loaded")
                 return None
             
             # Fetch recent data
-            df = self.fetch_stock_data(ticker)
-            if df is None or len(df) < 365:  # Need sufficient history
-                logger.warning(f"Insufficient data for {ticker}")
+            df, ts_data = self._load_ts_data(ticker)
+            if ts_data is None:
                 return None
             
-            # Convert to TimeSeriesDataFrame
-            ts_data = TimeSeriesDataFrame.from_data_frame(
-                df, id_column="item_id", timestamp_column="timestamp"
-            )
-            
-            # Make prediction
-            predictions = self.predictor.predict(ts_data)
+            # Make prediction with the model chosen for this priority
+            with model.use():
+                predictions = model.predictor.predict(ts_data, model=model.selector.select(priority))
             
             # Convert to pandas for easier handling
             try:
@@ -164,84 +278,88 @@ class StockPredictionService:
                 pred_df = predictions.reset_index()
             
             # Filter for the specific ticker
-            ticker_preds = pred_df[pred_df['item_id'] == ticker].copy()
+            ticker_preds = pred_df[pred_df['item_id'] == ticker]
             if ticker_preds.empty:
                 logger.warning(f"No predictions generated for {ticker}")
                 return None
             
-            # Get the next prediction (first future point)
-            next_pred = ticker_preds.iloc[0]
+            # Mean first, then every quantile column the predictor produced
+            quantile_levels = sorted(
+                float(col) for col in ticker_preds.columns
+                if col not in ('item_id', 'timestamp', 'mean')
+            )
+            columns = forecast_columns(quantile_levels)
             
-            # Extract prediction values
-            prediction_data = {
+            return {
                 'ticker': ticker,
-                'predicted_price': float(next_pred.get('mean', next_pred.get('0.5', 0))),
-                'confidence_low': float(next_pred.get('0.1', 0)),
-                'confidence_high': float(next_pred.get('0.9', 0)),
-                'prediction_time': datetime.now(),
-                'horizon_minutes': 5,  # Next 5-minute candle
-                'model_version': 'ChronosFineTuned'
+                'run_time': datetime.now(),
+                'first_timestamp': pd.Timestamp(ticker_preds['timestamp'].iloc[0]).to_pydatetime(),
+                'step_minutes': PREDICTION_HORIZON_MINUTES,
+                'quantile_levels': quantile_levels,
+                'columns': columns,
+                'forecast': ticker_preds[columns].to_numpy(dtype=FORECAST_DTYPE),
+                'last_close': float(df['target'].iloc[-1]),
+                'model_version': model.version
             }
             
-            logger.info(f"Generated prediction for {ticker}: ${prediction_data['predicted_price']:.2f}")
-            return prediction_data
-            
         except Exception as e:
             logger.error(f"Prediction failed for {ticker}: {e}")
             return None
 
-    def make_interval_predictions(self, ticker: str) -> Optional[List[Dict]]:
-        """Generate multi-interval predictions for a given ticker."""
-        try:
-            if not self.predictor:
-                logger.error("Model not loaded")
-                return None
-
-            # Fetch historical stock data
-            df = self.fetch_stock_data(ticker)
-            if df is None or len(df) < 365:
-                logger.warning(f"Insufficient data for {ticker}")
-                return None
-
-            # Convert to TimeSeriesDataFrame for AutoGluon
-            ts_data = TimeSeriesDataFrame.from_data_frame(
-                df, id_column="item_id", timestamp_column="timestamp"
-            )
-
-            # Run Chronos prediction
-            # Run Chronos prediction
-            predictions = self.predictor.predict(ts_data)
+    def point_prediction(self, run: Dict) -> Dict:
+        """Next-step point prediction (mean plus 0.1/0.9 band) from a forecast run"""
+        next_pred = dict(zip(run['columns'], run['forecast'][0].tolist()))
+        return {
+            'ticker': run['ticker'],
+            'predicted_price': float(next_pred.get('mean', next_pred.get('0.5', 0))),
+            'confidence_low': float(next_pred.get('0.1', 0)),
+            'confidence_high': float(next_pred.get('0.9', 0)),
+            'prediction_time': run['run_time'],
+            'horizon_minutes': run['step_minutes'],  # Next 5-minute candle
+            'model_version': run['model_version']
+        }
 
-            # Convert predictions safely regardless of AG version
-            if hasattr(predictions, "to_pandas"):
-                pred_df = predictions.to_pandas().reset_index()
-            else:
-                pred_df = predictions.reset_index()
+    def interval_predictions(self, run: Dict) -> List[Dict]:
+        """Multi-interval view of a forecast run: the step ending each interval"""
+        # Define intervals (minutes)
+        intervals = [5, 15, 30, 60, 1440]  # up to 1 day
+        # Step n of the run ends n * step_minutes after the last bar; drop intervals past its horizon
+        intervals = [i for i in intervals if 1 <= i // run['step_minutes'] <= len(run['forecast'])]
+        steps = [interval // run['step_minutes'] - 1 for interval in intervals]
+        last_close = run['last_close']
+        mean = run['forecast'][steps, run['columns'].index('mean')].astype('float64')
+        changes = (mean - last_close) / last_close * 100
 
-            ticker_preds = pred_df[pred_df["item_id"] == ticker]
-            if ticker_preds.empty:
-                logger.warning(f"No predictions for {ticker}")
-                return None
-
-            # Get last known close
-            last_close = float(df["target"].iloc[-1])
-
-            # Define intervals (minutes)
-            intervals = [5, 15, 30, 60, 1440]  # up to 1 day
-            rows = ticker_preds.head(len(intervals))
+        return [
+            {
+                "ticker": run['ticker'],
+                "interval": f"{interval}m" if interval < 1440 else "1d",
+                "predicted_price": float(price),
+                "change": float(change)
+            }
+            for interval, price, change in zip(intervals, mean, changes)
+        ]
 
-            results = []
-            for i, row in enumerate(rows.itertuples()):
-                predicted_price = float(getattr(row, "mean", getattr(row, "_0_5", 0)))
-                change = ((predicted_price - last_close) / last_close) * 100
+    def make_prediction(self, ticker: str, priority: str = "interactive") -> Optional[Dict]:
+        """Make prediction for a given ticker"""
+        run = self.make_forecast(ticker, priority)
+        if run is None:
+            return None
+        prediction_data = self.point_prediction(run)
+        logger.info(f"Generated prediction for {ticker}: ${prediction_data['predicted_price']:.2f}")
+        return prediction_data
 
-                results.append({
-                    "ticker": ticker,
-                    "interval": f"{intervals[i]}m" if intervals[i] < 1440 else "1d",
-                    "predicted_price": predicted_price,
-                    "change": change
-                })
+    def make_interval_predictions(self, ticker: str, priority: str = "interactive") -> Optional[List[Dict]]:
+        """Generate multi-interval predictions, reusing a recent stored run when there is one."""
+        try:
+            run = self.get_recent_forecast_run(ticker, FORECAST_RUN_MAX_AGE_MINUTES)
+            if run is None:
+                run = self.make_forecast(ticker, priority)
+                if run is None:
+                    return None
+                self.save_forecast_run(run)
 
+            results = self.interval_predictions(run)
             logger.info(f"Generated {len(results)} interval predictions for {ticker}")
             return results
 
@@ -249,9 +367,81 @@ class StockPredictionService:
             logger.error(f"Prediction failed for {ticker}: {e}")
             return None
 
-    
-    def save_prediction(self, prediction_data: Dict):
-        """Save prediction to database"""
+    def _forecast_run_row(self, run: Dict) -> Stock_Forecast_Run:
+        return Stock_Forecast_Run(
+            ticker=run['ticker'],
+            run_time=run['run_time'],
+            first_timestamp=run['first_timestamp'],
+            step_minutes=run['step_minutes'],
+            horizon_steps=run['forecast'].shape[0],
+            quantile_levels=format_quantile_levels(run['quantile_levels']),
+            last_close=run['last_close'],
+            forecast=encode_forecast(run['forecast']),
+            model_version=run['model_version']
+        )
+
+    def save_forecast_run(self, run: Dict):
+        """Save a full forecast run as one packed row"""
+        try:
+            db = SessionLocal()
+            try:
+                db.add(self._forecast_run_row(run))
+                db.commit()
+                logger.info(f"Saved forecast run for {run['ticker']}")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Failed to save forecast run: {e}")
+
+    def get_recent_forecast_run(self, ticker: str, max_age_minutes: int) -> Optional[Dict]:
+        """Most recent stored run for a ticker if it is newer than max_age_minutes"""
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(Stock_Forecast_Run)
+                .filter(
+                    Stock_Forecast_Run.ticker == ticker,
+                    Stock_Forecast_Run.run_time >= datetime.now() - timedelta(minutes=max_age_minutes)
+                )
+                .order_by(Stock_Forecast_Run.run_time.desc())
+                .first()
+            )
+            if row is None:
+                return None
+            levels = parse_quantile_levels(row.quantile_levels)
+            return {
+                'ticker': row.ticker,
+                'run_time': row.run_time,
+                'first_timestamp': row.first_timestamp,
+                'step_minutes': row.step_minutes,
+                'quantile_levels': levels,
+                'columns': forecast_columns(levels),
+                'forecast': decode_forecast(row.forecast, row.horizon_steps, len(levels) + 1),
+                'last_close': row.last_close,
+                'model_version': row.model_version
+            }
+        finally:
+            db.close()
+
+    def get_forecast_runs(self, ticker: str, hours_back: int = 24) -> List[Dict]:
+        """Stored forecast runs for a ticker within the last N hours"""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Stock_Forecast_Run)
+                .filter(
+                    Stock_Forecast_Run.ticker == ticker,
+                    Stock_Forecast_Run.run_time >= datetime.now() - timedelta(hours=hours_back)
+                )
+                .order_by(Stock_Forecast_Run.run_time.desc())
+                .all()
+            )
+            return [run_to_dict(row) for row in rows]
+        finally:
+            db.close()
+
+    def save_prediction(self, prediction_data: Dict, forecast_run: Optional[Dict] = None):
+        """Save prediction (and optionally its full forecast run) to database"""
         try:
             db = SessionLocal()
             try:
@@ -267,7 +457,13 @@ class StockPredictionService:
                 )
                 
                 db.add(prediction)
+                if forecast_run is not None:
+                    db.add(self._forecast_run_row(forecast_run))
+                db.flush()
+                saved = prediction_to_dict(prediction)
                 db.commit()
+                prediction_index.add(saved)
+                prediction_broadcaster.publish(saved)
                 logger.info(f"Saved prediction for {prediction_data['ticker']}")
                 
             finally:
@@ -277,20 +473,26 @@ class StockPredictionService:
             logger.error(f"Failed to save prediction: {e}")
     
     def prediction_loop(self, tickers: List[str] = None):
-        """Main prediction loop that runs every 5 minutes"""
-        if tickers is None:
-            tickers = ['AAPL']  # Default to AAPL, can be expanded
-        
-        logger.info(f"Starting prediction loop for tickers: {tickers}")
+        """Main prediction loop that runs every 5 minutes.
+
+        With tickers=None the tickers are re-ranked every cycle from holdings
+        and live subscriptions (see get_daily_prediction_tickers).
+        """
+        logger.info(f"Starting prediction loop for tickers: {tickers or 'ranked per cycle'}")
         
         while self.is_running:
             try:
-                for ticker in tickers:
-                    # Make prediction
-                    prediction_data = self.make_prediction(ticker)
-                    if prediction_data:
-                        # Save to database
-                        self.save_prediction(prediction_data)
+                # Only the lease holder runs cycles; standbys wait to take over
+                if not self.leader_lease.is_leader:
+                    time.sleep(self.leader_lease.renew_seconds)
+                    continue
+
+                cycle_tickers = tickers or self.get_daily_prediction_tickers()
+                # Queue the cycle per ticker at background priority so interactive
+                # requests submitted meanwhile run before the remaining tickers
+                cycle = prediction_jobs.submit(None, cycle_tickers, kind="cycle", priority="background")
+                if not prediction_jobs.wait(cycle, PREDICTION_JOB_TIMEOUT_SECONDS * max(len(cycle_tickers), 1)):
+                    logger.error(f"Prediction cycle for {cycle_tickers} timed out: {cycle.error}")
                 
                 # Wait for 5 minutes (300 seconds)
                 time.sleep(300)
@@ -299,17 +501,40 @@ class StockPredictionService:
                 logger.error(f"Error in prediction loop: {e}")
                 time.sleep(60)  # Wait 1 minute before retrying
     
+    def run_unit(self, kind: str, ticker: str, priority: str):
+        """Run one queued unit of prediction work (see prediction_jobs)"""
+        if not self.model:
+            raise RuntimeError("Prediction model not loaded")
+        if kind == "cycle":
+            if not self.leader_lease.is_leader:
+                logger.warning(f"Lost prediction loop lease, skipping {ticker}")
+                return None
+            # Make prediction, keeping the full forecast alongside the point value
+            run = self.make_forecast(ticker, priority="background")
+            if not run:
+                return None
+            prediction_data = self.point_prediction(run)
+            # Save to database
+            self.save_prediction(prediction_data, forecast_run=run)
+            return prediction_data
+        if kind == "intervals":
+            return self.make_interval_predictions(ticker, priority)
+        return self.make_prediction(ticker, priority)
+
     def start_predictions(self, tickers: List[str] = None):
         """Start the background prediction service"""
         if self.is_running:
             logger.warning("Prediction service is already running")
             return
         
-        if not self.load_model():
+        # Keep an already loaded model: its selector holds the startup benchmark's picks
+        if self.model is None and not self.load_model():
             logger.error("Failed to load model, cannot start predictions")
             return
         
         self.is_running = True
+        prediction_jobs.start(self.run_unit)
+        self.leader_lease.start()
         self.prediction_thread = threading.Thread(
             target=self.prediction_loop,
             args=(tickers,),
@@ -325,12 +550,31 @@ class StockPredictionService:
             return
         
         self.is_running = False
+        self.leader_lease.stop()
         if self.prediction_thread:
             self.prediction_thread.join(timeout=10)
         logger.info("Prediction service stopped")
     
+    def status(self) -> Dict:
+        return {
+            "is_running": self.is_running,
+            "model_loaded": self.predictor is not None,
+            "model_version": self.model.version if self.model else None,
+            "is_leader": self.leader_lease.is_leader
+        }
+
+    def model_selection_status(self) -> Dict:
+        return self.model_selector.status()
+
+    def configure_model_selection(self, latency_budget_ms=None, accuracy_tolerance=None) -> Dict:
+        self.model_selector.configure(latency_budget_ms, accuracy_tolerance)
+        return self.model_selector.status()
+
     def get_latest_predictions(self, ticker: str = None, limit: int = 10) -> List[Dict]:
-        """Get latest predictions from database"""
+        """Get latest predictions, from the in-memory index when it can answer"""
+        if prediction_index.can_serve(limit):
+            return prediction_index.latest(ticker, limit)
+
         try:
             db = SessionLocal()
             try:
@@ -340,19 +584,7 @@ class StockPredictionService:
                 
                 predictions = query.order_by(Stock_Prediction.prediction_time.desc()).limit(limit).all()
                 
-                return [
-                    {
-                        'id': pred.id,
-                        'ticker': pred.ticker,
-                        'predicted_price': pred.predicted_price,
-                        'confidence_low': pred.confidence_low,
-                        'confidence_high': pred.confidence_high,
-                        'prediction_time': pred.prediction_time,
-                        'horizon_minutes': pred.horizon_minutes,
-                        'model_version': pred.model_version
-                    }
-                    for pred in predictions
-                ]
+                return [prediction_to_dict(pred) for pred in predictions]
             finally:
                 db.close()
                 
@@ -360,11 +592,51 @@ class StockPredictionService:
             logger.error(f"Failed to get predictions: {e}")
             return []
 
-    def get_daily_prediction_tickers(self) -> List[str]:
+    def get_holder_counts(self) -> Dict[str, int]:
+        """Number of distinct users holding each symbol, from linked brokerage accounts"""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(
+                    Securities.ticker_symbol,
+                    func.count(func.distinct(Plaid_Investment.user_id))
+                )
+                .select_from(Plaid_Investment_Holding)
+                .join(Securities, Plaid_Investment_Holding.security_id == Securities.security_id)
+                .join(Plaid_Investment, Plaid_Investment_Holding.account_id == Plaid_Investment.account_id)
+                .filter(Securities.ticker_symbol.isnot(None), Securities.ticker_symbol != '')
+                .group_by(Securities.ticker_symbol)
+                .all()
+            )
+            return {symbol.upper(): count for symbol, count in rows}
+        finally:
+            db.close()
+
+    def rank_prediction_tickers(self) -> List[str]:
+        """Tickers ordered by how many users hold or are watching them"""
+        try:
+            holders = self.get_holder_counts()
+        except Exception as e:
+            logger.warning(f"Failed to load holdings for ticker ranking: {e}")
+            holders = {}
+        viewers = prediction_broadcaster.interest()
+
+        scores = {
+            ticker: holders.get(ticker, 0) * TICKER_HOLDER_WEIGHT + viewers.get(ticker, 0) * TICKER_VIEWER_WEIGHT
+            for ticker in set(holders) | set(viewers)
+        }
+        return sorted((t for t, score in scores.items() if score > 0), key=lambda t: (-scores[t], t))
+
+    def get_daily_prediction_tickers(self, budget: int = PREDICTION_TICKERS_PER_CYCLE) -> List[str]:
         """
-        Simplified: only returns one ticker at a time (random pick from blue-chips + movers).
-        Keeps predictions lightweight and prevents multi-list output issues.
+        Fill this cycle's inference budget with the most held / most watched tickers.
+        Leftover slots go to a random pick from blue-chips + movers, as before.
         """
+        chosen = self.rank_prediction_tickers()[:budget]
+        if len(chosen) >= budget:
+            logger.info(f"Selected tickers for Chronos run: {chosen}")
+            return chosen
+
         core_tickers = ["AAPL", "MSFT", "NVDA", "AMZN", "META", "GOOGL", "TSLA", "BRK.B"]
         mover_type = random.choice(["gainers", "losers"])
 
@@ -384,9 +656,10 @@ class StockPredictionService:
             logger.warning(f"Failed to fetch {mover_type}: {e}")
             trending = []
 
-        tickers = list(dict.fromkeys(core_tickers + trending))
-        chosen = [random.choice(tickers)]  # pick one ticker only
-        logger.info(f"Selected ticker for Chronos run: {chosen}")
+        fillers = [t for t in dict.fromkeys(core_tickers + trending) if t not in chosen]
+        random.shuffle(fillers)
+        chosen += fillers[:budget - len(chosen)]
+        logger.info(f"Selected tickers for Chronos run: {chosen}")
         return chosen
 
 
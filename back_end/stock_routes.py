@@ -1,4 +1,6 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import Settings, Stock_Prediction
@@ -6,9 +8,17 @@ from auth import get_current_user
 from pydantic import BaseModel
 import requests
 from dotenv import load_dotenv
-from stock_prediction_service import prediction_service
-from typing import List, Optional
+from prediction_backend import prediction_backend
+from prediction_broadcaster import prediction_broadcaster
+from prediction_jobs import prediction_jobs, JobLimitError
+from prediction_config import MODEL_ADMIN_USERNAMES, PREDICTION_JOB_TIMEOUT_SECONDS
+from model_client import ModelServerError
+from accuracy_rollup import get_accuracy
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+import asyncio
+import json
+import time
 import os
 
 from stock_cache_service import fetch_symbol_from_fmp, fetch_company_snapshot, normalize_ticker_symbol
@@ -61,6 +71,18 @@ class PredictionResponse(BaseModel):
 class PredictionRequest(BaseModel):
     tickers: List[str]
 
+class PredictionJobRequest(BaseModel):
+    tickers: List[str]
+    kind: str = "point"  # "point" or "intervals"
+
+class ModelSelectionConfig(BaseModel):
+    latency_budget_ms: Optional[Dict[str, float]] = None  # e.g. {"interactive": 300}
+    accuracy_tolerance: Optional[float] = None
+
+class PredictionSubscriptionRequest(BaseModel):
+    action: str  # "subscribe" or "unsubscribe"
+    tickers: List[str]
+
 # WebSocket endpoint for retrieving the last quote.
 @router.websocket("/ws/getlastquote")
 async def websocket_lastquote(websocket: WebSocket):
@@ -149,6 +171,64 @@ async def websocket_custombars(websocket: WebSocket):
         print("Client disconnected from /ws/getcustombars")
 
 
+# WebSocket endpoint pushing new predictions to subscribed clients.
+# Connect with ?token=<jwt>, then send {"action": "subscribe", "tickers": [...]}.
+@router.websocket("/ws/predictions")
+async def websocket_predictions(websocket: WebSocket, token: Optional[str] = None):
+
+    await websocket.accept()
+
+    # Authenticate once per connection instead of once per poll
+    db = SessionLocal()
+    try:
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
+        await get_current_user(token, db)
+    except HTTPException as auth_error:
+        await websocket.send_json({"error": "Authentication failed", "detail": auth_error.detail})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        db.close()
+
+    subscription = prediction_broadcaster.subscribe()
+
+    async def forward_predictions():
+        while True:
+            message = await subscription.queue.get()
+            await websocket.send_json(jsonable_encoder(message))
+
+    sender = asyncio.create_task(forward_predictions())
+    try:
+        while True:
+            data = await websocket.receive_json()
+
+            try:
+                request = PredictionSubscriptionRequest(**data)
+            except Exception as validation_error:
+                await websocket.send_json({"error": "Invalid data format", "detail": str(validation_error)})
+                continue
+
+            tickers = [t.upper() for t in request.tickers]
+            if request.action == "subscribe":
+                prediction_broadcaster.update_tickers(subscription, add=tickers)
+                # Send the current forecast so clients don't wait a full cycle
+                snapshot = [p for t in tickers for p in prediction_backend.get_latest_predictions(t, 1)]
+                await websocket.send_json(jsonable_encoder({"type": "snapshot", "data": snapshot}))
+            elif request.action == "unsubscribe":
+                prediction_broadcaster.update_tickers(subscription, remove=tickers)
+            else:
+                await websocket.send_json({"error": f"Unknown action: {request.action}"})
+                continue
+
+            await websocket.send_json({"type": "subscribed", "tickers": sorted(subscription.tickers)})
+    except WebSocketDisconnect:
+        print("Client disconnected from /ws/predictions")
+    finally:
+        prediction_broadcaster.unsubscribe(subscription)
+        sender.cancel()
+
+
 # Prediction endpoints
 @router.get("/predictions/latest", response_model=List[PredictionResponse])
 async def get_latest_predictions(
@@ -158,7 +238,7 @@ async def get_latest_predictions(
 ):
     """Get the latest stock predictions"""
     try:
-        predictions = prediction_service.get_latest_predictions(ticker, limit)
+        predictions = prediction_backend.get_latest_predictions(ticker, limit)
         return predictions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get predictions: {str(e)}")
@@ -170,7 +250,7 @@ async def get_latest_prediction_for_ticker(
 ):
     """Get the latest prediction for a specific ticker"""
     try:
-        predictions = prediction_service.get_latest_predictions(ticker, 1)
+        predictions = prediction_backend.get_latest_predictions(ticker, 1)
         if not predictions:
             raise HTTPException(status_code=404, detail=f"No predictions found for {ticker}")
         return predictions[0]
@@ -186,7 +266,7 @@ async def start_prediction_service(
 ):
     """Start the prediction service for specified tickers"""
     try:
-        prediction_service.start_predictions(request.tickers)
+        prediction_backend.start_predictions(request.tickers)
         return {"message": f"Prediction service started for tickers: {request.tickers}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start prediction service: {str(e)}")
@@ -195,7 +275,7 @@ async def start_prediction_service(
 async def stop_prediction_service(user: dict = Depends(get_current_user)):
     """Stop the prediction service"""
     try:
-        prediction_service.stop_predictions()
+        prediction_backend.stop_predictions()
         return {"message": "Prediction service stopped"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to stop prediction service: {str(e)}")
@@ -203,27 +283,90 @@ async def stop_prediction_service(user: dict = Depends(get_current_user)):
 @router.get("/predictions/status")
 async def get_prediction_service_status(user: dict = Depends(get_current_user)):
     """Get the status of the prediction service"""
-    return {
-        "is_running": prediction_service.is_running,
-        "model_loaded": prediction_service.predictor is not None
-    }
+    return prediction_backend.status()
+
+@router.get("/predictions/models")
+async def get_model_selection(user: dict = Depends(get_current_user)):
+    """Get per-model benchmark results and the model chosen for each priority"""
+    return prediction_backend.model_selection_status()
+
+def require_model_admin(user: dict = Depends(get_current_user)) -> dict:
+    """Only usernames listed in MODEL_ADMIN_USERNAMES may change model selection or the served model"""
+    if user["username"] not in MODEL_ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Model administration not allowed")
+    return user
+
+@router.put("/predictions/models/config")
+async def configure_model_selection(
+    config: ModelSelectionConfig,
+    user: dict = Depends(require_model_admin)
+):
+    """Change latency budgets / accuracy tolerance and re-pick models from the last benchmark"""
+    return prediction_backend.configure_model_selection(config.latency_budget_ms, config.accuracy_tolerance)
+
+@router.post("/predictions/models/benchmark")
+async def benchmark_models(
+    request: StockRequest,
+    user: dict = Depends(require_model_admin)
+):
+    """Re-run the model benchmark on recent data for a ticker"""
+    try:
+        results = await asyncio.to_thread(prediction_backend.benchmark_models, request.ticker)
+        if not results:
+            raise HTTPException(status_code=404, detail=f"Could not benchmark models on {request.ticker}")
+        return prediction_backend.model_selection_status()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to benchmark models: {str(e)}")
+
+@router.get("/predictions/models/versions")
+async def get_model_versions(user: dict = Depends(get_current_user)):
+    """Active model version, versions in the registry, and the last swap's progress"""
+    return prediction_backend.model_versions()
+
+@router.post("/predictions/models/versions/{version}/activate", status_code=status.HTTP_202_ACCEPTED)
+async def activate_model_version(version: str, user: dict = Depends(require_model_admin)):
+    """Load a registry version in the background and switch to it once warmed up"""
+    try:
+        return prediction_backend.swap_model(version)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (ValueError, ModelServerError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+async def _await_job(job, poll_seconds: float = 0.25, timeout: float = PREDICTION_JOB_TIMEOUT_SECONDS):
+    """Wait for a queued prediction job without blocking the event loop; 504 after timeout"""
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        if time.monotonic() > deadline:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Prediction job {job.id} did not finish within {timeout:.0f}s; poll /predictions/jobs/{job.id}"
+            )
+        await asyncio.sleep(poll_seconds)
+    return job
+
+def _submit_job(user: dict, tickers: List[str], kind: str):
+    if not prediction_jobs.started:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Prediction service not started")
+    try:
+        return prediction_jobs.submit(user["id"], tickers, kind=kind, priority="interactive")
+    except JobLimitError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
 
 @router.post("/predictions/generate")
 async def generate_immediate_prediction(
     request: PredictionRequest,
     user: dict = Depends(get_current_user)
 ):
-    """Generate immediate predictions for specified tickers (not saved to DB)"""
+    """Generate immediate predictions for specified tickers and wait for the results"""
+    job = _submit_job(user, request.tickers, "point")
     try:
-        results = []
-        for ticker in request.tickers:
-            prediction_data = prediction_service.make_prediction(ticker)
-            if prediction_data:
-                results.append(prediction_data)
-            else:
-                results.append({"ticker": ticker, "error": "Failed to generate prediction"})
-        
-        return {"predictions": results}
+        await _await_job(job)
+        return {"predictions": job.results}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate predictions: {str(e)}")
 
@@ -233,25 +376,80 @@ async def generate_interval_predictions(
     user: dict = Depends(get_current_user)
 ):
     """Generate multi-interval predictions (for Stock Insights)."""
-    try:
-        results = []
-        for ticker in request.tickers:
-            preds = prediction_service.make_interval_predictions(ticker)
-            if preds:
-                results.extend(preds)
-            else:
-                results.append({
-                    "ticker": ticker,
-                    "interval": "N/A",
-                    "predicted_price": None,
-                    "change": None,
-                    "error": "Failed to generate prediction"
-                })
-        if not results:
-            raise HTTPException(status_code=404, detail="No predictions generated")
-        return {"predictions": results}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate interval predictions: {str(e)}")
+    job = _submit_job(user, request.tickers, "intervals")
+    await _await_job(job)
+    results = [
+        r if "error" not in r else {
+            "ticker": r["ticker"],
+            "interval": "N/A",
+            "predicted_price": None,
+            "change": None,
+            "error": r["error"]
+        }
+        for r in job.results
+    ]
+    if not results:
+        raise HTTPException(status_code=404, detail="No predictions generated")
+    return {"predictions": results}
+
+@router.post("/predictions/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_prediction_job(
+    request: PredictionJobRequest,
+    user: dict = Depends(get_current_user)
+):
+    """Queue a prediction job and return its id; poll or stream it for results"""
+    if request.kind not in ("point", "intervals"):
+        raise HTTPException(status_code=400, detail="kind must be 'point' or 'intervals'")
+    job = _submit_job(user, request.tickers, request.kind)
+    return {"job_id": job.id, "status": job.status}
+
+def _owned_job(job_id: str, user: dict) -> Dict:
+    job = prediction_jobs.get(job_id)
+    if job is None or prediction_jobs.owner(job_id) != user["id"]:
+        raise HTTPException(status_code=404, detail="Prediction job not found")
+    return job
+
+@router.get("/predictions/jobs/{job_id}")
+async def get_prediction_job(job_id: str, user: dict = Depends(get_current_user)):
+    """Status and results so far for a prediction job"""
+    return _owned_job(job_id, user)
+
+@router.get("/predictions/jobs/{job_id}/stream")
+async def stream_prediction_job(job_id: str, user: dict = Depends(get_current_user)):
+    """Server-sent events with each result as it completes, then the final job state"""
+    _owned_job(job_id, user)
+    job = prediction_jobs.local_job(job_id)
+
+    async def events():
+        if job is None:
+            # Owned by another worker: poll its stored state until it finishes
+            deadline = time.monotonic() + PREDICTION_JOB_TIMEOUT_SECONDS
+            sent = 0
+            while True:
+                stored = await asyncio.to_thread(prediction_jobs.get, job_id)
+                # The owning worker stores the results after every ticker
+                for result in (stored["results"] if stored else [])[sent:]:
+                    yield f"event: result\ndata: {json.dumps(jsonable_encoder(result))}\n\n"
+                    sent += 1
+                if stored is None or stored["status"] in ("done", "failed"):
+                    yield f"event: done\ndata: {json.dumps(jsonable_encoder(stored))}\n\n"
+                    return
+                if time.monotonic() > deadline:
+                    yield f"event: timeout\ndata: {json.dumps(jsonable_encoder(stored))}\n\n"
+                    return
+                await asyncio.sleep(1)
+        sent = 0
+        while True:
+            finished = job.done
+            for result in job.results[sent:]:
+                yield f"event: result\ndata: {json.dumps(jsonable_encoder(result))}\n\n"
+                sent += 1
+            if finished:
+                yield f"event: done\ndata: {json.dumps(jsonable_encoder(job.to_dict()))}\n\n"
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @router.get("/predictions/history/{ticker}")
 async def get_prediction_history(
@@ -289,6 +487,30 @@ async def get_prediction_history(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get prediction history: {str(e)}")
 
+@router.get("/predictions/runs/{ticker}")
+async def get_forecast_run_history(
+    ticker: str,
+    hours_back: int = 24,
+    user: dict = Depends(get_current_user)
+):
+    """Get stored full-horizon forecast runs (mean + quantiles per step) for a ticker"""
+    try:
+        return prediction_backend.get_forecast_runs(ticker, hours_back)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get forecast runs: {str(e)}")
+
+@router.get("/predictions/accuracy/{ticker}")
+async def get_prediction_accuracy(
+    ticker: str,
+    days: int = 30,
+    user: dict = Depends(get_current_user)
+):
+    """Get per-day, per-horizon accuracy of past predictions for a ticker"""
+    try:
+        return get_accuracy(ticker.upper(), days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get prediction accuracy: {str(e)}")
+
 @router.get("/gainers")
 async def fetch_gainers():
     """
@@ -0,0 +1,61 @@
+"""
+Shared setup for the back end tests.
+
+The tests run against a throwaway SQLite database (DATABASE_URL), so the
+environment has to be in place before database.py and the Plaid modules are
+imported. Run them from back_end/ with `python -m pytest -q`.
+"""
+import os
+import sys
+import tempfile
+
+from cryptography.fernet import Fernet
+
+_db_dir = tempfile.mkdtemp(prefix="back_end_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("PLAID_CLIENT_ID", "test-client")
+os.environ.setdefault("PLAID_SECRET", "test-secret")
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+os.environ["JOB_WORKERS"] = "0"
+STUB_PORT = 18766
+os.environ["PLAID_HOST"] = f"http://127.0.0.1:{STUB_PORT}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import models  # noqa: F401  (registers the tables on Base)
+from database import Base, SessionLocal, engine
+from plaid_stub import PlaidStub
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = models.Users(
+        id=1, email="user@example.com", username="user", first_name="Test", last_name="User",
+        phone_number="5550000001", hashed_password="x",
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture(scope="session")
+def plaid_stub():
+    """plaid_stub serving PLAID_HOST for the whole session"""
+    stub = PlaidStub(accounts=2, investment_accounts=1, transactions=300, holdings=5)
+    server = stub.serve(STUB_PORT)
+    yield stub
+    server.shutdown()
@@ -0,0 +1,23 @@
+import json
+import os
+import subprocess
+import sys
+
+BACK_END = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_benchmark_path_runs_against_the_stub(tmp_path):
+    """plaid_stub's responses must stay valid for the installed plaid-python models"""
+    report = tmp_path / "report.json"
+    subprocess.run(
+        [
+            sys.executable, "ingest_benchmark.py", "--paths", "transactions_sync", "holdings",
+            "--transactions", "200", "--holdings", "5", "--port", "18767",
+            "--database-url", f"sqlite:///{tmp_path / 'bench.db'}", "--report", str(report),
+        ],
+        cwd=BACK_END, check=True, capture_output=True, timeout=300,
+    )
+
+    results = {r["path"]: r for r in json.loads(report.read_text())["results"]}
+    assert results["transactions_sync"]["tables"]["Plaid_Transactions"] == 200
+    assert results["holdings"]["tables"]["Plaid_Investment_Holding"] == 5
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+
+import job_queue
+from database import SessionLocal
+from job_queue import JobWorkerPool, enqueue_job, register_handler
+from models import Background_Job, Users
+
+
+def _add_user(db, user_id):
+    db.add(Users(
+        id=user_id, email=f"user{user_id}@example.com", username=f"user{user_id}", first_name="Test",
+        last_name="User", phone_number=f"555000000{user_id}", hashed_password="x",
+    ))
+    db.commit()
+
+
+def _job(db, job_id):
+    db.expire_all()
+    return db.query(Background_Job).filter(Background_Job.id == job_id).one()
+
+
+def test_enqueue_returns_the_queued_job_for_the_same_key(db, user):
+    first = enqueue_job("test_kind", user.id, item_key="item-a")
+    again = enqueue_job("test_kind", user.id, item_key="item-a")
+    other_item = enqueue_job("test_kind", user.id, item_key="item-b")
+
+    assert again["job_id"] == first["job_id"]
+    assert other_item["job_id"] != first["job_id"]
+    assert db.query(Background_Job).count() == 2
+
+
+def test_claim_releases_the_key_and_runs_one_job_per_user(db, user):
+    _add_user(db, 2)
+    first = enqueue_job("test_kind", user.id, item_key="item-a")
+    enqueue_job("test_kind", user.id, item_key="item-b")
+    other_user = enqueue_job("test_kind", 2)
+    pool = JobWorkerPool(workers=0)
+
+    claimed = pool._claim(db)
+    assert claimed.id == first["job_id"]
+    assert claimed.status == "running"
+    assert claimed.dedupe_key is None
+    assert claimed.running_user_id == user.id
+    assert claimed.attempts == 1
+
+    # The user's second job waits; another user's job can still run
+    assert pool._claim(db).id == other_user["job_id"]
+    assert pool._claim(db) is None
+
+    # A change arriving while the job runs queues a follow-up
+    follow_up = enqueue_job("test_kind", user.id, item_key="item-a")
+    assert follow_up["job_id"] != first["job_id"]
+
+
+def test_successful_job_is_done(db, user):
+    register_handler("test_ok", lambda user_id, item_key, payload: {"item": item_key, **payload})
+    job = enqueue_job("test_ok", user.id, item_key="item-a", payload={"n": 1})
+    pool = JobWorkerPool(workers=0)
+
+    pool._run(db, pool._claim(db))
+
+    stored = _job(db, job["job_id"])
+    assert stored.status == "done"
+    assert stored.running_user_id is None
+    assert job_queue.job_to_dict(stored)["result"] == {"item": "item-a", "n": 1}
+
+
+def _failing(user_id, item_key, payload):
+    raise RuntimeError("boom")
+
+
+def test_failed_job_is_retried_with_its_key(db, user):
+    register_handler("test_fail", _failing)
+    job = enqueue_job("test_fail", user.id, item_key="item-a")
+    pool = JobWorkerPool(workers=0)
+
+    before = datetime.utcnow()
+    pool._run(db, pool._claim(db))
+
+    stored = _job(db, job["job_id"])
+    assert stored.status == "queued"
+    assert stored.dedupe_key == "test_fail:1:item-a"
+    assert stored.running_user_id is None
+    assert stored.run_after >= before + timedelta(seconds=job_queue.JOB_RETRY_BASE_SECONDS)
+    assert "boom" in stored.last_error
+    # The waiting retry absorbs new enqueues
+    assert enqueue_job("test_fail", user.id, item_key="item-a")["job_id"] == job["job_id"]
+
+
+def test_retry_is_dropped_for_a_newer_queued_job(db, user):
+    register_handler("test_fail", _failing)
+    job = enqueue_job("test_fail", user.id, item_key="item-a")
+    pool = JobWorkerPool(workers=0)
+    claimed = pool._claim(db)
+    follow_up = enqueue_job("test_fail", user.id, item_key="item-a")
+
+    pool._run(db, claimed)
+
+    stored = _job(db, job["job_id"])
+    assert stored.status == "failed"
+    assert stored.dedupe_key is None
+    assert "superseded" in stored.last_error
+    assert _job(db, follow_up["job_id"]).status == "queued"
+
+
+def test_job_fails_after_max_attempts(db, user):
+    register_handler("test_fail", _failing)
+    job = enqueue_job("test_fail", user.id, max_attempts=1)
+    pool = JobWorkerPool(workers=0)
+
+    pool._run(db, pool._claim(db))
+
+    stored = _job(db, job["job_id"])
+    assert stored.status == "failed"
+    assert stored.dedupe_key is None
+    assert stored.finished_at is not None
+
+
+def test_orphaned_job_is_requeued_unless_heartbeated(db, user):
+    _add_user(db, 2)
+    orphan = enqueue_job("test_kind", user.id)
+    alive = enqueue_job("test_kind", 2)
+    crashed_pool = JobWorkerPool(workers=0)
+    live_pool = JobWorkerPool(workers=0)
+    crashed_pool._claim(db)
+    live_pool._claim(db)
+
+    stale = datetime.utcnow() - timedelta(seconds=job_queue.JOB_LOCK_TIMEOUT_SECONDS + 60)
+    db.query(Background_Job).update({"locked_at": stale}, synchronize_session=False)
+    db.commit()
+    live_pool._heartbeat(db)
+    live_pool._requeue_orphans(db)
+
+    requeued = _job(db, orphan["job_id"])
+    assert requeued.status == "queued"
+    assert requeued.running_user_id is None
+    assert requeued.locked_by is None
+    assert _job(db, alive["job_id"]).status == "running"
+
+
+def test_outcome_is_discarded_after_losing_the_lock(db, user):
+    register_handler("test_ok", lambda user_id, item_key, payload: "first run")
+    job = enqueue_job("test_ok", user.id)
+    crashed_pool = JobWorkerPool(workers=0)
+    crashed_db = SessionLocal()
+    claimed = crashed_pool._claim(crashed_db)
+
+    # Requeued as orphaned and picked up by another worker
+    db.query(Background_Job).update(
+        {"status": "queued", "running_user_id": None, "locked_by": None}, synchronize_session=False
+    )
+    db.commit()
+    second = JobWorkerPool(workers=0)._claim(db)
+    assert second.id == job["job_id"]
+
+    try:
+        crashed_pool._run(crashed_db, claimed)
+    finally:
+        crashed_db.close()
+
+    stored = _job(db, job["job_id"])
+    assert stored.status == "running"
+    assert stored.locked_by == second.locked_by
+    assert stored.result is None
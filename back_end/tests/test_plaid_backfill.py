@@ -0,0 +1,50 @@
+import json
+
+import plaid_backfill
+from job_queue import JobWorkerPool, enqueue_job
+from models import Background_Job, Plaid_Item, Plaid_Transactions
+from plaid_backfill import BACKFILL_JOB_KIND, backfill_status, backfill_transactions
+from plaid_client import encrypt_token
+from plaid_orchestrator import sync_item
+
+
+def _link(db, user, token):
+    item = Plaid_Item(user_id=user.id, item_id=f"item-{token}", token_type="bank", access_token=encrypt_token(token))
+    db.add(item)
+    db.commit()
+    return item
+
+
+def test_backfill_seeds_the_sync_cursor(db, user, plaid_stub, monkeypatch):
+    monkeypatch.setattr(plaid_backfill, "BACKFILL_PAGE_SIZE", 100)
+    item = _link(db, user, "access-backfill-cursor")
+
+    progress = sync_item(item.id, transactions="backfill")["transactions"]
+
+    assert progress["status"] == "done"
+    # The stub spreads 300 transactions over HISTORY_DAYS, slightly more than BACKFILL_MONTHS
+    assert 250 < progress["fetched"] <= 300
+    assert db.query(Plaid_Transactions).count() == progress["fetched"]
+    db.expire_all()
+    # The stub's cursor is an offset into the item's history: "now" starts at its end
+    assert item.cursor == "300"
+
+
+def test_progress_is_stored_per_item_on_the_import_job(db, user, plaid_stub):
+    first = _link(db, user, "access-backfill-a")
+    second = _link(db, user, "access-backfill-b")
+    pool = JobWorkerPool(workers=0)
+    for item in (first, second):
+        enqueue_job(BACKFILL_JOB_KIND, user.id, item_key=item.item_id)
+        job = pool._claim(db)
+        backfill_transactions(user.id, item.item_id, item.item_id.removeprefix("item-"))
+
+        stored = json.loads(db.query(Background_Job).filter(Background_Job.id == job.id).one().result)
+        assert stored["item_id"] == item.item_id
+        assert stored["backfill"]["status"] == "done"
+        job.status, job.running_user_id = "done", None
+        db.commit()
+
+    status = {entry["item_id"]: entry for entry in backfill_status(user.id)}
+    assert set(status) == {first.item_id, second.item_id}
+    assert all(entry["status"] == "done" and entry["fetched"] > 0 for entry in status.values())
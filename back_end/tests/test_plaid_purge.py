@@ -0,0 +1,93 @@
+import pytest
+
+import plaid_purge
+from database import engine
+from schema_migrations import migrate_plaid_items
+from models import (
+    Plaid_Bank_Account, Plaid_Transactions, Transaction_Category_Link, User_Categories,
+    Plaid_Investment, Plaid_Investment_Holding, Users
+)
+
+
+@pytest.fixture
+def plaid_data(db, user):
+    """Two items and pre-multi-item accounts (item_id NULL) for the user, 3 transactions
+    each, and one item of another user"""
+    db.add(Users(
+        id=2, email="other@example.com", username="other", first_name="Other", last_name="User",
+        phone_number="5550000002", hashed_password="x",
+    ))
+    category = User_Categories(user_id=user.id, name="Food", color="#ffffff")
+    db.add(category)
+    db.flush()
+    for user_id, name, item_id in ((user.id, "item-a", "item-a"), (user.id, "item-b", "item-b"),
+                                   (user.id, "legacy", None), (2, "item-c", "item-c")):
+        db.add(Plaid_Bank_Account(user_id=user_id, account_id=f"bank-{name}", item_id=item_id))
+        db.add(Plaid_Investment(user_id=user_id, account_id=f"invest-{name}", item_id=item_id))
+        for n in range(3):
+            transaction_id = f"txn-{name}-{n}"
+            db.add(Plaid_Transactions(transaction_id=transaction_id, account_id=f"bank-{name}", amount=n))
+            db.add(Transaction_Category_Link(transaction_id=transaction_id, category_id=category.id))
+            db.add(Plaid_Investment_Holding(holding_id=f"holding-{name}-{n}", account_id=f"invest-{name}"))
+    db.commit()
+
+
+def _remaining(db, model):
+    db.expire_all()
+    return db.query(model).count()
+
+
+def test_purge_deletes_in_chunks_and_reports_progress(db, user, plaid_data, monkeypatch):
+    monkeypatch.setattr(plaid_purge, "PURGE_CHUNK_ROWS", 2)
+    reports = []
+    monkeypatch.setattr(plaid_purge, "report_progress", lambda user_id, progress: reports.append(dict(progress)))
+
+    result = plaid_purge.purge_plaid_data(user.id)
+
+    assert result == {
+        "category_links": 9, "transactions": 9, "bank_accounts": 3, "holdings": 9,
+        "investment_accounts": 3, "step": "done",
+    }
+    # 9 rows in chunks of 2 -> 5 chunks; 3 rows -> 2 chunks
+    assert [report["step"] for report in reports] == (
+        ["category_links"] * 5 + ["transactions"] * 5 + ["bank_accounts"] * 2 + ["holdings"] * 5
+        + ["investment_accounts"] * 2
+    )
+    assert [report["transactions"] for report in reports if report["step"] == "transactions"] == [2, 4, 6, 8, 9]
+    # Only the other user's item is left
+    assert _remaining(db, Plaid_Transactions) == 3
+    assert _remaining(db, Transaction_Category_Link) == 3
+    assert _remaining(db, Plaid_Bank_Account) == 1
+    assert _remaining(db, Plaid_Investment_Holding) == 3
+    assert _remaining(db, Plaid_Investment) == 1
+
+
+def test_purge_is_limited_to_the_item(db, user, plaid_data, monkeypatch):
+    monkeypatch.setattr(plaid_purge, "PURGE_CHUNK_ROWS", 2)
+    monkeypatch.setattr(plaid_purge, "report_progress", lambda user_id, progress: None)
+
+    result = plaid_purge.purge_plaid_data(user.id, item_key="item-a")
+
+    assert result["transactions"] == 3
+    assert result["bank_accounts"] == 1
+    db.expire_all()
+    assert {row.account_id for row in db.query(Plaid_Bank_Account)} == {"bank-item-b", "bank-legacy", "bank-item-c"}
+    assert {row.account_id for row in db.query(Plaid_Investment)} == {"invest-item-b", "invest-legacy", "invest-item-c"}
+    assert db.query(Plaid_Transactions).filter(Plaid_Transactions.account_id == "bank-item-a").count() == 0
+    assert _remaining(db, Plaid_Transactions) == 9
+    assert _remaining(db, Plaid_Investment_Holding) == 9
+
+
+def test_purge_of_a_migrated_item_includes_its_legacy_accounts(db, user, plaid_data, monkeypatch):
+    monkeypatch.setattr(plaid_purge, "report_progress", lambda user_id, progress: None)
+    user.plaid_access_token = "encrypted-bank"
+    db.commit()
+    migrate_plaid_items(engine)
+
+    result = plaid_purge.purge_plaid_data(user.id, item_key="legacy-bank-1")
+
+    assert result["transactions"] == 3
+    assert result["holdings"] == 3
+    db.expire_all()
+    assert {row.account_id for row in db.query(Plaid_Bank_Account)} == {"bank-item-a", "bank-item-b", "bank-item-c"}
+    assert {row.account_id for row in db.query(Plaid_Investment)} == {"invest-item-a", "invest-item-b", "invest-item-c"}
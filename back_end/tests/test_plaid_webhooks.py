@@ -0,0 +1,109 @@
+import hashlib
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+import plaid_webhooks
+
+BODY = b'{"webhook_type": "TRANSACTIONS", "webhook_code": "SYNC_UPDATES_AVAILABLE", "item_id": "item-a"}'
+
+
+def _pem(private_key):
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    """An EC P-256 key standing in for Plaid's webhook verification key"""
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = {**jwk.construct(public_pem, "ES256").to_dict(), "kid": "key-1", "expired_at": None}
+    monkeypatch.setattr(plaid_webhooks, "_verification_key", lambda kid: public_jwk if kid == "key-1" else {})
+    return _pem(private_key)
+
+
+def _sign(key, body=BODY, iat=None, algorithm="ES256", kid="key-1"):
+    claims = {
+        "iat": int(time.time()) if iat is None else iat,
+        "request_body_sha256": hashlib.sha256(body).hexdigest(),
+    }
+    return jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid})
+
+
+def _status(body, token):
+    with pytest.raises(HTTPException) as error:
+        plaid_webhooks.verify_webhook(body, token)
+    return error.value.status_code
+
+
+def test_valid_signature_is_accepted(signing_key):
+    plaid_webhooks.verify_webhook(BODY, _sign(signing_key))
+
+
+def test_missing_header_is_rejected(signing_key):
+    assert _status(BODY, None) == 401
+
+
+def test_modified_body_is_rejected(signing_key):
+    assert _status(BODY + b" ", _sign(signing_key)) == 401
+
+
+def test_old_webhook_is_rejected(signing_key):
+    iat = int(time.time()) - plaid_webhooks.WEBHOOK_MAX_AGE_SECONDS - 60
+    assert _status(BODY, _sign(signing_key, iat=iat)) == 401
+
+
+def test_other_algorithm_is_rejected(signing_key):
+    assert _status(BODY, _sign("shared-secret", algorithm="HS256")) == 401
+
+
+def test_signature_from_another_key_is_rejected(signing_key):
+    other_key = _pem(ec.generate_private_key(ec.SECP256R1()))
+    assert _status(BODY, _sign(other_key)) == 401
+
+
+def test_expired_key_is_rejected(signing_key, monkeypatch):
+    monkeypatch.setattr(plaid_webhooks, "_verification_key", lambda kid: {"expired_at": 1700000000})
+    assert _status(BODY, _sign(signing_key)) == 401
+
+
+@pytest.fixture
+def webhook_client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(plaid_webhooks, "PLAID_WEBHOOK_VERIFY", False)
+    app = FastAPI()
+    app.include_router(plaid_webhooks.router)
+    return TestClient(app)
+
+
+def test_update_webhook_queues_one_sync_for_the_item(db, user, webhook_client):
+    from models import Plaid_Item
+
+    db.add(Plaid_Item(user_id=user.id, item_id="item-a", token_type="bank", access_token="encrypted"))
+    db.commit()
+
+    first = webhook_client.post("/plaid/webhook", content=BODY).json()
+    second = webhook_client.post("/plaid/webhook", content=BODY).json()
+
+    assert first["status"] == "queued"
+    assert second["job_id"] == first["job_id"]
+
+
+def test_webhook_for_unknown_item_is_acknowledged(db, webhook_client):
+    response = webhook_client.post("/plaid/webhook", content=BODY)
+    assert response.status_code == 200
+    assert response.json()["status"] == "ignored"
+
+
+def test_malformed_webhook_is_rejected(db, webhook_client):
+    assert webhook_client.post("/plaid/webhook", content=b"{not json").status_code == 400
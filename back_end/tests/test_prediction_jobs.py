@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import prediction_jobs as prediction_jobs_module
+from prediction_jobs import JobLimitError, PredictionJobQueue
+
+
+@pytest.fixture
+def queue():
+    return PredictionJobQueue(workers=1)
+
+
+def test_cap_holds_for_concurrent_submits(db, user, queue, monkeypatch):
+    monkeypatch.setattr(prediction_jobs_module, "MAX_ACTIVE_PREDICTION_JOBS_PER_USER", 2)
+    # Not started: submitted jobs stay queued
+
+    def submit(_):
+        try:
+            return queue.submit(user.id, ["AAPL"])
+        except JobLimitError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        accepted = [job for job in pool.map(submit, range(6)) if job is not None]
+
+    assert len(accepted) == 2
+
+
+def test_progress_is_stored_after_each_ticker(db, user, queue):
+    release = threading.Event()
+    seen = []
+
+    def runner(kind, ticker, priority):
+        if ticker == "MSFT":
+            # The first ticker's result must already be stored
+            seen.append(dict(queue_owner_view(job.id)))
+            release.set()
+        return {"ticker": ticker, "predicted_price": 1.0}
+
+    def queue_owner_view(job_id):
+        other_worker = PredictionJobQueue(workers=0)
+        return other_worker.get(job_id)
+
+    job = queue.submit(user.id, ["AAPL", "MSFT"])
+    queue.start(runner)
+    assert queue.wait(job, 10)
+
+    assert seen[0]["completed"] == 1
+    assert [r["ticker"] for r in seen[0]["results"]] == ["AAPL"]
+    assert PredictionJobQueue(workers=0).get(job.id)["status"] == "done"
+
+
+def test_wait_fails_a_hung_job_and_replaces_its_worker(db, user, queue):
+    hang = threading.Event()
+
+    def runner(kind, ticker, priority):
+        if ticker == "HANG":
+            hang.wait(10)
+        return {"ticker": ticker}
+
+    queue.start(runner)
+    hung = queue.submit(None, ["HANG", "AAPL"], kind="cycle", priority="background", persist=False)
+
+    assert not queue.wait(hung, 0.2)
+    assert hung.status == "failed"
+    assert "Timed out" in hung.error
+
+    # The replacement worker keeps the queue moving while the hung call is stuck
+    later = queue.submit(None, ["MSFT"], persist=False)
+    assert queue.wait(later, 5)
+    assert later.results == [{"ticker": "MSFT"}]
+
+    hang.set()
+    # The stuck worker exits once its call returns, leaving one worker
+    for _ in range(50):
+        if len(queue._threads) == 1:
+            break
+        threading.Event().wait(0.05)
+    assert len(queue._threads) == 1
+    assert hung.results == []
@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import Plaid_Investment, Plaid_Item, Securities, Users
+from schema_migrations import migrate_plaid_items, migrate_securities
+
+SYNCED_AT = datetime(2024, 1, 2, 3, 4, 5)
+
+
+@pytest.fixture
+def legacy_user(db, user):
+    user.plaid_access_token = "encrypted-bank"
+    user.plaid_brokerage_access_token = "encrypted-brokerage"
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def sync_state(db):
+    """The Plaid_Sync_State table of the single-item release"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE "Plaid_Sync_State" (id INTEGER PRIMARY KEY, user_id INTEGER, item_id VARCHAR(100), '
+            'cursor TEXT, last_synced_at DATETIME, token_type VARCHAR(20), holdings_synced_at DATETIME)'
+        ))
+    yield
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE "Plaid_Sync_State"'))
+
+
+def _items(db):
+    db.expire_all()
+    return {item.item_id: item for item in db.query(Plaid_Item)}
+
+
+def test_tokens_without_sync_state_get_placeholder_items(db, legacy_user):
+    migrate_plaid_items(engine)
+
+    items = _items(db)
+    assert set(items) == {"legacy-bank-1", "legacy-brokerage-1"}
+    assert items["legacy-bank-1"].access_token == "encrypted-bank"
+    assert items["legacy-brokerage-1"].token_type == "brokerage"
+    assert items["legacy-bank-1"].cursor is None
+
+
+def test_sync_state_supplies_item_id_and_cursor(db, legacy_user, sync_state):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'INSERT INTO "Plaid_Sync_State" (user_id, item_id, cursor, last_synced_at, token_type) '
+            "VALUES (1, 'real-bank-item', 'cursor-1', :synced_at, 'bank')"
+        ), {"synced_at": SYNCED_AT})
+
+    migrate_plaid_items(engine)
+
+    items = _items(db)
+    assert set(items) == {"real-bank-item", "legacy-brokerage-1"}
+    assert items["real-bank-item"].cursor == "cursor-1"
+    assert items["real-bank-item"].last_synced_at == SYNCED_AT
+
+
+def test_migration_runs_once_and_keeps_the_legacy_tokens(db, legacy_user):
+    migrate_plaid_items(engine)
+    migrate_plaid_items(engine)
+
+    assert len(_items(db)) == 2
+    user = db.query(Users).one()
+    assert user.plaid_tokens_migrated_at is not None
+    # Kept so the previous release still works after a rollback
+    assert user.plaid_access_token == "encrypted-bank"
+    assert user.plaid_brokerage_access_token == "encrypted-brokerage"
+
+    # An item unlinked after the migration is not brought back
+    db.query(Plaid_Item).delete()
+    db.commit()
+    migrate_plaid_items(engine)
+    assert _items(db) == {}
+
+
+def test_item_inserted_by_another_worker_does_not_abort(db, legacy_user):
+    """Simulate a second worker committing the same item between the check and the insert"""
+    legacy_user.plaid_brokerage_access_token = None
+    db.commit()
+
+    raced = []
+
+    def other_worker_commits(session, flush_context, instances):
+        if raced:
+            return
+        raced.append(True)
+        with engine.begin() as conn:
+            conn.execute(text(
+                'INSERT INTO "Plaid_Items" (user_id, item_id, token_type, access_token) '
+                "VALUES (1, 'legacy-bank-1', 'bank', 'encrypted-bank')"
+            ))
+            conn.execute(text('UPDATE "Users" SET plaid_tokens_migrated_at = CURRENT_TIMESTAMP'))
+
+    event.listen(Session, "before_flush", other_worker_commits)
+    try:
+        migrate_plaid_items(engine)
+    finally:
+        event.remove(Session, "before_flush", other_worker_commits)
+
+    assert raced
+    assert set(_items(db)) == {"legacy-bank-1"}
+
+
+def test_securities_are_filled_from_legacy_holding_columns(db, user):
+    """Holdings stored symbol and name themselves before the Securities table"""
+    db.add(Plaid_Investment(user_id=user.id, account_id="invest-1"))
+    db.add(Securities(security_id="sec-known", ticker_symbol="MSFT", name="Microsoft"))
+    db.commit()
+    with engine.begin() as conn:
+        conn.execute(text('ALTER TABLE "Plaid_Investment_Holding" ADD COLUMN symbol VARCHAR(20)'))
+        conn.execute(text('ALTER TABLE "Plaid_Investment_Holding" ADD COLUMN name VARCHAR(255)'))
+        conn.execute(text(
+            'INSERT INTO "Plaid_Investment_Holding" (holding_id, account_id, security_id, symbol, name) VALUES '
+            "('h1', 'invest-1', 'sec-aapl', 'AAPL', 'Apple'), ('h2', 'invest-1', 'sec-aapl', 'AAPL', 'Apple'), "
+            "('h3', 'invest-1', 'sec-known', 'OLD', 'Old name'), ('h4', 'invest-1', NULL, 'CASH', 'Cash')"
+        ))
+
+    migrate_securities(engine)
+    migrate_securities(engine)
+
+    db.expire_all()
+    securities = {s.security_id: (s.ticker_symbol, s.name) for s in db.query(Securities)}
+    assert securities == {"sec-aapl": ("AAPL", "Apple"), "sec-known": ("MSFT", "Microsoft")}
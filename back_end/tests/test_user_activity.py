@@ -0,0 +1,22 @@
+from models import Users
+from user_activity import ActivityRecorder
+
+
+def test_activity_is_written_in_one_batch(db, user):
+    db.add(Users(
+        id=2, email="other@example.com", username="other", first_name="Other", last_name="User",
+        phone_number="5550000002", hashed_password="x",
+    ))
+    db.commit()
+    recorder = ActivityRecorder(flush_seconds=3600)
+
+    recorder.touch(user.id)
+    recorder.touch(2)
+    recorder.touch(user.id)
+    db.expire_all()
+    assert db.query(Users).filter(Users.last_active_at.isnot(None)).count() == 0
+
+    assert recorder.flush() == 2
+    db.expire_all()
+    assert db.query(Users).filter(Users.last_active_at.isnot(None)).count() == 2
+    assert recorder.flush() == 0
@@ -0,0 +1,112 @@
+"""
+Per-process cache of decrypted Plaid access tokens.
+
+get_access_token replaces the usual "load the Plaid_Items row, then
+Fernet-decrypt its token" sequence. It still reads the row's ciphertext, so
+an unlinked item is never served, but a hit skips the decrypt. Entries are
+keyed by (user_id, item_id). Each entry also records a hash of the
+ciphertext it was decrypted from, so a changed token is never served from
+the cache.
+
+Entries expire after TOKEN_CACHE_TTL_SECONDS, which bounds how long another
+process can serve a token after it was replaced or unlinked elsewhere. In
+this process, /exchange_public_token and /unlink invalidate explicitly. The
+cache holds at most TOKEN_CACHE_MAX_ENTRIES tokens, evicting the least
+recently used. Tokens are kept in bytearrays that are zeroed when evicted,
+expired or invalidated. The str handed to callers is an ordinary copy.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from models import Plaid_Item
+from plaid_client import cipher_suite
+
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "1024"))
+
+def _ciphertext_hash(encrypted_token: str) -> str:
+    return hashlib.sha256(encrypted_token.encode()).hexdigest()
+
+class _Entry:
+    __slots__ = ("token", "ciphertext_hash", "expires_at")
+
+    def __init__(self, token: bytearray, ciphertext_hash: str, expires_at: float):
+        self.token = token
+        self.ciphertext_hash = ciphertext_hash
+        self.expires_at = expires_at
+
+    def wipe(self):
+        for i in range(len(self.token)):
+            self.token[i] = 0
+
+class AccessTokenCache:
+    def __init__(self, ttl_seconds: int = TOKEN_CACHE_TTL_SECONDS, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, item_id: str, encrypted_token: str = None) -> Optional[str]:
+        """Cached token, or None if missing, expired or decrypted from a different ciphertext"""
+        key = (user_id, item_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic() or (
+                encrypted_token is not None and entry.ciphertext_hash != _ciphertext_hash(encrypted_token)
+            ):
+                self._entries.pop(key).wipe()
+                return None
+            self._entries.move_to_end(key)
+            return entry.token.decode()
+
+    def decrypt(self, user_id: int, item_id: str, encrypted_token: str) -> str:
+        """Decrypt encrypted_token, caching the plaintext for the user's item"""
+        cached = self.get(user_id, item_id, encrypted_token)
+        if cached is not None:
+            return cached
+        token = bytearray(cipher_suite.decrypt(encrypted_token.encode()))
+        entry = _Entry(token, _ciphertext_hash(encrypted_token), time.monotonic() + self.ttl_seconds)
+        key = (user_id, item_id)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                previous.wipe()
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                evicted.wipe()
+            return entry.token.decode()
+
+    def invalidate(self, user_id: int, item_id: str = None):
+        """Drop the user's cached token(s); all of the user's items when item_id is None"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id and (item_id is None or k[1] == item_id)]:
+                self._entries.pop(key).wipe()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry.wipe()
+            self._entries.clear()
+
+# Global instance
+token_cache = AccessTokenCache()
+
+def item_access_token(item: Plaid_Item) -> str:
+    """Decrypted token of a Plaid_Items row the caller already loaded"""
+    return token_cache.decrypt(item.user_id, item.item_id, item.access_token)
+
+def get_access_token(db, user_id: int, item_id: str) -> Optional[str]:
+    """The decrypted access token of one of the user's items, or None if it is not linked.
+    Only decrypts when the cache has no entry for the row's current ciphertext."""
+    row = db.query(Plaid_Item.access_token).filter(Plaid_Item.user_id == user_id, Plaid_Item.item_id == item_id).first()
+    if not row:
+        token_cache.invalidate(user_id, item_id)  # Unlinked, possibly by another process
+        return None
+    return token_cache.decrypt(user_id, item_id, row[0])
@@ -0,0 +1,64 @@
+"""
+Batched recording of Users.last_active_at.
+
+get_current_user runs on every authenticated request, so it only notes the
+user's activity in memory here. A background thread writes the pending
+timestamps every ACTIVITY_FLUSH_SECONDS in one bulk UPDATE, keeping DB writes
+off the auth path. The refresh scheduler only needs day-level precision (see
+plaid_refresh.ACTIVE_USER_DAYS), so losing the last few minutes on a crash
+does not matter.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import update
+
+from database import SessionLocal
+from models import Users
+
+ACTIVITY_FLUSH_SECONDS = 300
+
+class ActivityRecorder:
+    def __init__(self, flush_seconds: int = ACTIVITY_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def touch(self, user_id: int):
+        """Note that the user made a request now"""
+        with self._lock:
+            self._pending[user_id] = datetime.utcnow()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def flush(self) -> int:
+        """Write the pending timestamps; returns the number of users updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        db = SessionLocal()
+        try:
+            db.execute(update(Users), [{"id": user_id, "last_active_at": at} for user_id, at in pending.items()])
+            db.commit()
+            return len(pending)
+        except Exception as e:
+            db.rollback()
+            print("[ACTIVITY] Failed to record user activity:", e)
+            return 0
+        finally:
+            db.close()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+# Global instance
+user_activity = ActivityRecorder()
@@ -3,13 +3,10 @@ from sqlalchemy.orm import Session
 from typing import Annotated
 from datetime import datetime
 from database import SessionLocal
-from models import Users, Plaid_Bank_Account, User_Balance
+from models import Users, Plaid_Bank_Account, User_Balance, Plaid_Item
 from auth import get_current_user
-from plaid.api import plaid_api
-from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
-# from plaid.model.accounts_balance_get_response import AccountsBalanceGetResponse 
-# # Uncomment if needed, this gave me an error when trying to run, removed for now
-from plaid_routes import decrypt_token, PLAID_CLIENT_ID, PLAID_SECRET, client
+from plaid_refresh import BALANCE_JOB_KIND, balances_stale, refresh_balances
+from job_queue import enqueue_job
 
 # from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
@@ -26,6 +23,10 @@ def get_db():
     finally:
         db.close()
 
+def has_bank_item(db, user_id: int) -> bool:
+    """True if the user has linked at least one bank item; its accounts are then read-only"""
+    return db.query(Plaid_Item.id).filter(Plaid_Item.user_id == user_id, Plaid_Item.token_type == "bank").first() is not None
+
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_user_balances(
     user: Annotated[dict, Depends(get_current_user)],
@@ -42,8 +43,8 @@ async def get_user_balances(
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Check if user has Plaid token
-        has_plaid = bool(db_user.plaid_access_token)
+        # Check if user has a linked bank item
+        has_plaid = has_bank_item(db, user["id"])
         
         # Initialize default response structure
         response_data = {
@@ -63,38 +64,27 @@ async def get_user_balances(
         }
 
         if has_plaid:
-            # Try to get Plaid balances
-            try:
-                decrypted_access_token = decrypt_token(db_user.plaid_access_token)
-                request = AccountsBalanceGetRequest(
-                    access_token=decrypted_access_token,
-                    client_id=PLAID_CLIENT_ID,
-                    secret=PLAID_SECRET
-                )
-                plaid_response = client.accounts_balance_get(request).to_dict()
-
-                # Process Plaid balances
-                response_data["plaid_balances"] = [
-                    {
-                        "account_id": account["account_id"],
-                        "name": account["name"],
-                        "type": account["type"],
-                        "subtype": account["subtype"],
-                        "balance": account["balances"]["available"] or 0.0,
-                    }
-                    for account in plaid_response["accounts"]
-                ]
-                
-                print("Successfully loaded Plaid balances")
-            except Exception as plaid_error:
-                print(f"Plaid error: {plaid_error}, falling back to manual balances")
-                # If Plaid fails, treat as non-Plaid user
-                response_data["has_plaid"] = False
-                response_data["balances_editable"] = {
-                    "checking": True,
-                    "savings": True,
-                    "cash": True
+            # Serve the stored snapshot; refresh it in the background once it is older than the TTL
+            accounts = db.query(Plaid_Bank_Account).filter(Plaid_Bank_Account.user_id == user["id"]).all()
+            response_data["plaid_balances"] = [
+                {
+                    "account_id": account.account_id,
+                    "name": account.name,
+                    "type": account.type,
+                    "subtype": account.subtype,
+                    "balance": account.available_balance or 0.0,
+                    "balance_as_of": account.balance_as_of,
                 }
+                for account in accounts
+            ]
+            as_of = [account.balance_as_of for account in accounts if account.balance_as_of]
+            response_data["balances_as_of"] = min(as_of) if as_of else None
+            response_data["refreshing"] = balances_stale(db, user["id"])
+            if response_data["refreshing"]:
+                try:
+                    enqueue_job(BALANCE_JOB_KIND, user["id"])
+                except Exception as queue_error:
+                    print(f"Could not queue balance refresh: {queue_error}")
 
         # Always get manual balances (for non-Plaid users or as fallback)
         manual_balances = db.query(User_Balance).filter(User_Balance.id == user["id"]).all()
@@ -125,6 +115,27 @@ async def get_user_balances(
 
 
 
+@router.post("/refresh", status_code=status.HTTP_200_OK)
+def refresh_plaid_balances(
+    user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_db)]
+):
+    """
+    Fetch real-time balances from Plaid now, if the stored snapshot is older than
+    BALANCE_MAX_AGE_MINUTES. Otherwise the stored snapshot is kept.
+    A plain def, so FastAPI runs the slow Plaid calls on its thread pool.
+    """
+    db_user = db.query(Users).filter(Users.id == user["id"]).first()
+    if not db_user or not has_bank_item(db, user["id"]):
+        raise HTTPException(status_code=400, detail="Plaid account not linked.")
+    try:
+        result = refresh_balances(user["id"])
+    except Exception as e:
+        print("Error refreshing Plaid balances:", e)
+        raise HTTPException(status_code=502, detail="Could not refresh balances from Plaid")
+    return {"refreshed": result is not None, "result": result}
+
+
 class CashBalanceUpdate(BaseModel):
     cash_balance: float
 
@@ -165,7 +176,7 @@ async def update_manual_balance(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Check if user has Plaid and is trying to edit Plaid-connected accounts
-    has_plaid = bool(db_user.plaid_access_token)
+    has_plaid = has_bank_item(db, user["id"])
     if has_plaid and update_data.balance_name in ["checking", "savings"]:
         raise HTTPException(
             status_code=403, 
@@ -1,8 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Annotated
 from database import SessionLocal
-from models import Users, Plaid_Transactions, Plaid_Bank_Account
+from models import Users, Plaid_Transactions, Plaid_Bank_Account, Plaid_Item
 from auth import get_current_user
 from plaid.api import plaid_api
 from plaid.model.transactions_get_request import TransactionsGetRequest
@@ -12,7 +13,8 @@ try:
     HAS_DATEUTIL = True
 except ImportError:
     HAS_DATEUTIL = False
-from plaid_routes import decrypt_token, PLAID_CLIENT_ID, PLAID_SECRET, client
+from plaid_routes import PLAID_CLIENT_ID, PLAID_SECRET, client
+from token_cache import item_access_token
 
 router = APIRouter(
     prefix="/user_transactions",
@@ -26,6 +28,19 @@ def get_db():
     finally:
         db.close()
 
+# Live transactions_get calls, one per linked item, run side by side
+_plaid_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="plaid-transactions")
+
+def _fetch_item_transactions(access_token: str, start_dt, end_dt):
+    request = TransactionsGetRequest(
+        access_token=access_token,
+        start_date=start_dt,
+        end_date=end_dt,
+        client_id=PLAID_CLIENT_ID,
+        secret=PLAID_SECRET
+    )
+    return client.transactions_get(request).to_dict().get("transactions", [])
+
 def generate_recurring_transactions(recurring_transaction, start_date, end_date):
     """
     Generate future instances of a recurring transaction within the date range.
@@ -97,7 +112,7 @@ def generate_recurring_transactions(recurring_transaction, start_date, end_date)
     return generated
 
 @router.get("/", status_code=status.HTTP_200_OK)
-async def get_user_transactions(
+def get_user_transactions(
     user: Annotated[dict, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
     start_date: str | None = None,
@@ -125,27 +140,24 @@ async def get_user_transactions(
         print(f"[TRANSACTIONS] Date range: {start_dt} to {end_dt}")
 
         transactions = []
-        # handling: only attempt Plaid call if user has linked a Plaid access token
+        # handling: only attempt Plaid call if user has linked a bank item
         DISABLE_PLAID_SANDBOX = False  # Set to True to disable Plaid sandbox transactions
+        plaid_items = db.query(Plaid_Item).filter(
+            Plaid_Item.user_id == user["id"], Plaid_Item.token_type == "bank"
+        ).all()
         
-        if db_user and db_user.plaid_access_token and not DISABLE_PLAID_SANDBOX:
+        if plaid_items and not DISABLE_PLAID_SANDBOX:
             try:
-                decrypted_access_token = decrypt_token(db_user.plaid_access_token)
-                print(f"[PLAID] Decrypted access token available")  # Debug
-
-                request = TransactionsGetRequest(
-                    access_token=decrypted_access_token,
-                    start_date=start_dt,
-                    end_date=end_dt,
-                    client_id=PLAID_CLIENT_ID,
-                    secret=PLAID_SECRET
-                )
-                response = client.transactions_get(request).to_dict()
-                print(f"[PLAID] Retrieved {len(response.get('transactions', []))} transactions")  # Debug
+                futures = [
+                    _plaid_pool.submit(_fetch_item_transactions, item_access_token(item), start_dt, end_dt)
+                    for item in plaid_items
+                ]
+                plaid_transactions = [t for future in futures for t in future.result()]
+                print(f"[PLAID] Retrieved {len(plaid_transactions)} transactions from {len(plaid_items)} items")  # Debug
 
                 # Filter transactions by date range (Plaid sandbox sometimes ignores date filters)
                 transactions = []
-                for t in response.get("transactions", []):
+                for t in plaid_transactions:
                     try:
                         tx_date = datetime.fromisoformat(str(t["date"])).date() if isinstance(t["date"], str) else t["date"]
                         if start_dt <= tx_date <= end_dt:
@@ -0,0 +1,62 @@
+"""
+Replay sample Plaid webhooks against a local backend.
+
+Start the backend with PLAID_WEBHOOK_VERIFY=false, then for example:
+
+    python webhook_sender.py SYNC_UPDATES_AVAILABLE --item-id <item_id>
+    python webhook_sender.py HOLDINGS_DEFAULT_UPDATE --item-id <item_id> --repeat 5
+
+The item id must belong to a linked item (see Plaid_Items). --repeat
+sends a burst, which should coalesce into a single queued job.
+"""
+import argparse
+import json
+
+import requests
+
+SAMPLES = {
+    "SYNC_UPDATES_AVAILABLE": {
+        "webhook_type": "TRANSACTIONS",
+        "webhook_code": "SYNC_UPDATES_AVAILABLE",
+        "initial_update_complete": True,
+        "historical_update_complete": True,
+        "environment": "sandbox",
+    },
+    "TRANSACTIONS_DEFAULT_UPDATE": {
+        "webhook_type": "TRANSACTIONS",
+        "webhook_code": "DEFAULT_UPDATE",
+        "new_transactions": 3,
+        "error": None,
+        "environment": "sandbox",
+    },
+    "HOLDINGS_DEFAULT_UPDATE": {
+        "webhook_type": "HOLDINGS",
+        "webhook_code": "DEFAULT_UPDATE",
+        "new_holdings": 1,
+        "updated_holdings": 2,
+        "error": None,
+        "environment": "sandbox",
+    },
+    "ITEM_ERROR": {
+        "webhook_type": "ITEM",
+        "webhook_code": "ERROR",
+        "error": {"error_type": "ITEM_ERROR", "error_code": "ITEM_LOGIN_REQUIRED"},
+        "environment": "sandbox",
+    },
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Send sample Plaid webhooks to a local backend")
+    parser.add_argument("sample", choices=sorted(SAMPLES))
+    parser.add_argument("--item-id", required=True)
+    parser.add_argument("--url", default="http://localhost:8000/plaid/webhook")
+    parser.add_argument("--repeat", type=int, default=1, help="Send the same webhook this many times")
+    args = parser.parse_args()
+
+    payload = {**SAMPLES[args.sample], "item_id": args.item_id}
+    for _ in range(args.repeat):
+        response = requests.post(args.url, data=json.dumps(payload), headers={"Content-Type": "application/json"})
+        print(response.status_code, response.text)
+
+if __name__ == "__main__":
+    main()